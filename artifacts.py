@@ -0,0 +1,250 @@
+"""
+Artefactos del modelo versionados bajo ART_DIR.
+
+Estructura:
+
+    ART_DIR/
+      CURRENT                  <- nombre de la versión activa
+      modelo_atrasos.joblib    <- formato legado (se usa si no hay CURRENT)
+      golden_samples.json      <- perfiles dorados para validar versiones nuevas
+      <versión>/
+        manifest.json          <- esquema, BEST_THR, LABELS, huella del modelo
+        pipeline.joblib        <- pipeline sin comprimir (cargable con mmap_mode="r")
+        forest_arrays.joblib   <- nodos del bosque aplanados para fast_scorer (opcional)
+
+Los arrays NumPy grandes se guardan sin compresión para que
+`joblib.load(..., mmap_mode="r")` los mapee desde el archivo: varias réplicas
+de la app en el mismo host comparten esas páginas en lugar de copiarlas.
+
+Para convertir el modelo legado al formato versionado:
+    python artifacts.py --from artefactos/modelo_atrasos.joblib
+"""
+import datetime
+import hashlib
+import json
+import os
+import tempfile
+
+import joblib
+
+FORMAT_VERSION = 1
+LEGACY_MODEL_FILE = "modelo_atrasos.joblib"
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+PIPELINE_FILE = "pipeline.joblib"
+FOREST_ARRAYS_FILE = "forest_arrays.joblib"
+GOLDEN_FILE = "golden_samples.json"
+
+DEFAULT_BEST_THR = 0.5
+DEFAULT_LABELS = {0: "FAIL", 1: "PASS"}
+
+
+def get_art_dir() -> str:
+    """ART_DIR del entorno; las rutas relativas se resuelven junto al código."""
+    art_dir = os.getenv("ART_DIR", "artefactos")
+    if not os.path.isabs(art_dir):
+        art_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), art_dir)
+    return art_dir
+
+
+def get_model_path(art_dir: str = None) -> str:
+    return os.path.join(art_dir or get_art_dir(), LEGACY_MODEL_FILE)
+
+
+def model_fingerprint(path: str = None) -> str:
+    """Huella corta (sha256) del archivo del modelo; cambia si se reemplaza el artefacto."""
+    digest = hashlib.sha256()
+    with open(path or get_model_path(), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _write_atomic(path: str, text: str):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.chmod(tmp, 0o644)
+    os.replace(tmp, path)
+
+
+def current_version(art_dir: str = None):
+    """Nombre de la versión activa según ART_DIR/CURRENT, o None si no existe."""
+    try:
+        with open(os.path.join(art_dir or get_art_dir(), CURRENT_FILE), encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def load_golden_samples(art_dir: str = None) -> list:
+    try:
+        with open(os.path.join(art_dir or get_art_dir(), GOLDEN_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return []
+
+
+def read_manifest(version_dir: str) -> dict:
+    with open(os.path.join(version_dir, MANIFEST_FILE), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def schema_from_pipeline(pipe) -> dict:
+    prep = pipe.named_steps["prep"]
+    num_features = list(prep.transformers_[0][2])
+    cat_features = list(prep.transformers_[1][2])
+    encoder = prep.transformers_[1][1]
+    categories = {
+        f: [str(c) for c in cats] for f, cats in zip(cat_features, getattr(encoder, "categories_", []))
+    }
+    return {
+        "num_features": num_features,
+        "cat_features": cat_features,
+        "expected_cols": num_features + cat_features,
+        "categories": categories,
+    }
+
+
+def export_artifact(
+    pipe,
+    art_dir: str = None,
+    version: str = None,
+    best_thr: float = DEFAULT_BEST_THR,
+    labels: dict = None,
+    source: str = "",
+    extra: dict = None,
+    activate: bool = True,
+    golden_rows: list = None,
+) -> str:
+    """
+    Guarda `pipe` como una nueva versión en ART_DIR y, si `activate`, la marca
+    como CURRENT. Las probabilidades de los perfiles dorados quedan en el
+    manifest para que el registro verifique que la versión cargada las reproduce.
+    """
+    import pandas as pd
+
+    from fast_scorer import flatten_forest
+    from scoring import ensure_expected_columns
+
+    art_dir = art_dir or get_art_dir()
+    version = version or datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    version_dir = os.path.join(art_dir, version)
+    os.makedirs(version_dir, exist_ok=False)
+
+    pipeline_path = os.path.join(version_dir, PIPELINE_FILE)
+    joblib.dump(pipe, pipeline_path, compress=0)
+
+    files = {"pipeline": PIPELINE_FILE}
+    forest_arrays = flatten_forest(pipe.named_steps["model"])
+    if forest_arrays is not None:
+        joblib.dump(forest_arrays, os.path.join(version_dir, FOREST_ARRAYS_FILE), compress=0)
+        files["forest_arrays"] = FOREST_ARRAYS_FILE
+
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        "model_version": model_fingerprint(pipeline_path),
+        "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "source": source,
+        "model_type": type(pipe.named_steps["model"]).__name__,
+        "schema": schema_from_pipeline(pipe),
+        "best_thr": float(best_thr),
+        "labels": {str(k): v for k, v in (labels or DEFAULT_LABELS).items()},
+        "files": files,
+    }
+
+    golden_rows = golden_rows if golden_rows is not None else load_golden_samples(art_dir)
+    if golden_rows:
+        df = ensure_expected_columns(
+            pd.DataFrame(golden_rows), manifest["schema"]["expected_cols"], manifest["schema"]["num_features"]
+        )
+        proba = pipe.predict_proba(df)[:, 1]
+        manifest["golden"] = {"rows": golden_rows, "proba": [float(p) for p in proba]}
+    if extra:
+        manifest.update(extra)
+    _write_atomic(os.path.join(version_dir, MANIFEST_FILE), json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    if activate:
+        activate_version(version, art_dir)
+    return version_dir
+
+
+def activate_version(version: str, art_dir: str = None):
+    art_dir = art_dir or get_art_dir()
+    if not os.path.exists(os.path.join(art_dir, version, MANIFEST_FILE)):
+        raise FileNotFoundError(f"La versión {version} no tiene {MANIFEST_FILE} en {art_dir}")
+    _write_atomic(os.path.join(art_dir, CURRENT_FILE), version + "\n")
+
+
+def load_artifact(art_dir: str = None, version: str = None, mmap: bool = True) -> dict:
+    """
+    Carga la versión indicada (o la activa) desde ART_DIR. Si no hay formato
+    versionado, cae al `modelo_atrasos.joblib` legado y deduce el esquema del
+    paso `prep`.
+    """
+    art_dir = art_dir or get_art_dir()
+    version = version or current_version(art_dir)
+    mmap_mode = "r" if mmap else None
+
+    if version is None:
+        model_path = get_model_path(art_dir)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"No se encontró el modelo en: {model_path}")
+        pipe = joblib.load(model_path)
+        schema = schema_from_pipeline(pipe)
+        return {
+            "pipe": pipe,
+            "schema": schema,
+            "best_thr": DEFAULT_BEST_THR,
+            "labels": dict(DEFAULT_LABELS),
+            "model_version": model_fingerprint(model_path),
+            "version": None,
+            "forest_arrays": None,
+            "manifest": None,
+        }
+
+    version_dir = os.path.join(art_dir, version)
+    manifest = read_manifest(version_dir)
+    if manifest.get("format", 0) > FORMAT_VERSION:
+        raise ValueError(f"Formato de artefacto {manifest['format']} no soportado (máx. {FORMAT_VERSION})")
+
+    files = manifest["files"]
+    pipe = joblib.load(os.path.join(version_dir, files["pipeline"]), mmap_mode=mmap_mode)
+    forest_arrays = None
+    if "forest_arrays" in files:
+        forest_arrays = joblib.load(os.path.join(version_dir, files["forest_arrays"]), mmap_mode=mmap_mode)
+
+    return {
+        "pipe": pipe,
+        "schema": manifest["schema"],
+        "best_thr": float(manifest.get("best_thr", DEFAULT_BEST_THR)),
+        "labels": {int(k): v for k, v in manifest.get("labels", DEFAULT_LABELS).items()},
+        "model_version": manifest["model_version"],
+        "version": version,
+        "forest_arrays": forest_arrays,
+        "manifest": manifest,
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Exporta un pipeline al formato versionado de ART_DIR.")
+    parser.add_argument("--from", dest="source", default=None, help="Pipeline .joblib de origen (por defecto, el legado)")
+    parser.add_argument("--art-dir", default=None, help="Carpeta de artefactos (por defecto, ART_DIR)")
+    parser.add_argument("--version", default=None, help="Nombre de la versión (por defecto, fecha y hora)")
+    parser.add_argument("--thr", type=float, default=DEFAULT_BEST_THR, help="Umbral de decisión BEST_THR")
+    parser.add_argument("--no-activate", action="store_true", help="No actualizar CURRENT")
+    args = parser.parse_args()
+
+    source = args.source or get_model_path(args.art_dir)
+    out_dir = export_artifact(
+        joblib.load(source),
+        art_dir=args.art_dir,
+        version=args.version,
+        best_thr=args.thr,
+        source=os.path.basename(source),
+        activate=not args.no_activate,
+    )
+    print(f"Artefacto exportado en: {out_dir}")
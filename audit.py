@@ -0,0 +1,259 @@
+"""
+Registro de auditoría de las predicciones mostradas a los tutores.
+
+El script de Streamlit solo encola (`record` / `record_csv`); un hilo en
+segundo plano vacía la cola por lotes en una base SQLite local de solo
+inserción (triggers que rechazan UPDATE y DELETE). Cada registro guarda las
+entradas, `proba_pass`, la etiqueta, el umbral, la versión del modelo y la hora.
+
+Contrapresión: la cola es acotada; si se llena, `record` espera a que el
+escritor libere espacio en lugar de descartar, y el tiempo de espera queda en
+`stats()`. Un lote que no se puede escribir (base bloqueada, disco lleno) se
+reintenta con esperas crecientes hasta `MAX_RETRY_SECONDS`. Un elemento que no
+se puede leer (CSV corrupto, archivo ilegible) se registra en el log y se
+cuenta en `failed` sin detener el hilo escritor. Al cerrar limpiamente
+(`close`, registrado con atexit) se escribe todo lo que quede en la cola.
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+logger = logging.getLogger("panel.audit")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS predictions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts REAL NOT NULL,
+    session TEXT,
+    source TEXT NOT NULL,
+    model_version TEXT NOT NULL,
+    threshold REAL NOT NULL,
+    proba_pass REAL NOT NULL,
+    pred_label TEXT NOT NULL,
+    inputs TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS predictions_no_update BEFORE UPDATE ON predictions
+BEGIN SELECT RAISE(ABORT, 'registro de auditoría de solo inserción'); END;
+CREATE TRIGGER IF NOT EXISTS predictions_no_delete BEFORE DELETE ON predictions
+BEGIN SELECT RAISE(ABORT, 'registro de auditoría de solo inserción'); END;
+"""
+INSERT = (
+    "INSERT INTO predictions (ts, session, source, model_version, threshold, proba_pass, pred_label, inputs) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+)
+RETRY_SECONDS = 0.1  # primera espera tras un error de escritura; se duplica hasta el tope
+MAX_RETRY_SECONDS = 5.0
+_STOP = object()
+
+
+class _CsvBatch:
+    """
+    Resultado de lote (CSV ya puntuado) que el escritor lee y convierte en filas
+    por bloques. Se guarda el archivo abierto, no sus bytes: en la cola solo
+    ocupa un descriptor, y el archivo se puede leer aunque lo borren mientras tanto.
+    """
+
+    def __init__(self, file, n_rows: int, input_cols: list, meta: tuple, chunk_rows: int):
+        self.file = file
+        self.n_rows = n_rows
+        self.input_cols = input_cols
+        self.meta = meta  # (ts, session, source, model_version, threshold)
+        self.chunk_rows = chunk_rows
+        self.rows_read = 0
+
+    def chunks(self):
+        try:
+            for chunk in pd.read_csv(self.file, chunksize=self.chunk_rows):
+                cols = [c for c in self.input_cols if c in chunk.columns]
+                inputs = chunk[cols].to_json(orient="records", lines=True).splitlines()
+                rows = [
+                    (*self.meta, float(p), str(label), row)
+                    for p, label, row in zip(chunk["proba_pass"], chunk["pred_label"], inputs)
+                ]
+                self.rows_read += len(rows)
+                yield rows
+        finally:
+            self.file.close()
+
+
+class AuditSink:
+    def __init__(
+        self,
+        path: str,
+        max_queue: int = 10_000,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+    ):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._stats = {
+            "enqueued": 0, "written": 0, "batches": 0, "errors": 0, "failed": 0,
+            "blocked_puts": 0, "blocked_ms": 0.0, "max_depth": 0, "last_flush_ms": 0.0,
+        }
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        # El esquema se crea aquí para fallar al arrancar si la ruta no sirve
+        with sqlite3.connect(path) as conn:
+            conn.executescript(SCHEMA)
+            # WAL queda guardado en el archivo; fijarlo aquí evita que el hilo escritor falle al arrancar
+            conn.execute("PRAGMA journal_mode=WAL")
+
+        self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------- productores (hilos de Streamlit) ----------
+    def _put(self, item, n_records: int):
+        if self._closed:
+            raise RuntimeError("El registro de auditoría ya está cerrado")
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            t0 = time.perf_counter()
+            self._queue.put(item)
+            with self._lock:
+                self._stats["blocked_puts"] += 1
+                self._stats["blocked_ms"] += (time.perf_counter() - t0) * 1000
+        with self._lock:
+            self._stats["enqueued"] += n_records
+            self._stats["max_depth"] = max(self._stats["max_depth"], self._queue.qsize())
+
+    def record(
+        self,
+        inputs: dict,
+        proba_pass: float,
+        pred_label: str,
+        threshold: float,
+        model_version: str,
+        source: str = "individual",
+        session: str = None,
+    ):
+        row = (
+            time.time(), session, source, model_version, float(threshold),
+            float(proba_pass), str(pred_label), json.dumps(inputs, ensure_ascii=False, default=str),
+        )
+        self._put(row, 1)
+
+    def record_csv(
+        self,
+        file,
+        n_rows: int,
+        input_cols: list,
+        threshold: float,
+        model_version: str,
+        source: str = "batch",
+        session: str = None,
+    ):
+        """
+        Encola un lote puntuado (CSV con `proba_pass` y `pred_label`, abierto en
+        binario). El hilo escritor lo lee por bloques y lo cierra al terminar.
+        """
+        meta = (time.time(), session, source, model_version, float(threshold))
+        self._put(_CsvBatch(file, n_rows, list(input_cols), meta, self.batch_size), n_rows)
+
+    # ---------- escritor (hilo en segundo plano) ----------
+    def _write(self, conn, rows: list):
+        t0 = time.perf_counter()
+        delay = RETRY_SECONDS
+        while True:
+            try:
+                with conn:
+                    conn.executemany(INSERT, rows)
+                break
+            except sqlite3.Error:
+                # Sin descartar: se reintenta el mismo lote (p. ej. base bloqueada o disco lleno)
+                logger.exception("No se pudo escribir el lote de auditoría; reintentando en %.1f s", delay)
+                with self._lock:
+                    self._stats["errors"] += 1
+                time.sleep(delay)
+                delay = min(delay * 2, MAX_RETRY_SECONDS)
+        with self._lock:
+            self._stats["written"] += len(rows)
+            self._stats["batches"] += 1
+            self._stats["last_flush_ms"] = (time.perf_counter() - t0) * 1000
+
+    def _write_csv(self, conn, item: _CsvBatch):
+        try:
+            for chunk in item.chunks():
+                self._write(conn, chunk)
+        except Exception:
+            # Un archivo ilegible no debe matar al escritor: lo que no se leyó se cuenta y se sigue
+            logger.exception("No se pudo leer el lote de auditoría (%d de %d filas escritas)", item.rows_read, item.n_rows)
+            with self._lock:
+                self._stats["failed"] += item.n_rows - item.rows_read
+
+    def _run(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        stopping = False
+        try:
+            while not (stopping and self._queue.empty()):
+                try:
+                    items = [self._queue.get(timeout=self.flush_interval)]
+                except queue.Empty:
+                    continue
+                while len(items) < self.batch_size:
+                    try:
+                        items.append(self._queue.get_nowait())
+                    except queue.Empty:
+                        break
+
+                rows = []
+                for item in items:
+                    if item is _STOP:
+                        stopping = True
+                    elif isinstance(item, _CsvBatch):
+                        self._write_csv(conn, item)
+                    else:
+                        rows.append(item)
+                if rows:
+                    self._write(conn, rows)
+        finally:
+            conn.close()
+
+    # ---------- ciclo de vida y métricas ----------
+    def close(self, timeout: float = None):
+        """Deja de aceptar registros, escribe todo lo pendiente y cierra la base."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+        out["depth"] = self._queue.qsize()
+        out["capacity"] = self._queue.maxsize
+        out["pending"] = out["enqueued"] - out["written"] - out["failed"]
+        return out
+
+    def to_prometheus(self) -> str:
+        s = self.stats()
+        metrics = [
+            ("panel_audit_enqueued_total", "counter", "Registros encolados.", s["enqueued"]),
+            ("panel_audit_written_total", "counter", "Registros escritos en la base.", s["written"]),
+            ("panel_audit_pending", "gauge", "Registros encolados aún sin escribir.", s["pending"]),
+            ("panel_audit_queue_depth", "gauge", "Elementos en la cola.", s["depth"]),
+            ("panel_audit_queue_max_depth", "gauge", "Máxima profundidad observada de la cola.", s["max_depth"]),
+            ("panel_audit_blocked_puts_total", "counter", "Encolados que esperaron por cola llena.", s["blocked_puts"]),
+            ("panel_audit_blocked_seconds_total", "counter", "Tiempo esperando por cola llena.", s["blocked_ms"] / 1000),
+            ("panel_audit_failed_total", "counter", "Registros de lotes ilegibles que no se escribieron.", s["failed"]),
+            ("panel_audit_write_errors_total", "counter", "Escrituras fallidas (reintentadas).", s["errors"]),
+        ]
+        lines = []
+        for name, kind, help_text, value in metrics:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value:g}"]
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,234 @@
+"""
+Caché en disco de resultados de predicción por lote.
+
+Cada lote se guarda bajo la clave sha256(bytes del archivo + huella del modelo):
+`<clave>.csv` con las filas puntuadas, `<clave>.json` con el resumen
+(conteos, vista previa, columnas faltantes, cohortes con sus histogramas,
+filas rechazadas) y `<clave>.npz` con las probabilidades ordenadas para
+explorar el umbral y dibujar su distribución. Así los reruns de Streamlit,
+las recargas de página y los reinicios del contenedor reutilizan lotes ya
+puntuados. Las entradas caducan por TTL y, si se supera el tamaño máximo,
+se eliminan primero las menos usadas recientemente.
+
+Las descargas en CSV comprimido o Parquet se generan solo cuando se piden
+(`export`), leyendo el CSV del lote por bloques, y quedan junto a la entrada
+para que las siguientes descargas no vuelvan a serializar.
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+from thresholds import ThresholdExplorer
+
+# formato -> (extensión, tipo MIME)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+EXPORT_BLOCK_BYTES = 4 << 20
+
+
+def file_key(file, model_version: str) -> str:
+    """Hash del contenido del archivo (leído por bloques) combinado con la versión del modelo."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for block in iter(lambda: file.read(1 << 20), b""):
+        digest.update(block)
+    file.seek(0)
+    digest.update(model_version.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class BatchResultCache:
+    def __init__(self, root: str, ttl_seconds: float, max_bytes: int):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _paths(self, key: str):
+        base = os.path.join(self.root, key)
+        return base + ".csv", base + ".json", base + ".npz"
+
+    def _export_paths(self, key: str) -> list:
+        # El CSV del lote ya es la exportación "csv"
+        return [os.path.join(self.root, key + ext) for fmt, (ext, _) in EXPORT_FORMATS.items() if fmt != "csv"]
+
+    def open_csv(self, key: str):
+        """El CSV puntuado del lote abierto en binario (None si no está en la caché)."""
+        try:
+            return open(self._paths(key)[0], "rb")
+        except FileNotFoundError:
+            return None
+
+    def get(self, key: str):
+        csv_path, meta_path, npz_path = self._paths(key)
+        try:
+            age = time.time() - os.path.getmtime(meta_path)
+            if age > self.ttl_seconds:
+                self._remove(key)
+                return None
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if "cohort_hist" not in meta:  # entrada de una versión anterior de la app
+                return None
+            with np.load(npz_path) as arrays:
+                explorer = ThresholdExplorer(
+                    arrays["sorted_proba"], arrays["pos_cum"] if "pos_cum" in arrays else None
+                )
+            spool = open(csv_path, "rb")
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+        # Marca de uso reciente para la política LRU (sin cambiar la edad del TTL)
+        os.utime(csv_path)
+        return {
+            "spool": spool,
+            "n_rows": meta["n_rows"],
+            "counts": meta["counts"],
+            "preview": pd.read_json(io.StringIO(meta["preview"]), orient="split"),
+            "missing": meta["missing"],
+            "cohorts": pd.read_json(io.StringIO(meta["cohorts"]), orient="split", dtype={"group": str}),
+            "cohort_hist": pd.read_json(io.StringIO(meta["cohort_hist"]), orient="split", dtype={"group": str}),
+            "explorer": explorer,
+            "ingest": meta["ingest"],
+            "n_rejected": meta["n_rejected"],
+            "rejects": pd.read_json(io.StringIO(meta["rejects"]), orient="split", dtype={"value": str}),
+        }
+
+    def put(self, key: str, result: dict):
+        if result["preview"] is None:
+            return
+        csv_path, meta_path, npz_path = self._paths(key)
+
+        # Escritura atómica: primero a un temporal en el mismo directorio, luego os.replace
+        fd, tmp_csv = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as out:
+            result["spool"].seek(0)
+            shutil.copyfileobj(result["spool"], out)
+        result["spool"].seek(0)
+        os.replace(tmp_csv, csv_path)
+
+        explorer = result["explorer"]
+        arrays = {"sorted_proba": explorer.sorted_proba}
+        if explorer.pos_cum is not None:
+            arrays["pos_cum"] = explorer.pos_cum
+        fd, tmp_npz = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "wb") as out:
+            np.savez(out, **arrays)
+        os.replace(tmp_npz, npz_path)
+
+        meta = {
+            "n_rows": result["n_rows"],
+            "counts": result["counts"],
+            "preview": result["preview"].to_json(orient="split"),
+            "missing": result["missing"],
+            "cohorts": result["cohorts"].to_json(orient="split", index=False),
+            "cohort_hist": result["cohort_hist"].to_json(orient="split", index=False),
+            "ingest": result["ingest"],
+            "n_rejected": result["n_rejected"],
+            "rejects": result["rejects"].to_json(orient="split", index=False),
+        }
+        fd, tmp_meta = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as out:
+            json.dump(meta, out, ensure_ascii=False)
+        os.replace(tmp_meta, meta_path)
+
+        self.prune()
+
+    def export(self, key: str, fmt: str, source, string_cols=()) -> str:
+        """
+        Ruta del resultado del lote en `fmt` (ver EXPORT_FORMATS), generándolo la
+        primera vez desde `source` (el CSV puntuado, abierto en binario) sin
+        cargarlo entero: gzip comprime el flujo de bytes y Parquet convierte el
+        CSV por bloques con pyarrow. `string_cols` se leen siempre como texto
+        (un bloque con la columna vacía no cambia el esquema del archivo).
+        """
+        ext, _ = EXPORT_FORMATS[fmt]
+        path = os.path.join(self.root, key + ext)
+        if os.path.exists(path):
+            os.utime(path)
+            return path
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        source.seek(0)
+        try:
+            if fmt == "parquet":
+                os.close(fd)
+                _csv_to_parquet(source, tmp_path, string_cols)
+            else:
+                with os.fdopen(fd, "wb") as raw:
+                    out = gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6) if fmt == "csv.gz" else raw
+                    with out:
+                        shutil.copyfileobj(source, out, EXPORT_BLOCK_BYTES)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        finally:
+            source.seek(0)
+        self.prune()
+        return path
+
+    def _remove(self, key: str):
+        for path in list(self._paths(key)) + self._export_paths(key):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def prune(self):
+        """Elimina entradas vencidas y, si hace falta, las menos usadas hasta entrar en `max_bytes`."""
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.root):
+            if not name.endswith(".json"):
+                continue
+            key = name[: -len(".json")]
+            csv_path, meta_path, npz_path = self._paths(key)
+            try:
+                created = os.path.getmtime(meta_path)
+                used = os.path.getmtime(csv_path)
+                size = sum(os.path.getsize(path) for path in (csv_path, meta_path, npz_path))
+                size += sum(os.path.getsize(path) for path in self._export_paths(key) if os.path.exists(path))
+            except FileNotFoundError:
+                continue
+            if now - created > self.ttl_seconds:
+                self._remove(key)
+                continue
+            entries.append((used, size, key))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(key)
+            total -= size
+
+
+def _csv_to_parquet(source, path: str, string_cols):
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.parquet as pq
+
+    reader = pa_csv.open_csv(
+        source,
+        read_options=pa_csv.ReadOptions(block_size=EXPORT_BLOCK_BYTES),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in string_cols},
+            strings_can_be_null=True,
+        ),
+    )
+    with pq.ParquetWriter(path, reader.schema, compression="zstd") as writer:
+        for batch in reader:
+            writer.write_batch(batch)
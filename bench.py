@@ -0,0 +1,232 @@
+"""
+Benchmark de inferencia del modelo activo (sin Streamlit).
+
+Uso:
+    python bench.py                                   # mide y compara con bench_baseline.json
+    python bench.py --sizes 1000 10000 --repeat 5     # corrida corta
+    python bench.py --save-baseline                   # guarda la corrida como nueva referencia
+
+Mide el camino de puntuación de la app y del lote
+(`ensure_expected_columns` + `pipe.predict_proba`):
+
+- carga del artefacto (`artifacts.load_artifact`);
+- latencia de una fila (p50/p99 sobre `--single-runs` llamadas);
+- throughput en lotes de 1k/10k/100k/1M filas sintéticas (mejor de `--repeat`);
+- RSS máximo del proceso después de cada tamaño.
+
+Escribe los resultados en JSON (`--out`). Si existe la referencia
+(`--baseline`), compara cada métrica y termina con código 1 cuando alguna
+empeora más que `--tolerance` (relativo). Las referencias solo son
+comparables en la misma máquina y con la misma versión del modelo.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import sklearn
+
+import artifacts
+from scoring import ensure_expected_columns
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 1_000_000]
+DEFAULT_OUT = "bench_results.json"
+DEFAULT_BASELINE = "bench_baseline.json"
+DEFAULT_TOLERANCE = 0.25
+
+# métrica -> True si más alto es mejor
+HIGHER_IS_BETTER = {"rows_per_s": True}
+
+
+def peak_rss_mb() -> float:
+    # En Linux ru_maxrss viene en KiB; en macOS, en bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def synthetic_frame(pipe, schema: dict, n: int, seed: int = 0) -> pd.DataFrame:
+    """
+    `n` filas sintéticas, generadas por columna: numéricas enteras dentro del
+    rango visto en entrenamiento (± 3 desviaciones, como fast_scorer.random_profiles)
+    y categóricas entre las categorías del OneHotEncoder.
+    """
+    rng = np.random.default_rng(seed)
+    prep = pipe.named_steps["prep"]
+    data = {}
+
+    num_features = list(schema["num_features"])
+    scaler = prep.named_transformers_.get("num")
+    mean = getattr(scaler, "mean_", None)
+    scale = getattr(scaler, "scale_", None)
+    mean = mean if mean is not None else np.zeros(len(num_features))
+    scale = scale if scale is not None else np.ones(len(num_features))
+    lo = np.floor(np.maximum(mean - 3 * scale, 0)).astype(int)
+    hi = np.ceil(mean + 3 * scale).astype(int)
+    for j, feature in enumerate(num_features):
+        data[feature] = rng.integers(lo[j], hi[j] + 1, size=n)
+
+    encoder = prep.named_transformers_.get("cat")
+    for feature, categories in zip(schema["cat_features"], getattr(encoder, "categories_", [])):
+        data[feature] = np.asarray(categories, dtype=object)[rng.integers(0, len(categories), size=n)]
+
+    return pd.DataFrame(data)
+
+
+def bench_load(art_dir: str, repeat: int) -> dict:
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        artifacts.load_artifact(art_dir)
+        times.append(time.perf_counter() - t0)
+    return {"seconds": min(times)}
+
+
+def bench_single(pipe, schema: dict, runs: int) -> dict:
+    expected_cols, num_features = schema["expected_cols"], schema["num_features"]
+    rows = synthetic_frame(pipe, schema, runs, seed=1).to_dict("records")
+    # Calentamiento: la primera llamada paga imports y cachés de sklearn
+    pipe.predict_proba(ensure_expected_columns(pd.DataFrame(rows[:1]), expected_cols, num_features))
+
+    times = np.empty(runs)
+    for i, row in enumerate(rows):
+        t0 = time.perf_counter()
+        df = ensure_expected_columns(pd.DataFrame([row]), expected_cols, num_features)
+        pipe.predict_proba(df)
+        times[i] = time.perf_counter() - t0
+    ms = times * 1000
+    return {
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+        "mean_ms": float(ms.mean()),
+    }
+
+
+def bench_batch(pipe, schema: dict, n: int, repeat: int) -> dict:
+    expected_cols, num_features = schema["expected_cols"], schema["num_features"]
+    df = synthetic_frame(pipe, schema, n, seed=2)
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        pipe.predict_proba(ensure_expected_columns(df.copy(), expected_cols, num_features))
+        times.append(time.perf_counter() - t0)
+    best = min(times)
+    del df
+    return {"seconds": best, "rows_per_s": n / best, "peak_rss_mb": peak_rss_mb()}
+
+
+def run(art_dir: str = None, sizes: list = None, repeat: int = 3, single_runs: int = 200) -> dict:
+    sizes = sorted(sizes or DEFAULT_SIZES)
+    rss_start = peak_rss_mb()
+
+    load = bench_load(art_dir, repeat)
+    artifact = artifacts.load_artifact(art_dir)
+    pipe, schema = artifact["pipe"], artifact["schema"]
+    load["peak_rss_mb"] = peak_rss_mb()
+
+    single = bench_single(pipe, schema, single_runs)
+    print(f"1 fila · p50 {single['p50_ms']:.2f} ms · p99 {single['p99_ms']:.2f} ms", file=sys.stderr)
+
+    batches = {}
+    # De menor a mayor: el RSS máximo de cada tamaño incluye a los anteriores
+    for n in sizes:
+        batches[str(n)] = bench_batch(pipe, schema, n, repeat if n < 1_000_000 else 1)
+        b = batches[str(n)]
+        print(
+            f"{n:>9} filas · {b['seconds']:.3f} s · {b['rows_per_s']:,.0f} filas/s · RSS {b['peak_rss_mb']:.0f} MB",
+            file=sys.stderr,
+        )
+
+    return {
+        "environment": {
+            "python": platform.python_version(),
+            "sklearn": sklearn.__version__,
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.machine(),
+            "cpus": os.cpu_count(),
+        },
+        "model_version": artifact["model_version"],
+        "version": artifact["version"],
+        "rss_start_mb": rss_start,
+        "load": load,
+        "single_row": single,
+        "batch": batches,
+    }
+
+
+def flatten_metrics(results: dict) -> dict:
+    """Métricas comparables como {"grupo.métrica": valor}."""
+    flat = {
+        "load.seconds": results["load"]["seconds"],
+        "load.peak_rss_mb": results["load"]["peak_rss_mb"],
+        "single_row.p50_ms": results["single_row"]["p50_ms"],
+        "single_row.p99_ms": results["single_row"]["p99_ms"],
+    }
+    for n, b in results["batch"].items():
+        flat[f"batch.{n}.rows_per_s"] = b["rows_per_s"]
+        flat[f"batch.{n}.peak_rss_mb"] = b["peak_rss_mb"]
+    return flat
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Métricas que empeoran más que `tolerance`: (métrica, referencia, actual, cambio relativo)."""
+    current, reference = flatten_metrics(results), flatten_metrics(baseline)
+    regressions = []
+    for metric, ref in reference.items():
+        if metric not in current or not ref:
+            continue
+        change = (current[metric] - ref) / ref
+        if HIGHER_IS_BETTER.get(metric.rsplit(".", 1)[-1], False):
+            change = -change
+        if change > tolerance:
+            regressions.append((metric, ref, current[metric], change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark de inferencia con umbrales de regresión.")
+    parser.add_argument("--art-dir", default=None, help="Carpeta de artefactos (por defecto, ART_DIR)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Tamaños de lote")
+    parser.add_argument("--repeat", type=int, default=3, help="Repeticiones por medición (se usa la mejor)")
+    parser.add_argument("--single-runs", type=int, default=200, help="Llamadas de una fila")
+    parser.add_argument("--out", default=DEFAULT_OUT, help="JSON de resultados")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="JSON de referencia")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="Empeoramiento relativo aceptado")
+    parser.add_argument("--save-baseline", action="store_true", help="Guardar esta corrida como referencia")
+    args = parser.parse_args(argv)
+
+    results = run(args.art_dir, sizes=args.sizes, repeat=args.repeat, single_runs=args.single_runs)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Resultados en {args.out}", file=sys.stderr)
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Referencia guardada en {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"Sin referencia ({args.baseline}); usa --save-baseline para crearla", file=sys.stderr)
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("model_version") != results["model_version"]:
+        print("Aviso: la referencia es de otra versión del modelo", file=sys.stderr)
+
+    regressions = compare(results, baseline, args.tolerance)
+    for metric, ref, cur, change in regressions:
+        print(f"REGRESIÓN {metric}: {ref:.4g} → {cur:.4g} ({change:+.0%} peor)", file=sys.stderr)
+    if regressions:
+        return 1
+    print(f"Sin regresiones (tolerancia {args.tolerance:.0%})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
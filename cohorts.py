@@ -0,0 +1,140 @@
+"""
+Agregados por cohorte sobre resultados de lote, acumulados bloque a bloque.
+
+Cada bloque puntuado se codifica por dimensión (`pd.factorize` para las
+categóricas, `np.digitize` para las variables en tramos) y se agrega con
+`np.bincount`: conteo, PASS predichos, suma de `proba_pass` e histograma de
+`proba_pass` (ver distribution.py) por grupo. Solo se guardan esos totales,
+así que el costo en memoria depende del número de grupos y no del número de
+filas del archivo.
+"""
+import numpy as np
+import pandas as pd
+
+import distribution
+
+# (columna, etiqueta, tramos) — tramos = (bordes para np.digitize, nombres) o None si es categórica
+DIMENSIONS = [
+    ("sex", "Sexo", None),
+    ("address", "Zona", None),
+    ("famsize", "Tamaño de familia", None),
+    ("Medu", "Educación de la madre", None),
+    ("Fedu", "Educación del padre", None),
+    ("failures", "Cursos desaprobados", ([1, 2, 3], ["0", "1", "2", "3 o más"])),
+    ("studytime", "Horas de estudio", None),
+    ("absences", "Inasistencias", ([1, 10, 20], ["0", "1–9", "10–19", "20 o más"])),
+    ("schoolsup", "Apoyo escolar", None),
+    ("famsup", "Apoyo familiar", None),
+    ("higher", "Quiere estudios superiores", None),
+    ("internet", "Internet en casa", None),
+]
+MISSING_GROUP = "(vacío)"
+
+
+class CohortAggregator:
+    def __init__(self, dimensions: list = None):
+        self.dimensions = dimensions or DIMENSIONS
+        # {columna: {grupo: [n, pass, suma proba, histograma de proba]}}
+        self.totals = {column: {} for column, _, _ in self.dimensions}
+        self.n_rows = 0
+
+    def _codes(self, values: pd.Series, bands):
+        if bands is not None:
+            edges, names = bands
+            numeric = pd.to_numeric(values, errors="coerce").to_numpy(dtype=float)
+            codes = np.digitize(numeric, edges)
+            codes[np.isnan(numeric)] = len(names)
+            return codes, list(names) + [MISSING_GROUP]
+        codes, uniques = pd.factorize(values, sort=True)
+        groups = [_group_name(u) for u in uniques]
+        codes = np.where(codes < 0, len(groups), codes)
+        return codes, groups + [MISSING_GROUP]
+
+    def update(self, scored: pd.DataFrame):
+        """Suma un bloque con columnas de entrada más `proba_pass` y `pred_int`."""
+        proba = scored["proba_pass"].to_numpy(dtype=float)
+        passed = scored["pred_int"].to_numpy(dtype=float)
+        bins = distribution.bin_codes(proba)
+        n_bins = distribution.PROBA_BINS
+        for column, _, bands in self.dimensions:
+            if column not in scored.columns:
+                continue
+            codes, groups = self._codes(scored[column], bands)
+            size = len(groups)
+            n = np.bincount(codes, minlength=size)
+            n_pass = np.bincount(codes, weights=passed, minlength=size)
+            proba_sum = np.bincount(codes, weights=proba, minlength=size)
+            hist = np.bincount(codes * n_bins + bins, minlength=size * n_bins).reshape(size, n_bins)
+            running = self.totals[column]
+            for k in np.flatnonzero(n):
+                acc = running.setdefault(groups[k], [0, 0.0, 0.0, np.zeros(n_bins, dtype=np.int64)])
+                acc[0] += int(n[k])
+                acc[1] += float(n_pass[k])
+                acc[2] += float(proba_sum[k])
+                acc[3] += hist[k]
+        self.n_rows += len(scored)
+
+    def _ordered_groups(self, column: str, bands) -> list:
+        groups = self.totals[column]
+        if bands is not None:
+            return [g for g in list(bands[1]) + [MISSING_GROUP] if g in groups]
+        return sorted(groups, key=_group_sort_key)
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Una fila por (dimensión, grupo) con tasa de PASS, `proba_pass` media y
+        percentiles 10/50/90 aproximados desde el histograma del grupo.
+        """
+        records = []
+        for column, label, bands in self.dimensions:
+            groups = self.totals[column]
+            for group in self._ordered_groups(column, bands):
+                n, n_pass, proba_sum, hist = groups[group]
+                p10, p50, p90 = distribution.quantiles_from_histogram(hist, (0.10, 0.50, 0.90))
+                records.append({
+                    "dimension": column,
+                    "label": label,
+                    "group": group,
+                    "n": n,
+                    "pass": int(round(n_pass)),
+                    "pass_rate": n_pass / n,
+                    "mean_proba": proba_sum / n,
+                    "p10": p10,
+                    "p50": p50,
+                    "p90": p90,
+                })
+        return pd.DataFrame(
+            records,
+            columns=["dimension", "label", "group", "n", "pass", "pass_rate", "mean_proba", "p10", "p50", "p90"],
+        )
+
+    def hist_frame(self) -> pd.DataFrame:
+        """Histograma de `proba_pass` por (dimensión, grupo): PROBA_BINS filas por grupo."""
+        parts = []
+        for column, _, bands in self.dimensions:
+            groups = self.totals[column]
+            for group in self._ordered_groups(column, bands):
+                part = distribution.histogram_frame(groups[group][3])
+                part.insert(0, "group", group)
+                part.insert(0, "dimension", column)
+                parts.append(part)
+        if not parts:
+            return pd.DataFrame(columns=["dimension", "group", "bin_start", "bin_end", "count", "share"])
+        return pd.concat(parts, ignore_index=True)
+
+
+def _group_name(value) -> str:
+    # Con vacíos, pandas lee las columnas enteras como float: 2.0 -> "2"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _group_sort_key(group: str):
+    # Grupos numéricos en orden numérico, luego texto, y el grupo vacío al final
+    if group == MISSING_GROUP:
+        return (2, 0, group)
+    try:
+        return (0, float(group), group)
+    except ValueError:
+        return (1, 0, group)
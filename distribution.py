@@ -0,0 +1,83 @@
+"""
+Resúmenes de `proba_pass` de tamaño fijo para los gráficos del lote.
+
+Los gráficos nunca reciben filas individuales: se calculan en el servidor un
+histograma de `PROBA_BINS` barras, una ECDF sobre `ECDF_POINTS` puntos de la
+malla [0, 1] y una tabla de cuantiles. Sobre el lote completo se usan las
+probabilidades ya ordenadas de ThresholdExplorer (cada resumen es una búsqueda
+binaria por punto, sin recorrer las filas). Por cohorte, `CohortAggregator`
+acumula bloque a bloque el mismo histograma por grupo, que sirve de boceto
+de cuantiles con error acotado por el ancho de una barra.
+
+El tamaño de lo que llega a Vega-Lite depende de estas constantes y del número
+de grupos, no de si el lote tiene 300 o 3 millones de filas.
+"""
+import numpy as np
+import pandas as pd
+
+PROBA_BINS = 40  # barras de 0,025
+ECDF_POINTS = 101
+QUANTILES = (0.01, 0.05, 0.10, 0.25, 0.50, 0.75, 0.90, 0.95, 0.99)
+BIN_EDGES = np.linspace(0.0, 1.0, PROBA_BINS + 1)
+
+
+def bin_codes(proba: np.ndarray) -> np.ndarray:
+    """Barra de cada probabilidad; 1.0 cae en la última."""
+    codes = np.floor(np.asarray(proba, dtype=float) * PROBA_BINS).astype(np.int64)
+    return np.clip(codes, 0, PROBA_BINS - 1)
+
+
+def histogram(sorted_proba: np.ndarray) -> pd.DataFrame:
+    """Conteo por barra a partir de las probabilidades ordenadas."""
+    # Misma regla que bin_codes: [borde, borde siguiente), la última barra cerrada
+    cuts = np.searchsorted(sorted_proba, BIN_EDGES[1:-1], side="left")
+    bounds = np.concatenate([[0], cuts, [len(sorted_proba)]])
+    return histogram_frame(np.diff(bounds))
+
+
+def histogram_frame(counts: np.ndarray) -> pd.DataFrame:
+    counts = np.asarray(counts, dtype=np.int64)
+    total = counts.sum()
+    return pd.DataFrame({
+        "bin_start": BIN_EDGES[:-1],
+        "bin_end": BIN_EDGES[1:],
+        "count": counts,
+        "share": counts / total if total else np.zeros(len(counts)),
+    })
+
+
+def ecdf(sorted_proba: np.ndarray) -> pd.DataFrame:
+    """Proporción del lote con `proba_pass` <= x en cada punto de la malla."""
+    grid = np.linspace(0.0, 1.0, ECDF_POINTS)
+    n = len(sorted_proba)
+    below = np.searchsorted(sorted_proba, grid, side="right")
+    return pd.DataFrame({"proba": grid, "ecdf": below / n if n else np.zeros(ECDF_POINTS)})
+
+
+def quantiles(sorted_proba: np.ndarray, qs=QUANTILES) -> pd.DataFrame:
+    """Cuantiles exactos (interpolación lineal, como np.quantile) sin volver a ordenar."""
+    n = len(sorted_proba)
+    if not n:
+        return pd.DataFrame({"q": list(qs), "proba": np.nan})
+    pos = np.asarray(qs, dtype=float) * (n - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.minimum(lo + 1, n - 1)
+    values = sorted_proba[lo] + (sorted_proba[hi] - sorted_proba[lo]) * (pos - lo)
+    return pd.DataFrame({"q": list(qs), "proba": values})
+
+
+def quantiles_from_histogram(counts: np.ndarray, qs=QUANTILES) -> np.ndarray:
+    """
+    Cuantiles aproximados desde un histograma de PROBA_BINS barras,
+    interpolando dentro de la barra (error máximo: el ancho de una barra).
+    """
+    counts = np.asarray(counts, dtype=float)
+    total = counts.sum()
+    if not total:
+        return np.full(len(qs), np.nan)
+    cum = np.cumsum(counts)
+    targets = np.asarray(qs, dtype=float) * total
+    idx = np.minimum(np.searchsorted(cum, targets, side="left"), PROBA_BINS - 1)
+    before = np.where(idx > 0, cum[idx - 1], 0.0)
+    inside = np.divide(targets - before, counts[idx], out=np.zeros(len(qs)), where=counts[idx] > 0)
+    return BIN_EDGES[idx] + np.clip(inside, 0.0, 1.0) / PROBA_BINS
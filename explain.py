@@ -0,0 +1,73 @@
+"""
+Explicaciones por variable para el bosque del modelo.
+
+Se recorre cada árbol una sola vez, vectorizado sobre todas las filas (ver
+`CompiledScorer.forest_contributions`), y los aportes de las columnas one-hot
+se vuelven a sumar en su variable original. Para cada estudiante:
+
+    proba_pass = sesgo + suma de aportes por variable
+
+Un aporte negativo empuja hacia FAIL y uno positivo hacia PASS.
+"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_TOP_K = 3
+DRIVER_SEPARATOR = " | "
+
+
+class ForestExplainer:
+    def __init__(self, scorer, prep):
+        self.scorer = scorer
+        self.prep = prep
+        self.features = list(scorer.num_features) + [feature for feature, _ in scorer.cat_slots]
+
+        # Matriz (n_out, n_variables) que suma cada columna preprocesada en su variable
+        self._fold = np.zeros((scorer.n_out, len(self.features)))
+        n_num = len(scorer.num_features)
+        self._fold[np.arange(n_num), np.arange(n_num)] = 1.0
+        for j, (_, positions) in enumerate(scorer.cat_slots):
+            self._fold[list(positions.values()), n_num + j] = 1.0
+
+    def explain_matrix(self, X: np.ndarray):
+        """(sesgo, DataFrame de aportes por variable) para una matriz ya preprocesada."""
+        bias, contrib = self.scorer.forest_contributions(X)
+        return bias, pd.DataFrame(contrib @ self._fold, columns=self.features)
+
+    def explain_frame(self, df: pd.DataFrame):
+        """`df` con las columnas del esquema del modelo (ver scoring.ensure_expected_columns)."""
+        X = self.prep.transform(df).astype(self.scorer.dtype)
+        return self.explain_matrix(X)
+
+    def explain_one(self, values: dict):
+        bias, contrib = self.explain_matrix(self.scorer.transform_one(values))
+        return bias, contrib.iloc[0]
+
+
+def build_explainer(pipe, scorer):
+    """Explicador del bosque, o None si el modelo no es un bosque compilable."""
+    if scorer is None or not scorer.is_forest:
+        return None
+    return ForestExplainer(scorer, pipe.named_steps["prep"])
+
+
+def top_drivers(contrib: pd.DataFrame, pred_int: np.ndarray, k: int = DEFAULT_TOP_K) -> list:
+    """
+    Por fila, las `k` variables que más empujan hacia la clase predicha
+    (hacia FAIL si pred_int == 0, hacia PASS si es 1), de mayor a menor.
+    Devuelve listas de (variable, aporte).
+    """
+    values = contrib.to_numpy()
+    sign = np.where(np.asarray(pred_int) == 1, 1.0, -1.0)[:, None]
+    order = np.argsort(-values * sign, axis=1, kind="stable")[:, :k]
+    features = np.array(contrib.columns, dtype=object)
+    picked = np.take_along_axis(values, order, axis=1)
+    toward = np.take_along_axis(values * sign, order, axis=1) > 0
+    return [
+        [(f, v) for f, v, keep in zip(features[o], p, t) if keep]
+        for o, p, t in zip(order, picked, toward)
+    ]
+
+
+def format_drivers(drivers: list) -> str:
+    return DRIVER_SEPARATOR.join(f"{feature} ({value:+.3f})" for feature, value in drivers)
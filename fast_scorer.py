@@ -0,0 +1,324 @@
+"""
+Predicción rápida de un solo estudiante sin pandas ni ColumnTransformer.
+
+`compile_pipeline` lee los parámetros ya ajustados del paso `prep`
+(media/escala del StandardScaler y posiciones del OneHotEncoder) y, si el
+modelo es un bosque de árboles, aplana sus nodos en matrices NumPy. Con eso
+un dict de valores del formulario se escribe directamente en un vector
+preasignado y se recorre el bosque sin pasar por el dispatch de sklearn.
+
+Para comprobar la paridad con `pipe.predict_proba`:
+    python fast_scorer.py --samples 5000
+"""
+import threading
+
+import numpy as np
+
+
+def _is_forest(model) -> bool:
+    # sklearn se importa al usarse: ya está cargado si el modelo vino de joblib
+    from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+
+    return isinstance(model, (RandomForestClassifier, ExtraTreesClassifier))
+
+
+def flatten_forest(forest):
+    """
+    Aplana los árboles del bosque en matrices (n_árboles, n_nodos_máx).
+    Devuelve None si el modelo no es un bosque. Las matrices se pueden guardar
+    junto al artefacto y cargarse con mmap (ver artifacts.py).
+    """
+    if not _is_forest(forest):
+        return None
+
+    trees = [est.tree_ for est in forest.estimators_]
+    n_trees = len(trees)
+    max_nodes = max(t.node_count for t in trees)
+    pos_class = list(forest.classes_).index(1)
+
+    # Nodos hoja: se apuntan a sí mismos con umbral +inf, así el recorrido
+    # de profundidad fija se queda quieto una vez que llega a una hoja.
+    idx = np.arange(max_nodes)
+    left = np.tile(idx, (n_trees, 1))
+    right = np.tile(idx, (n_trees, 1))
+    feat = np.zeros((n_trees, max_nodes), dtype=np.intp)
+    thr = np.full((n_trees, max_nodes), np.inf)
+    missing_left = np.zeros((n_trees, max_nodes), dtype=bool)
+    leaf_proba = np.zeros((n_trees, max_nodes))
+
+    for i, t in enumerate(trees):
+        n = t.node_count
+        split = t.children_left[:n] != -1
+        left[i, :n][split] = t.children_left[:n][split]
+        right[i, :n][split] = t.children_right[:n][split]
+        feat[i, :n][split] = t.feature[:n][split]
+        thr[i, :n][split] = t.threshold[:n][split]
+        # Hacia dónde manda sklearn un NaN en cada división (sin NaN al entrenar: al hijo con más muestras)
+        missing_left[i, :n][split] = np.asarray(t.missing_go_to_left[:n], dtype=bool)[split]
+
+        # Misma normalización que DecisionTreeClassifier.predict_proba
+        value = t.value[:n, 0, :]
+        normalizer = value.sum(axis=1)
+        normalizer[normalizer == 0.0] = 1.0
+        leaf_proba[i, :n] = value[:, pos_class] / normalizer
+
+    return {
+        "left": left,
+        "right": right,
+        "feat": feat,
+        "thr": thr,
+        "missing_left": missing_left,
+        "leaf_proba": leaf_proba,
+        "depth": np.int64(max(t.max_depth for t in trees)),
+    }
+
+
+class CompiledScorer:
+    """Puntúa dicts de entrada con la misma aritmética que el pipeline ajustado."""
+
+    def __init__(self, model, num_features, num_mean, num_scale, cat_slots, n_out, forest_arrays=None):
+        self.model = model
+        self.num_features = list(num_features)
+        self.num_mean = num_mean
+        self.num_scale = num_scale
+        # cat_slots: [(feature, {categoría: índice de columna})]
+        self.cat_slots = cat_slots
+        self.n_out = n_out
+
+        self.is_forest = _is_forest(model)
+        # Los árboles de sklearn trabajan en float32; el resto de modelos en float64
+        self.dtype = np.float32 if self.is_forest else np.float64
+        # Buffers preasignados por hilo: cada sesión de Streamlit corre en su propio hilo
+        self._local = threading.local()
+        self._pos_class = list(model.classes_).index(1)
+
+        if self.is_forest:
+            self._load_forest(forest_arrays if forest_arrays is not None else flatten_forest(model))
+
+    def _load_forest(self, arrays: dict):
+        self._left = arrays["left"]
+        self._right = arrays["right"]
+        self._feat = arrays["feat"]
+        self._thr = arrays["thr"]
+        if "missing_left" in arrays:
+            self._missing_left = arrays["missing_left"]
+        else:  # matrices guardadas antes de que se aplanara la regla de NaN
+            self._missing_left = flatten_forest(self.model)["missing_left"]
+        self._leaf_proba = arrays["leaf_proba"]
+        self._depth = int(arrays["depth"])
+        self._tree_idx = np.arange(self._left.shape[0])
+
+    # ------------------------------
+    #  Preprocesamiento
+    # ------------------------------
+    def _buffers(self):
+        local = self._local
+        if not hasattr(local, "row"):
+            local.num = np.empty(len(self.num_features), dtype=np.float64)
+            local.row = np.zeros((1, self.n_out), dtype=self.dtype)
+        return local.num, local.row
+
+    def transform_one(self, values: dict) -> np.ndarray:
+        """Vector preprocesado (1, n_out) para un estudiante; reutiliza el buffer del hilo."""
+        num, row = self._buffers()
+        row.fill(0.0)
+
+        # Un numérico ausente vale 0 (como ensure_expected_columns); None o NaN
+        # quedan como NaN y el bosque los enruta igual que sklearn
+        for j, feature in enumerate(self.num_features):
+            value = values.get(feature, 0)
+            num[j] = np.nan if value is None else value
+        if self.num_mean is not None:
+            num -= self.num_mean
+        if self.num_scale is not None:
+            num /= self.num_scale
+        row[0, : len(num)] = num
+
+        # Categorías desconocidas o faltantes quedan en cero (handle_unknown="ignore")
+        for feature, positions in self.cat_slots:
+            pos = positions.get(values.get(feature, ""))
+            if pos is not None:
+                row[0, pos] = 1.0
+        return row
+
+    def transform_many(self, rows: list) -> np.ndarray:
+        out = np.empty((len(rows), self.n_out), dtype=self.dtype)
+        for i, values in enumerate(rows):
+            out[i] = self.transform_one(values)[0]
+        return out
+
+    # ------------------------------
+    #  Modelo
+    # ------------------------------
+    def _go_left(self, X, rows, trees, node, feat, has_nan: bool) -> np.ndarray:
+        x = X[rows, feat]
+        go_left = x <= self._thr[trees, node]
+        if has_nan:
+            go_left |= np.isnan(x) & self._missing_left[trees, node]
+        return go_left
+
+    def _forest_proba(self, X: np.ndarray) -> np.ndarray:
+        rows = np.arange(X.shape[0])[:, None]
+        trees = self._tree_idx[None, :]
+        node = np.zeros((X.shape[0], len(self._tree_idx)), dtype=np.intp)
+        has_nan = bool(np.isnan(X).any())
+        for _ in range(self._depth):
+            go_left = self._go_left(X, rows, trees, node, self._feat[trees, node], has_nan)
+            node = np.where(go_left, self._left[trees, node], self._right[trees, node])
+
+        # Suma secuencial árbol por árbol, igual que el acumulador de sklearn
+        leaf = self._leaf_proba[trees, node]
+        return np.cumsum(leaf, axis=1)[:, -1] / len(self._tree_idx)
+
+    def forest_contributions(self, X: np.ndarray):
+        """
+        Aportes por columna preprocesada, con el mismo recorrido de profundidad
+        fija: cada división suma (valor del hijo − valor del nodo) a la columna
+        que usó para dividir. Devuelve (sesgo, aportes (n_filas, n_out)) con
+        sesgo + aportes.sum(axis=1) == probabilidad de PASS.
+        """
+        n_rows, n_trees = X.shape[0], len(self._tree_idx)
+        rows = np.arange(n_rows)[:, None]
+        trees = self._tree_idx[None, :]
+        row_offset = rows * self.n_out
+        node = np.zeros((n_rows, n_trees), dtype=np.intp)
+        contrib = np.zeros(n_rows * self.n_out)
+        has_nan = bool(np.isnan(X).any())
+        for _ in range(self._depth):
+            feat = self._feat[trees, node]
+            go_left = self._go_left(X, rows, trees, node, feat, has_nan)
+            child = np.where(go_left, self._left[trees, node], self._right[trees, node])
+            # En las hojas child == node, así que el aporte es cero
+            delta = self._leaf_proba[trees, child] - self._leaf_proba[trees, node]
+            contrib += np.bincount((row_offset + feat).ravel(), weights=delta.ravel(), minlength=contrib.size)
+            node = child
+
+        bias = float(self._leaf_proba[:, 0].mean())
+        return bias, contrib.reshape(n_rows, self.n_out) / n_trees
+
+    def predict_proba_matrix(self, X: np.ndarray) -> np.ndarray:
+        """Probabilidad de PASS para una matriz ya preprocesada."""
+        if self.is_forest:
+            return self._forest_proba(X)
+        return self.model.predict_proba(X)[:, self._pos_class]
+
+    def predict_one(self, values: dict) -> float:
+        return float(self.predict_proba_matrix(self.transform_one(values))[0])
+
+    def predict_many(self, rows: list) -> np.ndarray:
+        return self.predict_proba_matrix(self.transform_many(rows))
+
+
+def compile_pipeline(pipe, forest_arrays=None):
+    """
+    Construye un `CompiledScorer` a partir del pipeline ajustado. Si se pasan
+    `forest_arrays` (p. ej. mapeados desde el artefacto) no se recalculan.
+    Devuelve None si el paso `prep` no es StandardScaler + OneHotEncoder denso,
+    en cuyo caso se debe seguir usando `pipe.predict_proba`.
+    """
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    prep = pipe.named_steps["prep"]
+    model = pipe.named_steps["model"]
+
+    if prep.remainder != "drop" or len(prep.transformers_) < 2:
+        return None
+
+    _, scaler, num_features = prep.transformers_[0]
+    _, encoder, cat_features = prep.transformers_[1]
+    if not isinstance(scaler, StandardScaler) or not isinstance(encoder, OneHotEncoder):
+        return None
+    if encoder.drop is not None or getattr(encoder, "sparse_output", False):
+        return None
+    if encoder.handle_unknown != "ignore":
+        return None
+    if any(t != "drop" for _, t, _ in prep.transformers_[2:]):
+        return None
+
+    offset = len(num_features)
+    cat_slots = []
+    for feature, cats in zip(cat_features, encoder.categories_):
+        cat_slots.append((feature, {c: offset + k for k, c in enumerate(cats)}))
+        offset += len(cats)
+
+    return CompiledScorer(
+        model=model,
+        num_features=num_features,
+        num_mean=scaler.mean_ if scaler.with_mean else None,
+        num_scale=scaler.scale_ if scaler.with_std else None,
+        cat_slots=cat_slots,
+        n_out=offset,
+        forest_arrays=forest_arrays,
+    )
+
+
+def random_profiles(scorer: CompiledScorer, n: int, seed: int = 0) -> list:
+    """Perfiles sintéticos dentro del rango visto en entrenamiento (± 3 desviaciones)."""
+    rng = np.random.default_rng(seed)
+    mean = scorer.num_mean if scorer.num_mean is not None else np.zeros(len(scorer.num_features))
+    scale = scorer.num_scale if scorer.num_scale is not None else np.ones(len(scorer.num_features))
+    lo = np.floor(np.maximum(mean - 3 * scale, 0))
+    hi = np.ceil(mean + 3 * scale)
+
+    profiles = []
+    for _ in range(n):
+        values = {f: int(rng.integers(lo[j], hi[j] + 1)) for j, f in enumerate(scorer.num_features)}
+        for feature, positions in scorer.cat_slots:
+            values[feature] = rng.choice(list(positions))
+        profiles.append(values)
+    return profiles
+
+
+def verify_parity(
+    scorer: CompiledScorer, pipe, expected_cols, num_features, n: int = 256, n_single: int = 32
+) -> float:
+    """
+    Compara el scorer compilado con `pipe.predict_proba` sobre perfiles
+    sintéticos y devuelve la máxima diferencia absoluta (0.0 = idénticos).
+    La ruta por lotes se prueba con los `n` perfiles; `predict_one` comparte
+    con ella el recorrido del bosque, así que basta con los `n_single` primeros.
+    """
+    import pandas as pd
+
+    from scoring import ensure_expected_columns
+
+    profiles = random_profiles(scorer, n)
+    df = ensure_expected_columns(pd.DataFrame(profiles), expected_cols, num_features)
+    ref = pipe.predict_proba(df)[:, 1]
+    fast_batch = scorer.predict_many(profiles)
+    fast_single = np.array([scorer.predict_one(p) for p in profiles[:n_single]])
+    return float(max(np.abs(ref - fast_batch).max(), np.abs(ref[:n_single] - fast_single).max()))
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    import pandas as pd
+
+    from scoring import ensure_expected_columns, load_pipeline_and_schema
+
+    parser = argparse.ArgumentParser(description="Paridad y latencia del scorer compilado.")
+    parser.add_argument("--samples", type=int, default=2000)
+    args = parser.parse_args()
+
+    pipe, expected_cols, num_features, _ = load_pipeline_and_schema()
+    scorer = compile_pipeline(pipe)
+    if scorer is None:
+        raise SystemExit("El pipeline no es compatible con el scorer compilado.")
+
+    max_diff = verify_parity(scorer, pipe, expected_cols, num_features, n=args.samples, n_single=args.samples)
+    print(f"Paridad sobre {args.samples} perfiles: máx |Δ proba| = {max_diff:.3g}")
+
+    one = random_profiles(scorer, 1, seed=1)[0]
+    t0 = time.perf_counter()
+    for _ in range(200):
+        scorer.predict_one(one)
+    t_fast = (time.perf_counter() - t0) / 200
+    t0 = time.perf_counter()
+    for _ in range(20):
+        pipe.predict_proba(ensure_expected_columns(pd.DataFrame([one]), expected_cols, num_features))
+    t_pipe = (time.perf_counter() - t0) / 20
+    print(f"Latencia por estudiante: compilado {t_fast*1e3:.3f} ms · pipeline {t_pipe*1e3:.3f} ms")
+
+    raise SystemExit(0 if max_diff == 0.0 else 1)
@@ -0,0 +1,350 @@
+"""
+Ingesta de listas de estudiantes guiada por el esquema del modelo.
+
+- Solo se leen las columnas del esquema (más `target_pass` si viene).
+- Las categóricas se leen directamente como `category` y las ordinales
+  acotadas se guardan como int8: un bloque ocupa una fracción de lo que ocupa
+  con los int64/object que infiere `read_csv`.
+- Rangos y categorías permitidas se validan columna a columna con operaciones
+  vectorizadas. Las filas con algún valor inválido no se puntúan y quedan en
+  un reporte con una fila por (fila, columna, valor, motivo).
+
+Las categorías permitidas salen del OneHotEncoder del modelo; los rangos son
+los mismos que acepta el formulario individual. Además de CSV se aceptan
+Parquet y Feather (Arrow IPC), leídos con pyarrow (dependencia de Streamlit).
+"""
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+# (mínimo, máximo) aceptados, como en el formulario individual de la app
+NUMERIC_RANGES = {
+    "age": (10, 25),
+    "Medu": (0, 4),
+    "Fedu": (0, 4),
+    "traveltime": (1, 4),
+    "studytime": (1, 4),
+    "failures": (0, 4),
+    "absences": (0, 100),
+    "famrel": (1, 5),
+    "freetime": (1, 5),
+    "health": (1, 5),
+}
+YESNO = ["no", "yes"]
+# Solo se usan si el modelo no trae un OneHotEncoder del que leer las categorías
+DEFAULT_CATEGORIES = {
+    "sex": ["F", "M"], "address": ["R", "U"], "famsize": ["GT3", "LE3"],
+    "schoolsup": YESNO, "famsup": YESNO, "paid": YESNO, "activities": YESNO,
+    "higher": YESNO, "internet": YESNO,
+}
+REJECT_COLUMNS = ["row", "column", "value", "reason"]
+
+REASON_EMPTY = "vacío"
+REASON_NOT_NUMBER = "no numérico"
+REASON_NOT_INTEGER = "no entero"
+REASON_UNKNOWN = "categoría no permitida"
+
+
+class RecordError(ValueError):
+    """Un campo inválido en un registro individual (p. ej. una petición a serve_api.py)."""
+
+    def __init__(self, column: str, value, reason: str):
+        super().__init__(f"{column}: {reason} ({value!r})")
+        self.column = column
+        self.value = value
+        self.reason = reason
+
+
+def _compact_int(lo: int, hi: int):
+    for dtype in (np.int8, np.int16, np.int32):
+        info = np.iinfo(dtype)
+        if info.min <= lo and hi <= info.max:
+            return dtype
+    return np.int64
+
+
+class RosterSpec:
+    """Columnas, dtypes y valores válidos de una lista de estudiantes para un modelo concreto."""
+
+    def __init__(self, expected_cols: list, num_features: list, categories: dict, extra_cols: list = ()):
+        self.expected_cols = list(expected_cols)
+        self.extra_cols = list(extra_cols)
+        # {columna: (mínimo, máximo, dtype)}; sin rango conocido se valida solo que sea numérico
+        self.numeric = {}
+        for col in num_features:
+            if col in NUMERIC_RANGES:
+                lo, hi = NUMERIC_RANGES[col]
+                self.numeric[col] = (lo, hi, _compact_int(lo, hi))
+            else:
+                self.numeric[col] = (None, None, np.float64)
+        # {columna: lista de categorías permitidas}
+        self.categorical = {col: list(values) for col, values in categories.items() if col in self.expected_cols}
+
+    @classmethod
+    def from_pipeline(cls, pipe, expected_cols: list, num_features: list, cat_features: list, extra_cols=()):
+        categories = {col: DEFAULT_CATEGORIES.get(col, []) for col in cat_features}
+        prep = pipe.named_steps.get("prep")
+        for _, encoder, cols in getattr(prep, "transformers_", []):
+            if hasattr(encoder, "categories_"):
+                for col, values in zip(cols, encoder.categories_):
+                    categories[col] = [v for v in values if isinstance(v, str)]
+        return cls(expected_cols, num_features, categories, extra_cols)
+
+    @property
+    def columns(self) -> list:
+        return self.expected_cols + [c for c in self.extra_cols if c not in self.expected_cols]
+
+    def read_dtypes(self, present: list) -> dict:
+        # Las numéricas se infieren (pueden traer texto inválido); se compactan al validar
+        return {col: "category" for col in self.categorical if col in present}
+
+    def validate(self, df: pd.DataFrame, row_offset: int = 0):
+        """
+        (filas válidas con dtypes compactos, reporte de rechazos). `row` en el
+        reporte es el número de fila de datos en el archivo, empezando en 1.
+        """
+        n = len(df)
+        bad = np.zeros(n, dtype=bool)
+        clean = {}
+        reports = []
+
+        for col, (lo, hi, dtype) in self.numeric.items():
+            if col not in df.columns:
+                continue
+            raw = df[col]
+            values = pd.to_numeric(raw, errors="coerce").to_numpy(dtype=float)
+            missing = raw.isna().to_numpy()
+            not_number = np.isnan(values) & ~missing
+            finite = ~np.isnan(values)
+            not_integer = np.zeros(n, dtype=bool)
+            out_of_range = np.zeros(n, dtype=bool)
+            if lo is not None:
+                not_integer = finite & (values != np.round(values))
+                out_of_range = finite & ~not_integer & ((values < lo) | (values > hi))
+            checks = [
+                (missing, REASON_EMPTY),
+                (not_number, REASON_NOT_NUMBER),
+                (not_integer, REASON_NOT_INTEGER),
+                (out_of_range, f"fuera de rango [{lo}, {hi}]"),
+            ]
+            invalid = self._report(reports, raw, col, checks, row_offset)
+            bad |= invalid
+            clean[col] = np.where(invalid, lo if lo is not None else 0, values).astype(dtype)
+
+        for col, allowed in self.categorical.items():
+            if col not in df.columns:
+                continue
+            raw = df[col]
+            missing = raw.isna().to_numpy()
+            unknown = ~raw.isin(allowed).to_numpy() & ~missing
+            checks = [(missing, REASON_EMPTY), (unknown, REASON_UNKNOWN)]
+            bad |= self._report(reports, raw, col, checks, row_offset)
+            # Mismas categorías en todos los bloques (lo inválido queda como NaN y se descarta)
+            clean[col] = pd.Categorical(raw, categories=allowed)
+
+        out = df.assign(**clean)
+        rejects = pd.concat(reports, ignore_index=True) if reports else pd.DataFrame(columns=REJECT_COLUMNS)
+        if len(rejects):
+            rejects = rejects.sort_values(["row", "column"], kind="stable", ignore_index=True)
+        return out.loc[~bad], rejects
+
+    def coerce_record(self, record: dict) -> dict:
+        """
+        Valida un registro con las mismas reglas que `validate` y lo devuelve
+        con tipos limpios (int para las ordinales). Exige todas las columnas
+        que espera el modelo; lanza RecordError con el primer campo inválido.
+        """
+        out = {}
+        for col in self.expected_cols:
+            value = record.get(col)
+            if value is None or (isinstance(value, str) and not value.strip()):
+                raise RecordError(col, value, REASON_EMPTY)
+            if col in self.numeric:
+                lo, hi, _ = self.numeric[col]
+                try:
+                    number = float(value) if not isinstance(value, bool) else np.nan
+                except (TypeError, ValueError):
+                    number = np.nan
+                if not np.isfinite(number):
+                    raise RecordError(col, value, REASON_NOT_NUMBER)
+                if lo is not None:
+                    if number != round(number):
+                        raise RecordError(col, value, REASON_NOT_INTEGER)
+                    if number < lo or number > hi:
+                        raise RecordError(col, value, f"fuera de rango [{lo}, {hi}]")
+                    number = int(number)
+                out[col] = number
+            elif col in self.categorical:
+                if not isinstance(value, str) or value not in self.categorical[col]:
+                    raise RecordError(col, value, REASON_UNKNOWN)
+                out[col] = value
+            else:
+                out[col] = value
+        return out
+
+    @staticmethod
+    def _report(reports: list, raw: pd.Series, col: str, checks: list, row_offset: int) -> np.ndarray:
+        invalid = np.zeros(len(raw), dtype=bool)
+        for mask, reason in checks:
+            idx = np.flatnonzero(mask)
+            if len(idx):
+                reports.append(pd.DataFrame({
+                    "row": idx + row_offset + 1,
+                    "column": col,
+                    "value": raw.iloc[idx].astype(str).to_numpy(),
+                    "reason": reason,
+                }))
+            invalid |= mask
+        return invalid
+
+
+class RosterReader:
+    """
+    Lee una lista de estudiantes por bloques con la proyección de columnas y
+    los dtypes de `spec`, y entrega (bloque válido, rechazos del bloque).
+    `columns` son las columnas del archivo (para avisar de las que faltan);
+    `stats()` resume el tiempo de lectura y la memoria de los bloques leídos.
+    """
+
+    format = None
+
+    def __init__(self, file, spec: RosterSpec, chunk_rows: int):
+        self.file = file
+        self.spec = spec
+        self.chunk_rows = chunk_rows
+        self.total_rows = None  # si el formato lo sabe de antemano (para el progreso)
+        self.columns = self._read_columns()
+        self.parse_ms = 0.0
+        self.chunk_bytes_max = 0
+        self.rows = 0
+
+    def _read_columns(self) -> list:
+        raise NotImplementedError
+
+    def _chunks(self, present: list):
+        raise NotImplementedError
+
+    def raw_chunks(self):
+        """(desplazamiento de filas, bloque sin validar), para medir lectura y validación por separado."""
+        wanted = set(self.spec.columns)
+        present = [c for c in self.columns if c in wanted]
+        chunks = self._chunks(present)
+        while True:
+            t0 = time.perf_counter()
+            chunk = next(chunks, None)
+            self.parse_ms += (time.perf_counter() - t0) * 1000
+            if chunk is None:
+                return
+            self.chunk_bytes_max = max(self.chunk_bytes_max, int(chunk.memory_usage(deep=True).sum()))
+            yield self.rows, chunk
+            self.rows += len(chunk)
+
+    def __iter__(self):
+        for offset, chunk in self.raw_chunks():
+            yield self.spec.validate(chunk, row_offset=offset)
+
+    def stats(self) -> dict:
+        return {
+            "format": self.format,
+            "rows": self.rows,
+            "parse_ms": self.parse_ms,
+            "chunk_mb_max": self.chunk_bytes_max / 1e6,
+        }
+
+
+class CsvRosterReader(RosterReader):
+    format = "csv"
+
+    def _read_columns(self) -> list:
+        columns = list(pd.read_csv(self.file, nrows=0).columns)
+        if hasattr(self.file, "seek"):
+            self.file.seek(0)
+        return columns
+
+    def _chunks(self, present: list):
+        yield from pd.read_csv(
+            self.file,
+            usecols=present,
+            dtype=self.spec.read_dtypes(present),
+            chunksize=self.chunk_rows,
+        )
+
+
+class ParquetRosterReader(RosterReader):
+    """
+    Solo se leen las columnas del esquema. Las categóricas se piden como
+    diccionario a Arrow y llegan a pandas como `category` (índices + pocas
+    categorías), sin crear un objeto str por celda; las enteras sin nulos
+    pasan sin copia extra (`split_blocks`).
+    """
+
+    format = "parquet"
+
+    def _read_columns(self) -> list:
+        import pyarrow.parquet as pq
+
+        self._parquet = pq.ParquetFile(self.file, read_dictionary=list(self.spec.categorical))
+        self.total_rows = self._parquet.metadata.num_rows
+        return list(self._parquet.schema_arrow.names)
+
+    def _chunks(self, present: list):
+        for batch in self._parquet.iter_batches(batch_size=self.chunk_rows, columns=present):
+            yield batch.to_pandas(split_blocks=True)
+
+
+class FeatherRosterReader(RosterReader):
+    """
+    Feather v2 (Arrow IPC): se recorre lote de registros por lote de registros
+    (`get_batch`) leyendo solo las columnas del esquema, así la memoria depende
+    del tamaño de lote con que se escribió el archivo y no del archivo entero.
+    Las categóricas de texto se codifican como diccionario en Arrow.
+    """
+
+    format = "feather"
+
+    def _read_columns(self) -> list:
+        import pyarrow as pa
+
+        # Solo el esquema del archivo, sin leer los datos
+        columns = list(pa.ipc.open_file(self.file).schema.names)
+        if hasattr(self.file, "seek"):
+            self.file.seek(0)
+        return columns
+
+    def _chunks(self, present: list):
+        import pyarrow as pa
+
+        options = pa.ipc.IpcReadOptions(included_fields=[self.columns.index(c) for c in present])
+        ipc = pa.ipc.open_file(self.file, options=options)
+        n_batches = ipc.num_record_batches
+        seen = 0
+        for i in range(n_batches):
+            batch = ipc.get_batch(i).select(present)
+            seen += batch.num_rows
+            # El formato no guarda el total; se estima con el último lote y es exacto al final
+            self.total_rows = seen + batch.num_rows * (n_batches - i - 1)
+            for col in self.spec.categorical:
+                if col in present and pa.types.is_string(batch.schema.field(col).type):
+                    index = batch.schema.get_field_index(col)
+                    batch = batch.set_column(index, col, batch.column(index).dictionary_encode())
+            for start in range(0, batch.num_rows, self.chunk_rows):
+                yield batch.slice(start, self.chunk_rows).to_pandas(split_blocks=True)
+
+
+READERS = {
+    ".csv": CsvRosterReader,
+    ".parquet": ParquetRosterReader,
+    ".pq": ParquetRosterReader,
+    ".feather": FeatherRosterReader,
+    ".arrow": FeatherRosterReader,
+}
+UPLOAD_TYPES = [ext.lstrip(".") for ext in READERS]
+
+
+def open_roster(file, spec: RosterSpec, chunk_rows: int, name: str = None) -> RosterReader:
+    """Lector según la extensión de `name` (o de `file` si es una ruta); CSV si no se reconoce."""
+    name = name or (file if isinstance(file, str) else getattr(file, "name", ""))
+    ext = os.path.splitext(str(name).lower())[1]
+    return READERS.get(ext, CsvRosterReader)(file, spec, chunk_rows)
@@ -0,0 +1,178 @@
+"""
+Tiempos por etapa del camino caliente (lectura, esquema, `prep`, modelo,
+escritura, gráficos) en cada rerun.
+
+- `RerunTimer` acumula milisegundos por etapa durante un rerun (o rerun de
+  fragmento); una etapa que se repite por bloque se suma.
+- `StageMetrics` agrega todos los reruns del proceso en histogramas y los
+  escribe en formato de texto de Prometheus (para el textfile collector de
+  node_exporter o cualquier scraper de archivos).
+- `log_rerun` emite una línea JSON por rerun en el logger `panel.timings`.
+- `start_profile` / `finish_profile` capturan un rerun con cProfile (opcional).
+"""
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+logger = logging.getLogger("panel.timings")
+
+# Límites superiores (segundos) de los histogramas, como los de prometheus_client
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+TOTAL_STAGE = "total"
+
+
+class RerunTimer:
+    def __init__(self, section: str):
+        self.section = section
+        self.stages_ms = {}
+        self.t0 = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, (time.perf_counter() - t0) * 1000)
+
+    def add(self, name: str, elapsed_ms: float):
+        self.stages_ms[name] = self.stages_ms.get(name, 0.0) + elapsed_ms
+
+    def timed(self, name: str, iterable):
+        """Itera `iterable` sumando a `name` el tiempo de cada `next()` (p. ej. read_csv por bloques)."""
+        iterator = iter(iterable)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add(name, (time.perf_counter() - t0) * 1000)
+                return
+            self.add(name, (time.perf_counter() - t0) * 1000)
+            yield item
+
+    @property
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.t0) * 1000
+
+
+class _NullTimer:
+    """La misma interfaz que RerunTimer sin medir nada (CLI, API)."""
+
+    def stage(self, name: str):
+        return nullcontext()
+
+    def add(self, name: str, elapsed_ms: float):
+        pass
+
+    def timed(self, name: str, iterable):
+        return iterable
+
+
+NULL_TIMER = _NullTimer()
+
+
+class StageMetrics:
+    """Histogramas por (sección, etapa) para todo el proceso; seguro entre sesiones."""
+
+    def __init__(self, buckets: tuple = BUCKETS):
+        self.buckets = tuple(buckets)
+        # {(sección, etapa): [conteos por bucket..., suma en segundos, conteo]}
+        self._series = {}
+        self.reruns = {}
+        self._lock = threading.Lock()
+
+    def observe(self, section: str, stages_ms: dict, total_ms: float):
+        with self._lock:
+            self.reruns[section] = self.reruns.get(section, 0) + 1
+            for stage, ms in list(stages_ms.items()) + [(TOTAL_STAGE, total_ms)]:
+                seconds = ms / 1000
+                series = self._series.setdefault((section, stage), [0] * len(self.buckets) + [0.0, 0])
+                for i, bound in enumerate(self.buckets):
+                    if seconds <= bound:
+                        series[i] += 1
+                series[-2] += seconds
+                series[-1] += 1
+
+    def to_prometheus(self) -> str:
+        lines = [
+            "# HELP panel_stage_seconds Tiempo por etapa de cada rerun del panel.",
+            "# TYPE panel_stage_seconds histogram",
+        ]
+        with self._lock:
+            for (section, stage), series in sorted(self._series.items()):
+                labels = f'section="{section}",stage="{stage}"'
+                for bound, count in zip(self.buckets, series):
+                    lines.append(f'panel_stage_seconds_bucket{{{labels},le="{bound:g}"}} {count}')
+                lines.append(f'panel_stage_seconds_bucket{{{labels},le="+Inf"}} {series[-1]}')
+                lines.append(f"panel_stage_seconds_sum{{{labels}}} {series[-2]:.6f}")
+                lines.append(f"panel_stage_seconds_count{{{labels}}} {series[-1]}")
+            lines += [
+                "# HELP panel_reruns_total Reruns completados por sección.",
+                "# TYPE panel_reruns_total counter",
+            ]
+            lines += [f'panel_reruns_total{{section="{s}"}} {n}' for s, n in sorted(self.reruns.items())]
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: str, extra: str = ""):
+        """`extra`: más métricas en el mismo formato (p. ej. las de audit.AuditSink)."""
+        # Escritura atómica: el collector nunca lee un archivo a medias
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus() + extra)
+        os.replace(tmp_path, path)
+
+
+def configure_json_log(target: str):
+    """`target` = "-" para stderr o una ruta de archivo; vacío deja el logger sin handler propio."""
+    if not target or logger.handlers:
+        return
+    handler = logging.StreamHandler(sys.stderr) if target == "-" else logging.FileHandler(target, encoding="utf-8")
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def log_rerun(timer: RerunTimer, total_ms: float, **fields):
+    logger.info(json.dumps({
+        "event": "rerun",
+        "ts": round(time.time(), 3),
+        "section": timer.section,
+        "total_ms": round(total_ms, 3),
+        "stages_ms": {name: round(ms, 3) for name, ms in timer.stages_ms.items()},
+        **fields,
+    }, ensure_ascii=False))
+
+
+def accumulate(session_totals: dict, timer: RerunTimer, total_ms: float):
+    """Suma el rerun a los totales de la sesión: {(sección, etapa): [reruns, ms]}."""
+    for stage, ms in list(timer.stages_ms.items()) + [(TOTAL_STAGE, total_ms)]:
+        acc = session_totals.setdefault((timer.section, stage), [0, 0.0])
+        acc[0] += 1
+        acc[1] += ms
+
+
+def start_profile() -> cProfile.Profile:
+    """cProfile del hilo actual hasta `finish_profile` (un rerun de Streamlit corre en un solo hilo)."""
+    profiler = cProfile.Profile()
+    profiler.enable()
+    return profiler
+
+
+def finish_profile(profiler: cProfile.Profile, out_dir: str, name: str, top: int = 25) -> dict:
+    """Guarda el .prof (para snakeviz/pstats) y devuelve su ruta y las `top` funciones por tiempo acumulado."""
+    profiler.disable()
+    os.makedirs(out_dir, exist_ok=True)
+    path = os.path.join(out_dir, f"{name}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+    profiler.dump_stats(path)
+    buffer = io.StringIO()
+    pstats.Stats(profiler, stream=buffer).sort_stats("cumulative").print_stats(top)
+    return {"path": path, "summary": buffer.getvalue()}
@@ -0,0 +1,207 @@
+"""
+Registro del modelo activo con recarga en caliente desde ART_DIR.
+
+Un hilo en segundo plano revisa periódicamente ART_DIR (el puntero CURRENT
+o, en formato legado, la fecha/tamaño de `modelo_atrasos.joblib`). Cuando
+detecta una versión nueva la carga, compila el scorer rápido, la calienta y
+la valida contra el conjunto dorado de perfiles. Solo si todo pasa se
+reemplaza `registry.current` con una asignación atómica: los reruns en
+curso terminan con la versión anterior y los siguientes usan la nueva.
+"""
+import logging
+import os
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+import explain
+import fast_scorer
+import ingest
+import scoring
+
+logger = logging.getLogger("panel.model_registry")
+
+
+class ModelBundle:
+    """Todo lo que necesita una petición para puntuar con una versión concreta del modelo."""
+
+    def __init__(self, artifact: dict, scorer, timings: dict, explainer=None):
+        self.artifact = artifact
+        self.pipe = artifact["pipe"]
+        schema = artifact["schema"]
+        self.expected_cols = list(schema["expected_cols"])
+        self.num_features = list(schema["num_features"])
+        self.cat_features = list(schema["cat_features"])
+        self.best_thr = artifact["best_thr"]
+        self.labels = artifact["labels"]
+        self.model_version = artifact["model_version"]
+        self.version = artifact["version"]
+        self.scorer = scorer
+        self.explainer = explainer
+        # Dtypes y valores válidos para leer listas de estudiantes con este modelo (ver ingest.py)
+        self.roster_spec = ingest.RosterSpec.from_pipeline(
+            self.pipe, self.expected_cols, self.num_features, self.cat_features, extra_cols=[scoring.TARGET_COL]
+        )
+        self.timings = timings
+        self.loaded_at = time.time()
+
+    def predict_frame(self, rows: list) -> np.ndarray:
+        df = scoring.ensure_expected_columns(pd.DataFrame(rows), self.expected_cols, self.num_features)
+        return self.pipe.predict_proba(df)[:, 1]
+
+
+def build_bundle(art_dir: str, golden_rows: list, version: str = None) -> ModelBundle:
+    """Carga, compila, calienta y valida una versión. Lanza ValueError si no pasa la validación."""
+    timings = {}
+
+    t0 = time.perf_counter()
+    artifact = artifacts.load_artifact(art_dir, version=version)
+    timings["carga"] = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    pipe = artifact["pipe"]
+    schema = artifact["schema"]
+    scorer = fast_scorer.compile_pipeline(pipe, forest_arrays=artifact["forest_arrays"])
+    if scorer is not None:
+        diff = fast_scorer.verify_parity(scorer, pipe, schema["expected_cols"], schema["num_features"])
+        if diff != 0.0:
+            logger.warning("Scorer compilado descartado (Δ=%.3g); se usará el pipeline", diff)
+            scorer = None
+    explainer = explain.build_explainer(pipe, scorer)
+    timings["compilación"] = (time.perf_counter() - t0) * 1000
+
+    bundle = ModelBundle(artifact, scorer, timings, explainer)
+
+    # Warm-up + validación con el conjunto dorado
+    t0 = time.perf_counter()
+    validate_bundle(bundle, golden_rows)
+    timings["warm-up"] = (time.perf_counter() - t0) * 1000
+    return bundle
+
+
+def validate_bundle(bundle: ModelBundle, golden_rows: list):
+    # Sin perfiles dorados de ART_DIR (ni del llamador) se usan los registrados en el manifest
+    manifest_golden = (bundle.artifact["manifest"] or {}).get("golden") or {}
+    golden_rows = golden_rows or manifest_golden.get("rows") or []
+    if not golden_rows:
+        raise ValueError(
+            f"No hay perfiles dorados para validar el modelo: falta {artifacts.GOLDEN_FILE} en ART_DIR "
+            "y la versión no los trae en su manifest"
+        )
+    missing = [c for c in bundle.expected_cols if golden_rows and c not in golden_rows[0]]
+    if missing:
+        raise ValueError(f"El modelo espera columnas que el conjunto dorado no tiene: {missing}")
+
+    proba = bundle.predict_frame(golden_rows)
+    if proba.shape != (len(golden_rows),) or not np.all(np.isfinite(proba)):
+        raise ValueError("El modelo devolvió probabilidades inválidas para el conjunto dorado")
+    if np.any((proba < 0) | (proba > 1)):
+        raise ValueError("El modelo devolvió probabilidades fuera de [0, 1]")
+
+    if bundle.scorer is not None:
+        fast = bundle.scorer.predict_many(golden_rows)
+        if not np.array_equal(fast, proba):
+            raise ValueError("El scorer compilado no coincide con el pipeline en el conjunto dorado")
+
+    if bundle.explainer is not None:
+        df = scoring.ensure_expected_columns(pd.DataFrame(golden_rows), bundle.expected_cols, bundle.num_features)
+        bias, contrib = bundle.explainer.explain_frame(df)
+        if not np.allclose(bias + contrib.sum(axis=1).to_numpy(), proba, rtol=0, atol=1e-9):
+            raise ValueError("Los aportes por variable no suman la probabilidad del modelo")
+
+    # Si el manifest trae perfiles dorados con su probabilidad al exportar, deben reproducirse
+    golden = (bundle.artifact["manifest"] or {}).get("golden")
+    if golden and golden.get("rows"):
+        reproduced = bundle.predict_frame(golden["rows"])
+        if not np.allclose(reproduced, golden["proba"], rtol=0, atol=1e-9):
+            raise ValueError("El modelo no reproduce las probabilidades doradas registradas en su manifest")
+
+
+class ModelRegistry:
+    def __init__(self, art_dir: str, golden_rows: list, poll_seconds: float = 10.0):
+        self.art_dir = art_dir
+        self.poll_seconds = poll_seconds
+        self.golden_rows = list(golden_rows) + artifacts.load_golden_samples(art_dir)
+        self.current = None
+        self.swaps = 0
+        self.last_error = None
+        self.last_check = None
+        self._signature = None
+        self._failed_signature = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _read_signature(self):
+        version = artifacts.current_version(self.art_dir)
+        if version is not None:
+            return ("version", version)
+        try:
+            st = os.stat(artifacts.get_model_path(self.art_dir))
+        except FileNotFoundError:
+            return None
+        return ("legacy", st.st_mtime_ns, st.st_size)
+
+    def load_initial(self) -> ModelBundle:
+        """Carga síncrona al arrancar; aquí un error sí debe detener la app."""
+        self._signature = self._read_signature()
+        self.current = build_bundle(self.art_dir, self.golden_rows)
+        return self.current
+
+    def check_once(self) -> bool:
+        """Revisa ART_DIR y cambia de versión si hay una nueva válida. Devuelve True si hubo cambio."""
+        self.last_check = time.time()
+        signature = self._read_signature()
+        if signature is None or signature == self._signature or signature == self._failed_signature:
+            return False
+
+        version = signature[1] if signature[0] == "version" else None
+        try:
+            bundle = build_bundle(self.art_dir, self.golden_rows, version=version)
+        except Exception as exc:  # la versión vieja sigue sirviendo
+            self._failed_signature = signature
+            self.last_error = f"{type(exc).__name__}: {exc}"
+            logger.error("No se pudo activar el modelo nuevo (%s); se mantiene el actual", self.last_error)
+            return False
+
+        previous = self.current
+        self.current = bundle
+        self._signature = signature
+        self._failed_signature = None
+        self.last_error = None
+        self.swaps += 1
+        logger.info(
+            "Modelo cambiado en caliente: %s -> %s",
+            previous.model_version if previous else None, bundle.model_version,
+        )
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.poll_seconds):
+            try:
+                self.check_once()
+            except Exception:
+                logger.exception("Error revisando ART_DIR")
+
+    def start(self):
+        if self._thread is None and self.poll_seconds > 0:
+            self._thread = threading.Thread(target=self._run, name="model-registry", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def status(self) -> dict:
+        bundle = self.current
+        return {
+            "version": bundle.version if bundle else None,
+            "model_version": bundle.model_version if bundle else None,
+            "loaded_at": bundle.loaded_at if bundle else None,
+            "compiled": bundle.scorer is not None if bundle else False,
+            "swaps": self.swaps,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "golden_rows": len(self.golden_rows),
+        }
@@ -0,0 +1,70 @@
+"""
+Caché LRU de predicciones individuales, compartida entre sesiones.
+
+La clave es la tupla canónica de los valores del formulario más la versión
+del modelo, de modo que reemplazar el artefacto invalida las entradas viejas
+sin necesidad de vaciar la caché.
+"""
+import threading
+from collections import OrderedDict
+
+
+def canonical_key(values: dict, features: list, model_version: str) -> tuple:
+    """Tupla estable: enteros y textos normalizados, en el orden de `features`."""
+    key = []
+    for feature in features:
+        v = values.get(feature)
+        if isinstance(v, float) and v.is_integer():
+            v = int(v)
+        elif hasattr(v, "item"):  # escalares NumPy
+            v = v.item()
+        key.append(v)
+    return (model_version, *key)
+
+
+class PredictionCache:
+    """LRU acotada por número de entradas, segura entre hilos."""
+
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
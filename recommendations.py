@@ -0,0 +1,341 @@
+"""
+Motor de recomendaciones basado en una tabla de reglas.
+
+Las mismas reglas alimentan la tarjeta HTML del estudiante individual y las
+columnas `risk_tier` / `reco_tags` del lote. Cada regla es una máscara NumPy
+sobre columnas completas, así que un archivo entero se evalúa en una sola
+pasada, sin recorrer las filas en Python.
+"""
+import numpy as np
+import pandas as pd
+
+# ==============================
+#  Tabla de reglas
+# ==============================
+# Niveles de riesgo: (límite superior de proba_pass, nivel, título, texto, etiqueta)
+RISK_TIERS = [
+    (
+        0.35,
+        "Riesgo alto",
+        "Riesgo alto de desaprobación",
+        "El modelo estima una probabilidad baja de aprobación. "
+        "Es importante activar un plan de acompañamiento cercano y sistemático.",
+        "⚠️ Riesgo alto",
+    ),
+    (
+        0.5,
+        "Riesgo moderado",
+        "Riesgo moderado de desaprobación",
+        "El estudiante se encuentra en una zona de riesgo moderado. "
+        "Conviene intervenir pronto para evitar que las brechas se amplíen.",
+        "⚠️ Riesgo moderado",
+    ),
+    (
+        0.7,
+        "Seguimiento",
+        "Zona intermedia (seguimiento)",
+        "El pronóstico es intermedio. Se recomienda hacer seguimiento cercano, "
+        "reforzar hábitos de estudio y monitorear avances.",
+        "🔎 Seguimiento",
+    ),
+    (
+        np.inf,
+        "Buen pronóstico",
+        "Buen pronóstico de aprobación",
+        "El modelo estima una buena probabilidad de aprobación. "
+        "Aun así, es clave mantener hábitos de estudio y apoyo consistentes.",
+        "✅ Buen pronóstico",
+    ),
+]
+RISK_BOUNDS = np.array([tier[0] for tier in RISK_TIERS])
+
+# Cada sección es una lista de cadenas if/elif: [(condición, texto, etiquetas), ...].
+# En cada cadena gana la primera condición que se cumple; `None` es el `else`.
+SECTION_RULES = {
+    "support": [
+        [
+            (
+                lambda c: (c["schoolsup"] == "no") & (c["famsup"] == "no"),
+                "No se reporta apoyo educativo sistemático ni desde el colegio ni desde la familia. "
+                "Se sugiere coordinar un plan conjunto de tutorías, refuerzos y acompañamiento en casa.",
+                ["Apoyo escolar", "Apoyo familiar"],
+            ),
+            (
+                lambda c: c["schoolsup"] == "no",
+                "Se observa apoyo familiar, pero no apoyo educativo extra desde el colegio. "
+                "Podría valorarse la participación en talleres, reforzamientos o tutorías institucionales.",
+                ["Apoyo escolar"],
+            ),
+            (
+                lambda c: c["famsup"] == "no",
+                "Existe apoyo desde el colegio, pero el acompañamiento familiar es limitado. "
+                "Conviene fortalecer la comunicación con la familia y acordar rutinas de estudio en casa.",
+                ["Apoyo familiar"],
+            ),
+            (
+                None,
+                "Se cuenta con apoyos escolar y/o familiar. Es importante mantenerlos y revisar su frecuencia y calidad, "
+                "asegurando espacios de comunicación periódica sobre el progreso académico.",
+                ["Mantener apoyos"],
+            ),
+        ],
+    ],
+    "habits": [
+        [
+            (
+                lambda c: c["studytime"] <= 2,
+                "Incrementar gradualmente las horas de estudio semanal, organizando un horario fijo de repaso y tareas "
+                "(por ejemplo, bloques de 30–40 minutos al día).",
+                ["Rutina de estudio"],
+            ),
+            (
+                lambda c: (c["studytime"] == 3) & (c["proba_pass"] < 0.7),
+                "Revisar la calidad del tiempo de estudio (ambiente, concentración, planificación) y promover técnicas de estudio activas.",
+                ["Calidad de estudio"],
+            ),
+        ],
+        [
+            (
+                lambda c: c["absences"] >= 20,
+                "El número de inasistencias es alto. Es prioritario trabajar en un plan de asistencia regular, "
+                "identificando causas de las faltas y acordando compromisos con familia y colegio.",
+                ["Asistencia crítica"],
+            ),
+            (
+                lambda c: c["absences"] >= 10,
+                "Las inasistencias podrían estar afectando el rendimiento. Se recomienda monitorear asistencia y avisos tempranos "
+                "ante nuevas ausencias.",
+                ["Asistencia a clases"],
+            ),
+        ],
+        [
+            (
+                lambda c: c["failures"] >= 2,
+                "Considerar un plan de recuperación focalizado en las áreas desaprobadas (refuerzos, tutorías, evaluación continua).",
+                ["Plan de recuperación"],
+            ),
+            (
+                lambda c: (c["failures"] == 1) & (c["proba_pass"] < 0.7),
+                "Acompañar especialmente las asignaturas en las que ya hubo dificultades, con seguimiento de tareas y evaluaciones parciales.",
+                ["Refuerzo específico"],
+            ),
+        ],
+    ],
+    "wellbeing": [
+        [
+            (
+                lambda c: c["health"] <= 2,
+                "Explorar posibles dificultades de salud física o emocional. De ser necesario, derivar a psicopedagogía o consejería "
+                "para brindar apoyo oportuno.",
+                ["Bienestar integral"],
+            ),
+        ],
+        [
+            (
+                lambda c: (c["freetime"] >= 4) & (c["studytime"] <= 2),
+                "Equilibrar el tiempo libre con responsabilidades académicas, manteniendo espacios de descanso pero evitando la postergación constante de tareas.",
+                ["Equilibrio tiempo libre"],
+            ),
+        ],
+    ],
+    "aspiration": [
+        [
+            (
+                lambda c: c["higher"] == "yes",
+                "El interés por estudios superiores puede usarse como motor de motivación. "
+                "Vincular metas de corto plazo (tareas, evaluaciones) con ese proyecto de futuro.",
+                ["Proyecto de vida"],
+            ),
+            (
+                None,
+                "Explorar intereses, talentos y posibles proyectos de vida puede ayudar a darle sentido al esfuerzo académico actual.",
+                ["Orientación vocacional"],
+            ),
+        ],
+    ],
+}
+
+# Texto y etiquetas cuando ninguna regla de la sección se cumple
+SECTION_DEFAULTS = {
+    "habits": (
+        "Mantener una rutina de estudio estable y una asistencia regular a clases, revisando periódicamente tareas y evaluaciones.",
+        ["Hábitos saludables"],
+    ),
+    "wellbeing": (
+        "Continuar cuidando el bienestar emocional y físico del estudiante, reforzando espacios de escucha y confianza con familia y tutores.",
+        ["Seguimiento socioemocional"],
+    ),
+}
+
+RULE_COLUMNS = [
+    "proba_pass", "schoolsup", "famsup", "studytime", "absences",
+    "failures", "health", "freetime", "higher",
+]
+
+TAG_SEPARATOR = " | "
+
+
+# ==============================
+#  Evaluación vectorizada
+# ==============================
+def _first_match(chain: list, cols: dict, n: int) -> np.ndarray:
+    """Índice de la primera regla que se cumple en cada fila (-1 si ninguna)."""
+    chosen = np.full(n, -1, dtype=np.int8)
+    for i, (cond, _, _) in enumerate(chain):
+        free = chosen == -1
+        mask = free if cond is None else free & np.asarray(cond(cols), dtype=bool)
+        chosen[mask] = i
+    return chosen
+
+
+def evaluate(cols: dict) -> np.ndarray:
+    """
+    Evalúa toda la tabla sobre columnas NumPy de igual largo. Devuelve una
+    matriz (n_filas, 1 + n_cadenas): nivel de riesgo y regla elegida en cada cadena.
+    """
+    proba = np.asarray(cols["proba_pass"], dtype=float)
+    n = len(proba)
+    tier = np.minimum(np.searchsorted(RISK_BOUNDS, proba, side="right"), len(RISK_TIERS) - 1)
+    codes = [tier.astype(np.int8)]
+    for chains in SECTION_RULES.values():
+        codes.extend(_first_match(chain, cols, n) for chain in chains)
+    return np.column_stack(codes)
+
+
+def _sections_for(code) -> dict:
+    """Textos y etiquetas por sección para una combinación de reglas elegidas."""
+    sections = {}
+    pos = 1
+    for section, chains in SECTION_RULES.items():
+        parts, tags = [], []
+        for chain in chains:
+            i = code[pos]
+            pos += 1
+            if i >= 0:
+                _, text, rule_tags = chain[i]
+                parts.append(text)
+                tags.extend(rule_tags)
+        if not parts and section in SECTION_DEFAULTS:
+            text, default_tags = SECTION_DEFAULTS[section]
+            parts.append(text)
+            tags.extend(default_tags)
+        sections[section] = (parts, tags)
+    return sections
+
+
+def _intervention_tags(code) -> str:
+    sections = _sections_for(code)
+    return TAG_SEPARATOR.join(tag for _, tags in sections.values() for tag in tags)
+
+
+def annotate_frame(df: pd.DataFrame, proba: np.ndarray) -> dict:
+    """
+    Columnas `risk_tier` y `reco_tags` para todo un lote puntuado. Las
+    combinaciones de reglas distintas son pocas, así que el texto se arma una
+    vez por combinación y se reparte a las filas con el índice inverso.
+    """
+    cols = {c: df[c].to_numpy() for c in RULE_COLUMNS if c != "proba_pass"}
+    cols["proba_pass"] = np.asarray(proba, dtype=float)
+    codes = evaluate(cols)
+    if len(codes) == 0:
+        empty = np.array([], dtype=object)
+        return {"risk_tier": empty, "reco_tags": empty}
+
+    # Cada código cabe en 3 bits (-1..6): se empaqueta la fila en un entero y
+    # np.unique trabaja en 1-D, mucho más rápido que np.unique(axis=0)
+    shifts = np.arange(codes.shape[1], dtype=np.int64) * 3
+    packed = ((codes.astype(np.int64) + 1) << shifts).sum(axis=1)
+    _, first, inverse = np.unique(packed, return_index=True, return_inverse=True)
+    tier_names = np.array([tier[1] for tier in RISK_TIERS], dtype=object)
+    tags = np.array([_intervention_tags(codes[i]) for i in first], dtype=object)
+    return {"risk_tier": tier_names[codes[:, 0]], "reco_tags": tags[inverse.reshape(-1)]}
+
+
+# ==============================
+#  Tarjeta individual (HTML)
+# ==============================
+def build_recommendations_html(
+    proba_pass: float,
+    pred_label: str,
+    schoolsup: str,
+    famsup: str,
+    studytime: int,
+    absences: int,
+    failures: int,
+    health: int,
+    freetime: int,
+    higher: str,
+) -> str:
+    values = {
+        "proba_pass": proba_pass, "schoolsup": schoolsup, "famsup": famsup,
+        "studytime": studytime, "absences": absences, "failures": failures,
+        "health": health, "freetime": freetime, "higher": higher,
+    }
+    code = evaluate({k: np.asarray([v]) for k, v in values.items()})[0]
+
+    _, _, risk_label, risk_text, risk_tag = RISK_TIERS[code[0]]
+    sections = _sections_for(code)
+    support_parts, support_tags = sections["support"]
+    habits_parts, habits_tags = sections["habits"]
+    wellbeing_parts, wellbeing_tags = sections["wellbeing"]
+    aspiration_parts, aspiration_tags = sections["aspiration"]
+
+    wellbeing_text = " ".join(wellbeing_parts) + " " + " ".join(aspiration_parts)
+
+    # Construcción de chips/tags
+    def join_tags(tags):
+        if not tags:
+            return ""
+        return "".join(f'<span class="reco-tag">{t}</span>' for t in tags)
+
+    risk_tags_html = join_tags([risk_tag])
+    support_tags_html = join_tags(support_tags)
+    habits_tags_html = join_tags(habits_tags)
+    wellbeing_tags_html = join_tags(wellbeing_tags + aspiration_tags)
+
+    support_text = " ".join(support_parts)
+    habits_text = " ".join(habits_parts)
+
+    html = f"""
+<div class="reco-card">
+  <div class="reco-header">
+    <div>
+      <div class="reco-title">Recomendaciones personalizadas</div>
+      <div class="reco-subtitle">Sugerencias orientativas a partir de los hábitos y apoyos registrados.</div>
+    </div>
+    <div class="reco-pill-beta">
+      <span>Fase beta</span>
+      <span>🧪</span>
+    </div>
+  </div>
+  <div class="reco-body">
+    <div>
+      <div class="reco-section-label">{risk_label}</div>
+      <div class="reco-section-text">{risk_text}</div>
+      <div class="reco-tags">{risk_tags_html}</div>
+    </div>
+    <div class="reco-divider"></div>
+    <div>
+      <div class="reco-section-label">Apoyos escolar y familiar</div>
+      <div class="reco-section-text">{support_text}</div>
+      <div class="reco-tags">{support_tags_html}</div>
+    </div>
+    <div class="reco-divider"></div>
+    <div>
+      <div class="reco-section-label">Hábitos de estudio y asistencia</div>
+      <div class="reco-section-text">{habits_text}</div>
+      <div class="reco-tags">{habits_tags_html}</div>
+    </div>
+    <div class="reco-divider"></div>
+    <div>
+      <div class="reco-section-label">Bienestar y proyecto de vida</div>
+      <div class="reco-section-text">{wellbeing_text}</div>
+      <div class="reco-tags">{wellbeing_tags_html}</div>
+    </div>
+  </div>
+  <div class="reco-footer-note">
+    Estas recomendaciones son referenciales y deben complementarse con entrevistas, observación en aula y los criterios del equipo docente y psicopedagógico.
+  </div>
+</div>
+"""
+    return html
@@ -0,0 +1,219 @@
+"""
+Predicción por lote sin interfaz (entrada CSV, Parquet o Feather; salida CSV o
+Parquet), repartida en varios procesos.
+
+Uso:
+    python score_batch.py estudiantes.csv predicciones.csv --workers 8
+    python score_batch.py estudiantes.parquet predicciones.parquet --chunk-rows 50000
+
+Cada proceso carga el modelo activo de ART_DIR una sola vez y puntúa bloques de
+filas; el proceso principal escribe los resultados en orden, con las mismas
+columnas `proba_pass` / `pred_int` / `pred_label` / `risk_tier` / `reco_tags`
+que produce la app (y `top_drivers` con `--explain`, varias veces más lento).
+Igual que en la app, solo se leen las columnas
+del esquema y las filas con valores inválidos no se puntúan (ver ingest.py);
+`--rejects` guarda el reporte.
+"""
+import argparse
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+import artifacts
+import cohorts
+import explain
+import fast_scorer
+import ingest
+import scoring
+
+DEFAULT_CHUNK_ROWS = 20_000
+
+# Estado por proceso de trabajo (se inicializa una vez en `_init_worker`)
+_WORKER = {}
+
+
+def _init_worker(explain_rows: bool = False):
+    # Versión activa de ART_DIR: los arrays se mapean con mmap y se comparten entre procesos
+    artifact = artifacts.load_artifact()
+    explainer = None
+    if explain_rows:
+        scorer = fast_scorer.compile_pipeline(artifact["pipe"], forest_arrays=artifact["forest_arrays"])
+        explainer = explain.build_explainer(artifact["pipe"], scorer)
+    _WORKER.update(
+        pipe=artifact["pipe"],
+        spec=roster_spec(artifact),
+        explainer=explainer,
+        expected_cols=list(artifact["schema"]["expected_cols"]),
+        num_features=list(artifact["schema"]["num_features"]),
+        thr=artifact["best_thr"],
+        labels=artifact["labels"],
+    )
+
+
+def roster_spec(artifact: dict) -> ingest.RosterSpec:
+    schema = artifact["schema"]
+    return ingest.RosterSpec.from_pipeline(
+        artifact["pipe"], schema["expected_cols"], schema["num_features"], schema["cat_features"],
+        extra_cols=[scoring.TARGET_COL],
+    )
+
+
+def _score_chunk(offset: int, df: pd.DataFrame):
+    """(bloque puntuado o None si no quedó ninguna fila válida, rechazos del bloque)."""
+    df, rejects = _WORKER["spec"].validate(df, row_offset=offset)
+    if df.empty:
+        return None, rejects
+    scored = scoring.score_frame(
+        _WORKER["pipe"], df, _WORKER["expected_cols"], _WORKER["num_features"],
+        thr=_WORKER["thr"], labels=_WORKER["labels"], explainer=_WORKER["explainer"],
+    )
+    return scored, rejects
+
+
+def _is_parquet(path: str) -> bool:
+    return path.lower().endswith((".parquet", ".pq"))
+
+
+class OutputWriter:
+    """Escribe bloques puntuados en CSV o Parquet según la extensión de salida."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._parquet = _is_parquet(path)
+        self._writer = None
+        self._first = True
+
+    def write(self, df: pd.DataFrame):
+        if self._parquet:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._writer = pq.ParquetWriter(self.path, table.schema)
+            else:
+                table = pa.Table.from_pandas(df, schema=self._writer.schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="w" if self._first else "a", header=self._first, index=False)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def run(
+    input_path: str,
+    output_path: str,
+    workers: int,
+    chunk_rows: int,
+    cohorts_path: str = None,
+    rejects_path: str = None,
+    explain_rows: bool = False,
+) -> dict:
+    t0 = time.perf_counter()
+    spec = roster_spec(artifacts.load_artifact())
+    # Solo las columnas de `spec`; el formato sale de la extensión (CSV, Parquet o Feather)
+    reader = ingest.open_roster(input_path, spec, chunk_rows)
+    writer = OutputWriter(output_path)
+    cohort_agg = cohorts.CohortAggregator() if cohorts_path else None
+    n_rows = 0
+    n_pass = 0
+    n_rejected = 0
+    rejects_header = True
+
+    # Como máximo 2 bloques en vuelo por proceso: la memoria no depende del tamaño del archivo
+    max_in_flight = 2 * workers
+    pending = deque()
+
+    def drain_one():
+        nonlocal n_rows, n_pass, n_rejected, rejects_header
+        scored, rejects = pending.popleft().result()
+        if len(rejects):
+            n_rejected += rejects["row"].nunique()
+            if rejects_path:
+                rejects.to_csv(rejects_path, mode="w" if rejects_header else "a", header=rejects_header, index=False)
+                rejects_header = False
+        if scored is None:
+            return
+        writer.write(scored)
+        if cohort_agg is not None:
+            cohort_agg.update(scored)
+        n_rows += len(scored)
+        n_pass += int(scored["pred_int"].sum())
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(explain_rows,)) as pool:
+            for offset, chunk in reader.raw_chunks():
+                pending.append(pool.submit(_score_chunk, offset, chunk))
+                if len(pending) >= max_in_flight:
+                    drain_one()
+            while pending:
+                drain_one()
+    finally:
+        writer.close()
+
+    if cohort_agg is not None:
+        cohort_agg.frame().to_csv(cohorts_path, index=False)
+    if rejects_path and rejects_header:
+        pd.DataFrame(columns=ingest.REJECT_COLUMNS).to_csv(rejects_path, index=False)
+
+    elapsed = time.perf_counter() - t0
+    return {
+        "rows": n_rows,
+        "pass": n_pass,
+        "fail": n_rows - n_pass,
+        "rejected": n_rejected,
+        "ingest": reader.stats(),
+        "seconds": elapsed,
+        "rows_per_sec": n_rows / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Predicción PASS/FAIL por lote (CSV, Parquet o Feather).")
+    parser.add_argument("input", help="Archivo de entrada (.csv, .parquet o .feather)")
+    parser.add_argument("output", help="Archivo de salida (.csv o .parquet)")
+    parser.add_argument(
+        "--workers", type=int, default=os.cpu_count() or 1,
+        help="Número de procesos (por defecto, todos los núcleos)",
+    )
+    parser.add_argument(
+        "--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS,
+        help=f"Filas por bloque enviado a cada proceso (por defecto {DEFAULT_CHUNK_ROWS})",
+    )
+    parser.add_argument(
+        "--cohorts", default=None,
+        help="CSV opcional con tasa de PASS y proba_pass media por cohorte (sexo, zona, tramos de inasistencias…)",
+    )
+    parser.add_argument(
+        "--rejects", default=None,
+        help="CSV opcional con las filas rechazadas: fila, columna, valor y motivo",
+    )
+    parser.add_argument(
+        "--explain", action="store_true",
+        help="Agrega la columna top_drivers (variables que más empujan cada predicción); varias veces más lento",
+    )
+    args = parser.parse_args(argv)
+
+    stats = run(
+        args.input, args.output, args.workers, args.chunk_rows,
+        cohorts_path=args.cohorts, rejects_path=args.rejects, explain_rows=args.explain,
+    )
+    print(
+        f"{stats['rows']} estudiantes puntuados en {stats['seconds']:.2f}s "
+        f"({stats['rows_per_sec']:.0f} filas/s) · PASS={stats['pass']} FAIL={stats['fail']} · "
+        f"rechazadas={stats['rejected']} · lectura {stats['ingest']['format']} "
+        f"{stats['ingest']['parse_ms']:.0f} ms",
+        file=sys.stderr,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
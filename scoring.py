@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+
+import artifacts
+import explain
+import instrumentation
+import recommendations
+
+# ==============================
+#  Política de decisión
+# ==============================
+# Valores por defecto; un artefacto versionado puede traer los suyos en el manifest
+LABELS = dict(artifacts.DEFAULT_LABELS)
+BEST_THR = artifacts.DEFAULT_BEST_THR
+
+OUTPUT_COLS = ["proba_pass", "pred_int", "pred_label", "risk_tier", "reco_tags", "top_drivers"]
+# Sube al cambiar las columnas o las filas de salida (invalida los lotes guardados en caché)
+OUTPUT_VERSION = 4
+# Etiqueta real (opcional) en los CSV de lote, como en el notebook de entrenamiento
+TARGET_COL = "target_pass"
+
+
+# ==============================
+#  Carga del modelo (sin Streamlit)
+# ==============================
+def load_pipeline_and_schema():
+    """Pipeline y esquema de la versión activa en ART_DIR (ver artifacts.py)."""
+    artifact = artifacts.load_artifact()
+    schema = artifact["schema"]
+    return (
+        artifact["pipe"],
+        list(schema["expected_cols"]),
+        list(schema["num_features"]),
+        list(schema["cat_features"]),
+    )
+
+
+def ensure_expected_columns(df: pd.DataFrame, expected_cols: list, num_features: list) -> pd.DataFrame:
+    for col in expected_cols:
+        if col not in df.columns:
+            if col in num_features:
+                df[col] = 0
+            else:
+                df[col] = ""
+    return df[expected_cols]
+
+
+def score_frame(
+    pipe,
+    df: pd.DataFrame,
+    expected_cols: list,
+    num_features: list,
+    thr: float = BEST_THR,
+    labels: dict = None,
+    explainer=None,
+    timer=None,
+) -> pd.DataFrame:
+    """
+    Devuelve `df` reordenado según el esquema del modelo más las columnas
+    `proba_pass`, `pred_int`, `pred_label` (mismo formato que la app) y el
+    nivel de riesgo y las etiquetas de intervención de `recommendations`.
+    Con un `explainer` (ver explain.py) se agrega `top_drivers`. Con un
+    `timer` (ver instrumentation.py) se mide cada etapa.
+    """
+    labels = labels or LABELS
+    timer = timer or instrumentation.NULL_TIMER
+    with timer.stage("ensure_expected_columns"):
+        df = ensure_expected_columns(df, expected_cols, num_features)
+    # Igual que pipe.predict_proba, pero en dos pasos para medirlos y reutilizar X en el explicador
+    with timer.stage("prep"):
+        X = transform_features(pipe, df)
+    with timer.stage("model"):
+        proba = pipe.steps[-1][1].predict_proba(X)[:, 1]
+    pred_int = (proba >= thr).astype(int)
+    with timer.stage("recommendations"):
+        out = df.assign(
+            proba_pass=proba,
+            pred_int=pred_int,
+            pred_label=np.where(pred_int == 1, labels[1], labels[0]),
+            **recommendations.annotate_frame(df, proba),
+        )
+    if explainer is not None:
+        with timer.stage("explain"):
+            _, contrib = explainer.explain_matrix(X.astype(explainer.scorer.dtype, copy=False))
+            out["top_drivers"] = [explain.format_drivers(d) for d in explain.top_drivers(contrib, pred_int)]
+    return out
+
+
+def transform_features(pipe, df: pd.DataFrame):
+    """Todos los pasos previos al modelo; los de remuestreo (SMOTE) solo actúan al entrenar."""
+    X = df
+    for _, step in pipe.steps[:-1]:
+        if step is None or step == "passthrough" or hasattr(step, "fit_resample"):
+            continue
+        X = step.transform(X)
+    return X
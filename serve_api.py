@@ -0,0 +1,288 @@
+"""
+Endpoint HTTP de predicción (JSON / NDJSON) con micro-batching dinámico.
+
+Uso:
+    python serve_api.py --port 8600 --max-batch 64 --max-wait-ms 5
+
+Rutas:
+    POST /predict   un estudiante (objeto JSON), varios (lista JSON) o NDJSON
+                    (Content-Type: application/x-ndjson, un estudiante por línea)
+    GET  /health    versión del modelo activo
+    GET  /metrics   latencias p50/p99 e histograma de tamaños de lote
+
+Cada estudiante se valida antes de encolarse (todas las columnas del modelo,
+rangos del formulario, categorías conocidas; ver ingest.RosterSpec): un campo
+inválido responde 400 con el campo y el motivo. Las peticiones concurrentes
+que llegan dentro de `max_wait_ms` se agrupan en una sola llamada vectorizada
+al modelo (hasta `max_batch` filas). El modelo se
+obtiene del mismo registro que usa la app, así que también se actualiza en
+caliente cuando cambia ART_DIR; cada petición fija su bundle al llegar y se
+valida y puntúa con ese mismo modelo aunque el swap ocurra mientras espera.
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import artifacts
+import ingest
+from model_registry import ModelRegistry
+
+logger = logging.getLogger("panel.api")
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+LATENCY_WINDOW = 10_000
+
+
+class MicroBatcher:
+    """Agrupa peticiones concurrentes y las puntúa juntas en un hilo dedicado."""
+
+    def __init__(self, registry: ModelRegistry, max_batch: int = 64, max_wait_ms: float = 5.0):
+        self.registry = registry
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows: list, bundle) -> Future:
+        future = Future()
+        self._queue.put((rows, bundle, future, time.perf_counter()))
+        return future
+
+    def _collect(self) -> list:
+        items = [self._queue.get()]
+        n_rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while n_rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            items.append(item)
+            n_rows += len(item[0])
+        return items
+
+    @staticmethod
+    def _score(bundle, rows: list) -> np.ndarray:
+        if bundle.scorer is not None:
+            return bundle.scorer.predict_many(rows)
+        return bundle.predict_frame(rows)
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            # Durante un swap el lote puede mezclar versiones: una llamada por bundle
+            groups = {}
+            for item in items:
+                groups.setdefault(id(item[1]), []).append(item)
+            for group in groups.values():
+                self._score_group(group)
+            with self._lock:
+                self._batch_sizes[_size_bucket(sum(len(item[0]) for item in items))] += 1
+                self._requests += len(items)
+
+    def _score_group(self, items: list):
+        bundle = items[0][1]
+        rows = [row for item_rows, _, _, _ in items for row in item_rows]
+        try:
+            proba = self._score(bundle, rows)
+        except Exception:
+            # Se puntúa petición por petición: el error queda solo en la que lo causó
+            logger.exception("Falló el lote agrupado (%d peticiones); se puntúan por separado", len(items))
+            proba = None
+
+        now = time.perf_counter()
+        offset = 0
+        for item_rows, _, future, t_submit in items:
+            n = len(item_rows)
+            if proba is not None:
+                future.set_result(proba[offset: offset + n])
+            else:
+                try:
+                    future.set_result(self._score(bundle, item_rows))
+                except Exception as exc:
+                    future.set_exception(exc)
+            offset += n
+            with self._lock:
+                self._latencies_ms.append((now - t_submit) * 1000)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            lat = np.array(self._latencies_ms)
+            histogram = dict(sorted(self._batch_sizes.items(), key=lambda kv: int(kv[0].split("-")[0])))
+            requests = self._requests
+        return {
+            "requests": requests,
+            "latency_ms": {
+                "p50": float(np.percentile(lat, 50)) if lat.size else None,
+                "p99": float(np.percentile(lat, 99)) if lat.size else None,
+                "window": int(lat.size),
+            },
+            "batch_size_histogram": histogram,
+            "max_batch": self.max_batch,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+
+
+def _size_bucket(n: int) -> str:
+    """Cubetas potencia de 2: "1-1", "2-3", "4-7", ..."""
+    lo = 1 << (n.bit_length() - 1)
+    return f"{lo}-{2 * lo - 1}"
+
+
+def format_results(proba: np.ndarray, bundle) -> list:
+    out = []
+    for p in proba:
+        pred_int = int(p >= bundle.best_thr)
+        out.append({
+            "proba_pass": float(p),
+            "pred_int": pred_int,
+            "pred_label": bundle.labels[pred_int],
+            "threshold": float(bundle.best_thr),
+            "model_version": bundle.model_version,
+        })
+    return out
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    batcher: MicroBatcher = None
+    registry: ModelRegistry = None
+
+    def log_message(self, fmt, *args):
+        logger.debug("%s - %s", self.address_string(), fmt % args)
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, status: int, payload):
+        self._send(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"))
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, self.registry.status())
+        elif self.path == "/metrics":
+            self._send_json(200, self.batcher.metrics())
+        else:
+            self._send_json(404, {"error": "Ruta no encontrada"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": "Ruta no encontrada"})
+            return
+
+        length = int(self.headers.get("Content-Length") or 0)
+        if length <= 0 or length > MAX_BODY_BYTES:
+            self._send_json(413 if length > MAX_BODY_BYTES else 400, {"error": "Cuerpo vacío o demasiado grande"})
+            return
+        body = self.rfile.read(length)
+        ndjson = "ndjson" in (self.headers.get("Content-Type") or "")
+
+        try:
+            if ndjson:
+                rows = [json.loads(line) for line in body.splitlines() if line.strip()]
+                single = False
+            else:
+                payload = json.loads(body)
+                single = isinstance(payload, dict)
+                rows = [payload] if single else payload
+        except UnicodeDecodeError as exc:
+            self._send_json(400, {"error": f"El cuerpo no es UTF-8 válido: {exc}"})
+            return
+        except json.JSONDecodeError as exc:
+            self._send_json(400, {"error": f"JSON inválido: {exc}"})
+            return
+        if not isinstance(rows, list) or not rows or not all(isinstance(r, dict) for r in rows):
+            self._send_json(400, {"error": "Se espera un objeto por estudiante"})
+            return
+
+        # El mismo bundle valida y puntúa, aunque el registro cambie entre medias
+        bundle = self.registry.current
+        clean = []
+        for index, row in enumerate(rows):
+            try:
+                clean.append(bundle.roster_spec.coerce_record(row))
+            except ingest.RecordError as exc:
+                self._send_json(400, {
+                    "error": f"Estudiante {index}: {exc}",
+                    "index": index, "field": exc.column, "value": exc.value, "reason": exc.reason,
+                })
+                return
+        rows = clean
+
+        try:
+            proba = self.batcher.submit(rows, bundle).result()
+        except Exception as exc:
+            logger.exception("Error al puntuar")
+            self._send_json(500, {"error": f"{type(exc).__name__}: {exc}"})
+            return
+
+        results = format_results(proba, bundle)
+        if ndjson:
+            text = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in results)
+            self._send(200, text.encode("utf-8"), "application/x-ndjson")
+        else:
+            self._send_json(200, results[0] if single else results)
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # La cola de escucha por defecto (5) resetea conexiones con muchos clientes simultáneos
+    request_queue_size = 128
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Endpoint HTTP de predicción PASS/FAIL.")
+    parser.add_argument("--host", default=os.getenv("API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("API_PORT", "8600")))
+    parser.add_argument("--max-batch", type=int, default=int(os.getenv("API_MAX_BATCH", "64")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("API_MAX_WAIT_MS", "5")))
+    parser.add_argument("--poll-seconds", type=float, default=float(os.getenv("MODEL_POLL_SECONDS", "10")))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+
+    # El registro añade por sí mismo los perfiles dorados de ART_DIR/golden_samples.json
+    # (o, si falta, los que guarda el manifest de la versión)
+    art_dir = artifacts.get_art_dir()
+    registry = ModelRegistry(art_dir, golden_rows=[], poll_seconds=args.poll_seconds)
+    try:
+        registry.load_initial()
+    except ValueError as exc:
+        parser.exit(2, f"No se pudo cargar el modelo de {art_dir}: {exc}\n")
+    registry.start()
+
+    PredictionHandler.registry = registry
+    PredictionHandler.batcher = MicroBatcher(registry, max_batch=args.max_batch, max_wait_ms=args.max_wait_ms)
+
+    server = PredictionServer((args.host, args.port), PredictionHandler)
+    logger.info("Escuchando en http://%s:%d (modelo %s)", args.host, args.port, registry.current.model_version)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        registry.stop()
+
+
+if __name__ == "__main__":
+    main()
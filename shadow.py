@@ -0,0 +1,298 @@
+"""
+Puntuación en sombra de un modelo retador (challenger) contra el modelo activo.
+
+Después de mostrar el resultado del modelo activo (champion), la app entrega
+las mismas entradas a `ShadowScorer`, que las puntúa con el retador en un pool
+de hilos en segundo plano. El tutor nunca espera al retador:
+
+- `submit_rows` / `submit_csv` solo encolan y vuelven enseguida.
+- Como mucho `max_pending` trabajos esperan o corren a la vez; si el pool va
+  atrasado, el trabajo nuevo se descarta (y se cuenta) en lugar de acumularse.
+- Un lote se pasa como archivo abierto (no sus bytes), que solo se abre si
+  hay plaza; el hilo de sombra lo lee por bloques y como máximo
+  `max_batch_rows` filas.
+
+Por cada par (versión activa, fuente) se acumulan el acuerdo de etiquetas
+(cada modelo con su propio umbral), la tabla cruzada de etiquetas y las
+diferencias de probabilidad (retador − activo), con |Δ| en un histograma fijo
+del que sale el P95 del reporte.
+"""
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import scoring
+
+logger = logging.getLogger("panel.shadow")
+
+ABS_DELTA_BINS = 100  # barras de 0,01 en [0, 1]
+REPORT_COLUMNS = [
+    "champion", "source", "n", "agreement", "champion_pass_rate", "challenger_pass_rate",
+    "mean_delta", "mean_abs_delta", "p95_abs_delta", "max_abs_delta",
+    "pass_to_fail", "fail_to_pass",
+]
+
+
+class _Comparison:
+    """Totales de una combinación (versión activa, fuente)."""
+
+    def __init__(self):
+        self.n = 0
+        # crosstab[etiqueta activo, etiqueta retador]: 0 = FAIL, 1 = PASS
+        self.crosstab = np.zeros((2, 2), dtype=np.int64)
+        self.delta_sum = 0.0
+        self.abs_delta_sum = 0.0
+        self.max_abs_delta = 0.0
+        self.abs_hist = np.zeros(ABS_DELTA_BINS, dtype=np.int64)
+
+    def update(self, champ_int: np.ndarray, chall_int: np.ndarray, delta: np.ndarray):
+        self.n += len(delta)
+        np.add.at(self.crosstab, (champ_int, chall_int), 1)
+        abs_delta = np.abs(delta)
+        self.delta_sum += float(delta.sum())
+        self.abs_delta_sum += float(abs_delta.sum())
+        self.max_abs_delta = max(self.max_abs_delta, float(abs_delta.max()))
+        codes = np.minimum((abs_delta * ABS_DELTA_BINS).astype(np.int64), ABS_DELTA_BINS - 1)
+        self.abs_hist += np.bincount(codes, minlength=ABS_DELTA_BINS)
+
+    def merge(self, other: "_Comparison"):
+        self.n += other.n
+        self.crosstab += other.crosstab
+        self.delta_sum += other.delta_sum
+        self.abs_delta_sum += other.abs_delta_sum
+        self.max_abs_delta = max(self.max_abs_delta, other.max_abs_delta)
+        self.abs_hist += other.abs_hist
+
+    def abs_quantile(self, q: float) -> float:
+        # Borde superior de la barra: cota de |Δ| para la fracción q (error ≤ 0,01)
+        k = int(np.searchsorted(np.cumsum(self.abs_hist), q * self.n, side="left"))
+        return min(k + 1, ABS_DELTA_BINS) / ABS_DELTA_BINS
+
+    def row(self) -> dict:
+        n = self.n
+        return {
+            "n": n,
+            "agreement": float(np.trace(self.crosstab)) / n,
+            "champion_pass_rate": float(self.crosstab[1].sum()) / n,
+            "challenger_pass_rate": float(self.crosstab[:, 1].sum()) / n,
+            "mean_delta": self.delta_sum / n,
+            "mean_abs_delta": self.abs_delta_sum / n,
+            "p95_abs_delta": self.abs_quantile(0.95),
+            "max_abs_delta": self.max_abs_delta,
+            "pass_to_fail": int(self.crosstab[1, 0]),
+            "fail_to_pass": int(self.crosstab[0, 1]),
+        }
+
+
+class ShadowScorer:
+    def __init__(
+        self,
+        challenger,
+        workers: int = 1,
+        max_pending: int = 32,
+        max_batch_rows: int = 50_000,
+        chunk_rows: int = 5_000,
+    ):
+        """`challenger`: un ModelBundle (ver model_registry.build_bundle) ya validado."""
+        self.challenger = challenger
+        self.max_pending = max_pending
+        self.max_batch_rows = max_batch_rows
+        self.chunk_rows = chunk_rows
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="shadow")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._closed = False
+        self._comparisons = {}  # {(versión activa, fuente): _Comparison}
+        self._stats = {
+            "submitted": 0, "dropped": 0, "completed": 0, "errors": 0,
+            "rows": 0, "busy_ms": 0.0, "max_pending": 0,
+        }
+        self._pending = 0
+        atexit.register(self.close)
+
+    # ---------- productores (hilos de Streamlit) ----------
+    def _reserve(self) -> bool:
+        """Toma una plaza sin esperar; False (y se cuenta) si está lleno o cerrado."""
+        if self._closed or not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["dropped"] += 1
+            return False
+        with self._lock:
+            self._stats["submitted"] += 1
+            self._pending += 1
+            self._stats["max_pending"] = max(self._stats["max_pending"], self._pending)
+        return True
+
+    def _dispatch(self, fn, *args) -> bool:
+        """Manda al pool un trabajo que ya tiene plaza reservada."""
+        try:
+            future = self._pool.submit(self._run, fn, *args)
+        except RuntimeError:  # pool cerrado entre la comprobación y el submit
+            self._abandon(args)
+            with self._lock:
+                self._stats["dropped"] += 1
+            return False
+        # Un trabajo cancelado por close() nunca pasa por _run: su plaza se libera aquí
+        future.add_done_callback(lambda f: f.cancelled() and self._abandon(args))
+        return True
+
+    def _abandon(self, args):
+        for arg in args:
+            if hasattr(arg, "close"):
+                arg.close()
+        self._release()
+
+    def _submit(self, fn, *args) -> bool:
+        """Encola sin esperar; False si se descartó por estar lleno o cerrado."""
+        return self._reserve() and self._dispatch(fn, *args)
+
+    def submit_rows(
+        self,
+        rows: list,
+        champion_proba,
+        champion_thr: float,
+        champion_version: str,
+        source: str = "individual",
+    ) -> bool:
+        """Filas como dicts (formulario individual) con la probabilidad que ya mostró el modelo activo."""
+        return self._submit(
+            self._score_rows, list(rows), np.asarray(champion_proba, dtype=float).reshape(-1),
+            float(champion_thr), champion_version, source,
+        )
+
+    def submit_csv(self, open_file, champion_thr: float, champion_version: str, source: str = "batch") -> bool:
+        """
+        Lote ya puntuado por el modelo activo (CSV con `proba_pass`). `open_file()`
+        devuelve el archivo abierto en binario y solo se llama si hay plaza; el hilo
+        de sombra lo lee por bloques y lo cierra.
+        """
+        if not self._reserve():
+            return False
+        try:
+            file = open_file()
+        except Exception:
+            self._release()
+            raise
+        return self._dispatch(self._score_csv, file, float(champion_thr), champion_version, source)
+
+    # ---------- trabajo en segundo plano ----------
+    def _release(self):
+        with self._lock:
+            self._pending -= 1
+        self._slots.release()
+
+    def _run(self, fn, *args):
+        t0 = time.perf_counter()
+        try:
+            rows = fn(*args)
+        except Exception:
+            logger.exception("Falló la puntuación en sombra")
+            with self._lock:
+                self._stats["errors"] += 1
+        else:
+            with self._lock:
+                self._stats["completed"] += 1
+                self._stats["rows"] += rows
+        finally:
+            with self._lock:
+                self._stats["busy_ms"] += (time.perf_counter() - t0) * 1000
+            self._release()
+
+    def _compare(self, champion_version, source, champ_proba, champion_thr, chall_proba):
+        champ_int = (champ_proba >= champion_thr).astype(np.int64)
+        chall_int = (chall_proba >= self.challenger.best_thr).astype(np.int64)
+        delta = chall_proba - champ_proba
+        with self._lock:
+            comparison = self._comparisons.setdefault((champion_version, source), _Comparison())
+            comparison.update(champ_int, chall_int, delta)
+
+    def _score_rows(self, rows, champ_proba, champion_thr, champion_version, source) -> int:
+        bundle = self.challenger
+        if bundle.scorer is not None:
+            chall_proba = bundle.scorer.predict_many(rows)
+        else:
+            chall_proba = bundle.predict_frame(rows)
+        self._compare(champion_version, source, champ_proba, champion_thr, np.asarray(chall_proba, dtype=float))
+        return len(rows)
+
+    def _score_csv(self, file, champion_thr, champion_version, source) -> int:
+        bundle = self.challenger
+        done = 0
+        try:
+            for chunk in pd.read_csv(file, chunksize=self.chunk_rows, nrows=self.max_batch_rows):
+                df = scoring.ensure_expected_columns(
+                    chunk.drop(columns=scoring.OUTPUT_COLS, errors="ignore"), bundle.expected_cols, bundle.num_features
+                )
+                chall_proba = bundle.pipe.predict_proba(df)[:, 1]
+                self._compare(
+                    champion_version, source, chunk["proba_pass"].to_numpy(dtype=float), champion_thr, chall_proba
+                )
+                done += len(chunk)
+                if self._closed:
+                    break
+        finally:
+            file.close()
+        return done
+
+    # ---------- ciclo de vida y reporte ----------
+    def close(self):
+        """Deja de aceptar trabajo y descarta lo que no empezó (la sombra no debe retrasar el cierre)."""
+        if self._closed:
+            return
+        self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out["pending"] = self._pending
+        out["capacity"] = self.max_pending
+        out["challenger"] = self.challenger.version or self.challenger.model_version
+        return out
+
+    def report(self) -> pd.DataFrame:
+        """Una fila por (versión activa, fuente) más el total por versión activa."""
+        with self._lock:
+            items = [(key, comparison.row()) for key, comparison in self._comparisons.items() if comparison.n]
+            totals = {}
+            for (champion, _), comparison in self._comparisons.items():
+                if comparison.n:
+                    totals.setdefault(champion, _Comparison()).merge(comparison)
+        records = [{"champion": champion, "source": source, **row} for (champion, source), row in sorted(items)]
+        records += [{"champion": champion, "source": "total", **total.row()} for champion, total in sorted(totals.items())]
+        return pd.DataFrame(records, columns=REPORT_COLUMNS)
+
+    def to_prometheus(self) -> str:
+        s = self.stats()
+        lines = []
+        metrics = [
+            ("panel_shadow_submitted_total", "counter", "Trabajos de sombra encolados.", s["submitted"]),
+            ("panel_shadow_dropped_total", "counter", "Trabajos de sombra descartados por cola llena.", s["dropped"]),
+            ("panel_shadow_errors_total", "counter", "Trabajos de sombra fallidos.", s["errors"]),
+            ("panel_shadow_rows_total", "counter", "Filas puntuadas por el retador.", s["rows"]),
+            ("panel_shadow_pending", "gauge", "Trabajos de sombra en cola o en curso.", s["pending"]),
+            ("panel_shadow_busy_seconds_total", "counter", "Tiempo de puntuación del retador.", s["busy_ms"] / 1000),
+        ]
+        for name, kind, help_text, value in metrics:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}", f"{name} {value:g}"]
+        report = self.report()
+        total = report[report["source"] == "total"]
+        if len(total):
+            lines += [
+                "# HELP panel_shadow_agreement Acuerdo de etiquetas entre el retador y el modelo activo.",
+                "# TYPE panel_shadow_agreement gauge",
+            ]
+            lines += [f'panel_shadow_agreement{{champion="{r.champion}"}} {r.agreement:g}' for r in total.itertuples()]
+            lines += [
+                "# HELP panel_shadow_mean_abs_delta |proba retador − proba activo| medio.",
+                "# TYPE panel_shadow_mean_abs_delta gauge",
+            ]
+            lines += [
+                f'panel_shadow_mean_abs_delta{{champion="{r.champion}"}} {r.mean_abs_delta:g}' for r in total.itertuples()
+            ]
+        return "\n".join(lines) + "\n"
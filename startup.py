@@ -0,0 +1,72 @@
+"""
+Medición del arranque en frío de la app.
+
+Cada fase (imports, carga del modelo, compilación, warm-up, estilos) se mide
+solo durante la primera ejecución del proceso; en los reruns siguientes los
+recursos ya están en caché y `phase` no registra nada. Al cerrar el perfil
+se escribe el desglose en el log y se compara con el presupuesto.
+"""
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("panel.startup")
+
+
+class StartupProfile:
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.phases = {}
+        self.finished = False
+        self._lock = threading.Lock()
+
+    def record(self, name: str, elapsed_ms: float):
+        with self._lock:
+            if not self.finished:
+                self.phases[name] = elapsed_ms
+
+    @contextmanager
+    def phase(self, name: str):
+        if self.finished:
+            yield
+            return
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, (time.perf_counter() - t0) * 1000)
+
+    @property
+    def total_ms(self) -> float:
+        return sum(self.phases.values())
+
+    @property
+    def over_budget(self) -> bool:
+        return self.total_ms > self.budget_ms
+
+    def finish(self):
+        with self._lock:
+            if self.finished:
+                return
+            self.finished = True
+
+        breakdown = " · ".join(f"{name}={ms:.0f}ms" for name, ms in self.phases.items())
+        if self.over_budget:
+            logger.warning(
+                "Arranque en %.0f ms, excede el presupuesto de %.0f ms (%s)",
+                self.total_ms, self.budget_ms, breakdown,
+            )
+        else:
+            logger.info(
+                "Arranque en %.0f ms dentro del presupuesto de %.0f ms (%s)",
+                self.total_ms, self.budget_ms, breakdown,
+            )
+
+    def report(self) -> dict:
+        return {
+            "phases_ms": dict(self.phases),
+            "total_ms": self.total_ms,
+            "budget_ms": self.budget_ms,
+            "over_budget": self.over_budget,
+        }
@@ -1,9 +1,33 @@
+import time
+
+_T_IMPORTS = time.perf_counter()
+
 import streamlit as st
-import joblib
+import json
 import os
+import re
+import shutil
+import tempfile
+import uuid
+import zlib
 import pandas as pd
 import numpy as np
-import altair as alt
+
+import artifacts
+import audit
+import distribution
+import ingest
+import instrumentation
+import recommendations
+import scoring
+import startup
+import whatif
+from model_registry import ModelRegistry, build_bundle
+from prediction_cache import PredictionCache, canonical_key
+
+# altair, shadow y los módulos del lote (batch_cache, cohorts, thresholds) se
+# importan de forma diferida, al usarse por primera vez: no retrasan el arranque
+_IMPORTS_MS = (time.perf_counter() - _T_IMPORTS) * 1000
 
 # ==============================
 #  Configuración general
@@ -14,717 +38,400 @@ st.set_page_config(
     layout="wide",
 )
 
+# ==============================
+#  Perfil de arranque en frío
+# ==============================
+STARTUP_BUDGET_MS = float(os.getenv("STARTUP_BUDGET_MS", "4000"))
+
+
+@st.cache_resource
+def get_startup_profile():
+    return startup.StartupProfile(budget_ms=STARTUP_BUDGET_MS)
+
+
+startup_profile = get_startup_profile()
+startup_profile.record("imports", _IMPORTS_MS)
+
 # ==============================
 #  Estilos globales (solo diseño)
 # ==============================
-st.markdown(
-    """
-<style>
-:root {
-    --primary: #0857c7;          /* azul colegio */
-    --primary-soft: #e5efff;
-    --accent: #22c55e;           /* verde acción */
-    --accent-soft: #e9fdf2;
-    --bg-page: #f5f7fb;
-    --bg-card: #ffffff;
-    --border-subtle: #e5e7eb;
-    --text-main: #111827;
-    --text-muted: #6b7280;
-}
+# La hoja de estilos vive en assets/panel.css: se lee y compacta una sola vez
+# por proceso. Como cada pestaña es un fragmento, los reruns de una pestaña no
+# vuelven a emitir el <style>; solo se reenvía en un rerun completo de la página.
+CSS_PATH = os.path.join(os.path.dirname(__file__), "assets", "panel.css")
 
-/* Header de Streamlit: mismo color de fondo y sin sombra */
-header[data-testid="stHeader"] {
-    background-color: var(--bg-page) !important;
-    box-shadow: none !important;
-}
 
-/* Fondo y contenedor */
-main, .stApp {
-    background: var(--bg-page);
-}
-.block-container {
-    padding-top: 0.6rem;
-    padding-bottom: 2rem;
-    max-width: 1200px !important;
-}
+@st.cache_resource
+def load_css_html() -> str:
+    with open(CSS_PATH, encoding="utf-8") as f:
+        css = f.read()
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};])\s*", r"\1", css)
+    return f"<style>{css}</style>"
 
-/* Pequeño espacio blanco encima del banner (para separar del header negro) */
-.top-gap {
-    height: 0.9rem;
-}
 
-/* Tipografía */
-html, body, .stApp, .stMarkdown, p, li, span, label,
-h1, h2, h3, h4, h5, h6, .stCaption {
-    color: var(--text-main);
-    font-family: system-ui, -apple-system, BlinkMacSystemFont, "Segoe UI", sans-serif;
-}
+with startup_profile.phase("estilos"):
+    st.markdown(load_css_html(), unsafe_allow_html=True)
 
-/* Hero banner modernizado */
-.hero-banner {
-    background:
-        radial-gradient(circle at 0% 0%, #93c5fd 0, transparent 55%),
-        radial-gradient(circle at 100% 0%, #fde68a 0, transparent 55%),
-        linear-gradient(90deg, #003c71, #2563eb);
-    border-radius: 1.25rem;
-    padding: 1.1rem 1.6rem;
-    color: #f9fafb;
-    display: flex;
-    align-items: center;
-    justify-content: space-between;
-    box-shadow: 0 18px 30px rgba(15, 23, 42, 0.25);
-    margin-bottom: 0.9rem;
-}
-.hero-left {
-    display: flex;
-    gap: 1rem;
-    align-items: center;
-}
-.hero-icon {
-    width: 56px;
-    height: 56px;
-    border-radius: 999px;
-    display:flex;
-    align-items:center;
-    justify-content:center;
-    background: rgba(15,23,42,0.25);
-    font-size: 2.0rem;
-}
-.hero-text-main {
-    display:flex;
-    flex-direction:column;
-    gap:0.15rem;
-}
-.hero-title-row {
-    display:flex;
-    align-items:center;
-    gap:0.5rem;
-}
-.hero-title {
-    font-size: 1.32rem;
-    font-weight: 750;
-}
-.hero-pill {
-    font-size:0.75rem;
-    padding:0.15rem 0.6rem;
-    border-radius:999px;
-    background:rgba(15,23,42,0.2);
-    border:1px solid rgba(239,246,255,0.3);
-}
-.hero-sub {
-    font-size: 0.9rem;
-    opacity: 0.94;
-}
-.hero-chips {
-    margin-top:0.2rem;
-    display:flex;
-    flex-wrap:wrap;
-    gap:0.3rem;
-    font-size:0.78rem;
-}
-.hero-chip {
-    padding:0.12rem 0.5rem;
-    border-radius:999px;
-    background:rgba(15,23,42,0.22);
-}
-.hero-right {
-    text-align:right;
-    font-size:0.82rem;
-}
-.hero-right-title {
-    font-weight:650;
-}
-.hero-right-sub {
-    opacity:0.9;
-}
+SELECTED_FEATURES = [
+    "sex", "age", "address", "famsize",
+    "Medu", "Fedu",
+    "traveltime", "studytime", "failures", "absences",
+    "schoolsup", "famsup", "paid", "activities",
+    "higher", "internet",
+    "famrel", "freetime", "health",
+]
+VISIBLE_COLS = list(SELECTED_FEATURES)
 
-/* Tabs como botones grandes de ancho completo */
-.stTabs {
-    margin-top: 0.2rem;
-}
-.stTabs [role="tablist"] {
-    display: flex;
-    width: 100%;
-    background-color: #e5e7eb;
-    padding: 0.25rem;
-    border-radius: 999px;
-    box-shadow: 0 10px 22px rgba(15, 23, 42, 0.12);
-    gap: 0.25rem;
-}
-/* Ocultar la barra roja de resaltado interna */
-.stTabs [data-baseweb="tab-highlight"] {
-    background-color: transparent !important;
-    border: none !important;
-    height: 0px !important;
-}
-.stTabs [data-baseweb="tab"] {
-    flex: 1;
-    justify-content: center;
-    border-radius: 999px;
-    padding: 0.6rem 1.25rem;
-    background-color: transparent;
-    color: #374151;
-    font-weight: 500;
-    border: none;
-    box-shadow: none !important;
-}
-.stTabs [data-baseweb="tab"]:hover {
-    background-color: #d1d5db;
-}
-.stTabs [aria-selected="true"] {
-    background: #ffffff !important;
-    color: var(--primary) !important;
-    box-shadow: 0 10px 24px rgba(37, 99, 235, 0.35) !important;
-    border: none !important;
-}
+SEX_OPTS = {"Femenino": "F", "Masculino": "M"}
+YESNO_OPTS = {"Sí": "yes", "No": "no"}
+ADDRESS_OPTS = {"Urbano": "U", "Rural": "R"}
+FAMSIZE_OPTS = {"≤ 3 miembros": "LE3", "> 3 miembros": "GT3"}
 
-/* Tarjetas */
-.card {
-    background-color: var(--bg-card);
-    border-radius: 1.15rem;
-    padding: 1.0rem 1.4rem 1.6rem 1.4rem;
-    box-shadow: 0 18px 35px rgba(15, 23, 42, 0.07);
-    border: 1px solid var(--border-subtle);
-    margin-top: 0.8rem;
-}
-.subcard {
-    background-color: #ffffff;
-    border-radius: 0.9rem;
-    padding: 1.0rem 1.1rem 1.1rem 1.1rem;
-    border: 1px solid #e5e7eb;
-    margin-top: 0rem;
-}
+TRAVELTIME_HELP = "1: <15min, 2: 15–30min, 3: 30–60min, 4: >60min"
+STUDYTIME_HELP = "1:<2h, 2:2–5h, 3:5–10h, 4:>10h"
 
-/* Encabezado dentro de la tarjeta */
-.card-header-band {
-    display:flex;
-    align-items:center;
-    justify-content:space-between;
-    padding:0.5rem 0.2rem 0.2rem 0.2rem;
-    border-bottom:1px solid #e5e7eb;
-    margin-bottom:0.6rem;
-}
-.card-header-main {
-    display:flex;
-    flex-direction:column;
-    gap:0.1rem;
-}
-.card-header-title {
-    font-size:0.98rem;
-    font-weight:650;
-}
-.card-header-sub {
-    font-size:0.82rem;
-    color:var(--text-muted);
-}
-.card-header-badge {
-    font-size:0.75rem;
-    padding:0.18rem 0.65rem;
-    border-radius:999px;
-    background:#e5efff;
-    color:#1d4ed8;
-}
+DEFAULT_TRAVELTIME = 1  # fijo
 
-/* Secciones del form */
-.section-title {
-    font-size: 1.02rem;
-    font-weight: 650;
-    margin-bottom: 0.35rem;
-}
-.section-caption {
-    font-size: 0.82rem;
-    color: var(--text-muted);
-    margin-bottom: 0.35rem;
+# Perfil con los valores iniciales del formulario (warm-up y ejemplos)
+DEFAULT_PROFILE = {
+    "sex": "F", "age": 16, "address": "U", "famsize": "LE3",
+    "Medu": 2, "Fedu": 2,
+    "traveltime": DEFAULT_TRAVELTIME, "studytime": 2, "failures": 0, "absences": 0,
+    "schoolsup": "yes", "famsup": "yes", "paid": "yes", "activities": "yes",
+    "higher": "yes", "internet": "yes",
+    "famrel": 4, "freetime": 3, "health": 4,
 }
 
-/* Tarjetas de métricas */
-.metric-card {
-    border-radius: 0.9rem;
-    padding: 0.9rem 1.1rem;
-    background: linear-gradient(135deg, var(--primary-soft), #eff4ff);
-    color: var(--text-main);
-    border: 1px solid #bfdbfe;
-}
-.metric-card.pass {
-    background: linear-gradient(135deg, var(--accent-soft), #fefce8);
-    border-color: #bbf7d0;
-}
-.metric-label {
-    font-size: 0.78rem;
-    text-transform: uppercase;
-    letter-spacing: .08em;
-    color: var(--text-muted);
+# Variables accionables del panel "¿qué pasaría si…?" con todos sus valores permitidos en el formulario
+WHATIF_GRID = {
+    "studytime": [1, 2, 3, 4],
+    "absences": list(range(0, 101)),
+    "freetime": [1, 2, 3, 4, 5],
+    "schoolsup": ["yes", "no"],
+    "famsup": ["yes", "no"],
+    "paid": ["yes", "no"],
+    "activities": ["yes", "no"],
+    "internet": ["yes", "no"],
+    "higher": ["yes", "no"],
 }
-.metric-value {
-    font-size: 1.8rem;
-    font-weight: 750;
-}
-.metric-sub {
-    font-size: 0.9rem;
-    color: var(--text-muted);
+WHATIF_LABELS = {
+    "studytime": "Horas de estudio", "absences": "Inasistencias", "freetime": "Tiempo libre",
+    "schoolsup": "Apoyo escolar", "famsup": "Apoyo familiar", "paid": "Clases pagadas",
+    "activities": "Actividades extra", "internet": "Internet en casa", "higher": "Quiere estudios superiores",
 }
 
-/* Botón principal */
-.stButton>button {
-    border-radius: 999px;
-    background: linear-gradient(90deg, var(--accent), #16a34a);
-    border: none;
-    color: #f9fafb;
-    font-weight: 700;
-    padding: 0.55rem 1.9rem;
-    box-shadow: 0 10px 24px rgba(34, 197, 94, 0.35);
-}
-.stButton>button:hover {
-    filter: brightness(1.06);
-}
 
-/* Selects */
-.stSelectbox > div > div {
-    background-color: #ffffff !important;
-    color: var(--text-main) !important;
-    border-radius: 0.75rem !important;
-    border: 1px solid #d1d5db !important;
-}
-.stSelectbox svg {
-    color: var(--text-muted) !important;
-}
-div[data-baseweb="select"] ul {
-    background-color: #ffffff !important;
-}
-div[data-baseweb="select"] li {
-    color: var(--text-main) !important;
-}
-div[data-baseweb="select"] li:hover {
-    background-color: #eff6ff !important;
-}
+# ==============================
+#  Carga del modelo (lógica)
+# ==============================
+MODEL_POLL_SECONDS = float(os.getenv("MODEL_POLL_SECONDS", "10"))
 
-/* Number input (forzar fondo claro) */
-.stNumberInput div {
-    background: #ffffff !important;
-    border-radius: 0.75rem !important;
-    border-color: #d1d5db !important;
-}
-.stNumberInput input {
-    background: #ffffff !important;
-    color: var(--text-main) !important;
-}
-.stNumberInput button {
-    background: #eff6ff !important;
-    border-radius: 0.75rem !important;
-    border: none !important;
-}
 
-/* Sliders */
-.stSlider > div[data-baseweb="slider"] > div {
-    color: var(--primary) !important;
-}
+@st.cache_resource
+def get_model_registry():
+    # Un solo registro por proceso: carga la versión activa de ART_DIR y su hilo
+    # vigila la carpeta para cambiar de modelo en caliente sin reiniciar.
+    registry = ModelRegistry(
+        artifacts.get_art_dir(),
+        golden_rows=[DEFAULT_PROFILE],
+        poll_seconds=MODEL_POLL_SECONDS,
+    )
+    registry.load_initial()
+    registry.start()
+    return registry
 
-/* Separador suave */
-hr {
-    border: none;
-    border-top: 1px dashed #e5e7eb;
-    margin: 1.0rem 0 0.9rem 0;
-}
 
-/* DataFrame claro */
-.stDataFrame, .stDataFrame [data-testid="stTable"] {
-    background-color: #ffffff !important;
-    color: var(--text-main) !important;
-}
-.stDataFrame tbody tr:nth-child(even) {
-    background-color: #f9fafb !important;
-}
+model_registry = get_model_registry()
 
-/* Gráficos Altair */
-.stAltairChart {
-    background-color: #ffffff;
-    border-radius: 0.9rem;
-    padding: 0.75rem;
-    border: 1px solid #e5e7eb;
-}
-.vega-embed, .vega-embed canvas {
-    background-color: #ffffff !important;
-}
 
-/* Tooltips */
-div[data-testid="stTooltipContent"] {
-    background-color: #ffffff !important;
-    color: var(--text-main) !important;
-    border-radius: 0.6rem !important;
-    border: 1px solid #e5e7eb !important;
-    box-shadow: 0 12px 30px rgba(15,23,42,0.18) !important;
-    font-size: 0.8rem !important;
-}
 
-/* Notas pequeñas */
-.small-note {
-    font-size: 0.78rem;
-    color: var(--text-muted);
-    margin-top: 0.4rem;
-}
-.info-chip {
-    display:inline-flex;
-    align-items:center;
-    gap:0.35rem;
-    padding:0.12rem 0.55rem;
-    border-radius:999px;
-    background:#e5efff;
-    color:#1d4ed8;
-    font-size:0.75rem;
-}
+def bind_current_model():
+    """
+    Fija la versión activa del registro para todo el rerun (o rerun de
+    fragmento), aunque el registro cambie de modelo mientras tanto.
+    """
+    global model_bundle, winner_pipe, EXPECTED_COLS, NUM_FEATS, CAT_FEATS
+    global BEST_THR, LABELS, MODEL_VERSION, compiled_scorer, explainer, roster_spec
+    model_bundle = model_registry.current
+    winner_pipe = model_bundle.pipe
+    EXPECTED_COLS = model_bundle.expected_cols
+    NUM_FEATS = model_bundle.num_features
+    CAT_FEATS = model_bundle.cat_features
+    BEST_THR = model_bundle.best_thr
+    LABELS = model_bundle.labels
+    MODEL_VERSION = model_bundle.model_version
+    compiled_scorer = model_bundle.scorer
+    explainer = model_bundle.explainer
+    roster_spec = model_bundle.roster_spec
 
-/* Card invisible / separador delgado para el banner */
-.ghost-card-spacer {
-    width: 100%;
-    height: 4rem;
-}
 
-/* Recomendaciones (fase beta) */
-.reco-card {
-    margin-top: 1.1rem;
-    border-radius: 1.1rem;
-    background: linear-gradient(135deg, #eef2ff, #eff6ff);
-    padding: 1.1rem 1.3rem 1.15rem 1.3rem;
-    border: 1px solid #c7d2fe;
-    box-shadow: 0 18px 40px rgba(79, 70, 229, 0.18);
-}
-.reco-header {
-    display:flex;
-    justify-content:space-between;
-    align-items:flex-start;
-    gap:0.8rem;
-    margin-bottom:0.7rem;
-}
-.reco-title {
-    font-size:0.98rem;
-    font-weight:700;
-}
-.reco-subtitle {
-    font-size:0.82rem;
-    color: var(--text-muted);
-}
-.reco-pill-beta {
-    font-size:0.75rem;
-    padding:0.2rem 0.7rem;
-    border-radius:999px;
-    background:#fef3c7;
-    color:#92400e;
-    border:1px solid #facc15;
-    display:inline-flex;
-    align-items:center;
-    gap:0.25rem;
-}
-.reco-pill-beta span:first-child {
-    font-weight:600;
-}
-.reco-section-label {
-    font-size:0.8rem;
-    font-weight:600;
-    text-transform:uppercase;
-    letter-spacing:.08em;
-    color:#4b5563;
-    margin-bottom:0.15rem;
-}
-.reco-section-text {
-    font-size:0.86rem;
-    color:#374151;
-    margin-bottom:0.45rem;
-}
-.reco-tags {
-    display:flex;
-    flex-wrap:wrap;
-    gap:0.25rem;
-    margin-top:0.1rem;
-}
-.reco-tag {
-    font-size:0.72rem;
-    padding:0.1rem 0.45rem;
-    border-radius:999px;
-    background:#e0f2fe;
-    color:#0369a1;
-}
-.reco-divider {
-    border-top:1px dashed rgba(148,163,184,0.6);
-    margin:0.4rem 0 0.5rem 0;
-}
-.reco-footer-note {
-    font-size:0.78rem;
-    color:#6b7280;
-    margin-top:0.5rem;
-}
-</style>
-""",
-    unsafe_allow_html=True,
-)
+bind_current_model()
+
+for phase_name, phase_ms in model_bundle.timings.items():
+    startup_profile.record(phase_name, phase_ms)
+startup_profile.finish()
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+
+
+@st.cache_resource
+def load_prediction_cache():
+    # Un único objeto para todas las sesiones (cache_resource no copia el valor)
+    return PredictionCache(max_entries=PREDICTION_CACHE_SIZE)
+
+
+prediction_cache = load_prediction_cache()
 
 # ==============================
-#  Carga del modelo (lógica)
+#  Auditoría de predicciones
 # ==============================
+# Cada predicción mostrada se encola y un hilo la escribe por lotes en SQLite (ver audit.py)
+AUDIT_DB = os.getenv("AUDIT_DB", os.path.join("registros", "auditoria.sqlite"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+
+
 @st.cache_resource
-def load_pipeline_and_schema():
-    here = os.path.dirname(__file__)
-    model_path = os.path.join(here, "artefactos", "modelo_atrasos.joblib")
-    if not os.path.exists(model_path):
-        raise FileNotFoundError(f"No se encontró el modelo en: {model_path}")
+def load_audit_sink():
+    # Un solo escritor por proceso; AUDIT_DB vacío desactiva la auditoría
+    return audit.AuditSink(AUDIT_DB, max_queue=AUDIT_QUEUE_SIZE) if AUDIT_DB else None
 
-    pipe = joblib.load(model_path)
-    prep = pipe.named_steps["prep"]
 
-    num_features = list(prep.transformers_[0][2])
-    cat_features = list(prep.transformers_[1][2])
-    expected_cols = list(num_features) + list(cat_features)
+audit_sink = load_audit_sink()
 
-    return pipe, expected_cols, num_features, cat_features
 
+# ==============================
+#  Modelo retador en sombra (opcional)
+# ==============================
+# SHADOW_VERSION = versión de ART_DIR que puntúa en segundo plano las mismas
+# entradas que el modelo activo, sin afectar lo que ve el tutor (ver shadow.py)
+SHADOW_VERSION = os.getenv("SHADOW_VERSION", "")
+SHADOW_WORKERS = int(os.getenv("SHADOW_WORKERS", "1"))
+SHADOW_MAX_PENDING = int(os.getenv("SHADOW_MAX_PENDING", "32"))
+SHADOW_MAX_BATCH_ROWS = int(os.getenv("SHADOW_MAX_BATCH_ROWS", "50000"))
 
-winner_pipe, EXPECTED_COLS, NUM_FEATS, CAT_FEATS = load_pipeline_and_schema()
 
-LABELS = {0: "FAIL", 1: "PASS"}
-BEST_THR = 0.5
+@st.cache_resource
+def load_shadow_scorer():
+    if not SHADOW_VERSION:
+        return None
+    import shadow
+
+    try:
+        # Misma carga y validación con el conjunto dorado que una versión activa
+        challenger = build_bundle(model_registry.art_dir, model_registry.golden_rows, version=SHADOW_VERSION)
+    except Exception:
+        # Un retador inválido no debe impedir que la app sirva al modelo activo
+        shadow.logger.exception("No se pudo cargar el retador %s", SHADOW_VERSION)
+        return None
+    return shadow.ShadowScorer(
+        challenger,
+        workers=SHADOW_WORKERS,
+        max_pending=SHADOW_MAX_PENDING,
+        max_batch_rows=SHADOW_MAX_BATCH_ROWS,
+    )
 
-SELECTED_FEATURES = [
-    "sex", "age", "address", "famsize",
-    "Medu", "Fedu",
-    "traveltime", "studytime", "failures", "absences",
-    "schoolsup", "famsup", "paid", "activities",
-    "higher", "internet",
-    "famrel", "freetime", "health",
-]
-VISIBLE_COLS = list(SELECTED_FEATURES)
 
-SEX_OPTS = {"Femenino": "F", "Masculino": "M"}
-YESNO_OPTS = {"Sí": "yes", "No": "no"}
-ADDRESS_OPTS = {"Urbano": "U", "Rural": "R"}
-FAMSIZE_OPTS = {"≤ 3 miembros": "LE3", "> 3 miembros": "GT3"}
+shadow_scorer = load_shadow_scorer()
 
-TRAVELTIME_HELP = "1: <15min, 2: 15–30min, 3: 30–60min, 4: >60min"
-STUDYTIME_HELP = "1:<2h, 2:2–5h, 3:5–10h, 4:>10h"
 
-DEFAULT_TRAVELTIME = 1  # fijo
+def metrics_extra() -> str:
+    """Métricas de auditoría y de sombra para el mismo archivo de Prometheus."""
+    return "".join(
+        sink.to_prometheus() for sink in (audit_sink, shadow_scorer) if sink is not None
+    )
+
+
+def get_session_id() -> str:
+    return st.session_state.setdefault("session_id", uuid.uuid4().hex[:12])
 
 
 def ensure_expected_columns(df: pd.DataFrame) -> pd.DataFrame:
-    for col in EXPECTED_COLS:
-        if col not in df.columns:
-            if col in NUM_FEATS:
-                df[col] = 0
-            else:
-                df[col] = ""
-    return df[EXPECTED_COLS]
-
-
-def build_recommendations_html(
-    proba_pass: float,
-    pred_label: str,
-    schoolsup: str,
-    famsup: str,
-    studytime: int,
-    absences: int,
-    failures: int,
-    health: int,
-    freetime: int,
-    higher: str,
-) -> str:
-    # Nivel de riesgo según probabilidad
-    tags_risk = []
-    if proba_pass < 0.35:
-        risk_label = "Riesgo alto de desaprobación"
-        risk_text = (
-            "El modelo estima una probabilidad baja de aprobación. "
-            "Es importante activar un plan de acompañamiento cercano y sistemático."
-        )
-        tags_risk.append("⚠️ Riesgo alto")
-    elif proba_pass < 0.5:
-        risk_label = "Riesgo moderado de desaprobación"
-        risk_text = (
-            "El estudiante se encuentra en una zona de riesgo moderado. "
-            "Conviene intervenir pronto para evitar que las brechas se amplíen."
-        )
-        tags_risk.append("⚠️ Riesgo moderado")
-    elif proba_pass < 0.7:
-        risk_label = "Zona intermedia (seguimiento)"
-        risk_text = (
-            "El pronóstico es intermedio. Se recomienda hacer seguimiento cercano, "
-            "reforzar hábitos de estudio y monitorear avances."
-        )
-        tags_risk.append("🔎 Seguimiento")
-    else:
-        risk_label = "Buen pronóstico de aprobación"
-        risk_text = (
-            "El modelo estima una buena probabilidad de aprobación. "
-            "Aun así, es clave mantener hábitos de estudio y apoyo consistentes."
-        )
-        tags_risk.append("✅ Buen pronóstico")
+    return scoring.ensure_expected_columns(df, EXPECTED_COLS, NUM_FEATS)
 
-    # Apoyos escolar y familiar
-    support_parts = []
-    support_tags = []
 
-    if schoolsup == "no" and famsup == "no":
-        support_parts.append(
-            "No se reporta apoyo educativo sistemático ni desde el colegio ni desde la familia. "
-            "Se sugiere coordinar un plan conjunto de tutorías, refuerzos y acompañamiento en casa."
-        )
-        support_tags.extend(["Apoyo escolar", "Apoyo familiar"])
-    elif schoolsup == "no":
-        support_parts.append(
-            "Se observa apoyo familiar, pero no apoyo educativo extra desde el colegio. "
-            "Podría valorarse la participación en talleres, reforzamientos o tutorías institucionales."
-        )
-        support_tags.append("Apoyo escolar")
-    elif famsup == "no":
-        support_parts.append(
-            "Existe apoyo desde el colegio, pero el acompañamiento familiar es limitado. "
-            "Conviene fortalecer la comunicación con la familia y acordar rutinas de estudio en casa."
-        )
-        support_tags.append("Apoyo familiar")
-    else:
-        support_parts.append(
-            "Se cuenta con apoyos escolar y/o familiar. Es importante mantenerlos y revisar su frecuencia y calidad, "
-            "asegurando espacios de comunicación periódica sobre el progreso académico."
-        )
-        support_tags.append("Mantener apoyos")
+def predict_proba_one(data: dict) -> float:
+    if compiled_scorer is not None:
+        return compiled_scorer.predict_one(data)
+    df = pd.DataFrame([data])
+    df = ensure_expected_columns(df)
+    return float(winner_pipe.predict_proba(df)[0, 1])
 
-    # Hábitos de estudio y asistencia
-    habits_parts = []
-    habits_tags = []
 
-    if studytime <= 2:
-        habits_parts.append(
-            "Incrementar gradualmente las horas de estudio semanal, organizando un horario fijo de repaso y tareas "
-            "(por ejemplo, bloques de 30–40 minutos al día)."
-        )
-        habits_tags.append("Rutina de estudio")
-    elif studytime == 3 and proba_pass < 0.7:
-        habits_parts.append(
-            "Revisar la calidad del tiempo de estudio (ambiente, concentración, planificación) y promover técnicas de estudio activas."
-        )
-        habits_tags.append("Calidad de estudio")
+def predict_proba_many(rows: list) -> np.ndarray:
+    """Varias filas en una sola llamada al modelo."""
+    if compiled_scorer is not None:
+        return compiled_scorer.predict_many(rows)
+    return model_bundle.predict_frame(rows)
 
-    if absences >= 20:
-        habits_parts.append(
-            "El número de inasistencias es alto. Es prioritario trabajar en un plan de asistencia regular, "
-            "identificando causas de las faltas y acordando compromisos con familia y colegio."
-        )
-        habits_tags.append("Asistencia crítica")
-    elif absences >= 10:
-        habits_parts.append(
-            "Las inasistencias podrían estar afectando el rendimiento. Se recomienda monitorear asistencia y avisos tempranos "
-            "ante nuevas ausencias."
-        )
-        habits_tags.append("Asistencia a clases")
 
-    if failures >= 2:
-        habits_parts.append(
-            "Considerar un plan de recuperación focalizado en las áreas desaprobadas (refuerzos, tutorías, evaluación continua)."
+# ==============================
+#  Predicción por lote en bloques (memoria acotada)
+# ==============================
+BATCH_CHUNK_ROWS = int(os.getenv("BATCH_CHUNK_ROWS", "5000"))
+SPOOL_MAX_BYTES = 8 * 1024 * 1024  # pasado este tamaño el resultado se vuelca a disco
+MAX_REPORTED_REJECTS = 10_000  # filas del reporte de rechazos que se guardan (el conteo es siempre completo)
+
+
+def score_file_in_chunks(
+    file, chunk_rows: int = BATCH_CHUNK_ROWS, on_progress=None, timer=None, explain_rows: bool = False
+) -> dict:
+    """
+    Lee el archivo (CSV, Parquet o Feather) por bloques de `chunk_rows` filas
+    (solo las columnas del esquema, con dtypes compactos), descarta las filas
+    inválidas (ver ingest.py), puntúa cada bloque con `winner_pipe` y va
+    agregando el resultado a un archivo temporal. Solo un bloque vive en memoria a la vez, sin importar el tamaño del archivo.
+    Con `explain_rows` se agrega `top_drivers` a cada fila (varias veces más lento).
+    """
+    import cohorts
+    import thresholds
+
+    timer = timer or instrumentation.NULL_TIMER
+    total_bytes = getattr(file, "size", None) or 0
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    counts = np.zeros(2, dtype=np.int64)
+    preview = None
+    missing = []
+    n_rows = 0
+    probas = []
+    targets = []
+    cohort_agg = cohorts.CohortAggregator()
+    rejects = []
+    n_rejected = 0
+
+    reader = ingest.open_roster(file, roster_spec, chunk_rows)
+    missing = [c for c in VISIBLE_COLS if c not in reader.columns]
+    for offset, raw in timer.timed(f"read_{reader.format}", reader.raw_chunks()):
+        with timer.stage("validate"):
+            chunk, chunk_rejects = roster_spec.validate(raw, row_offset=offset)
+        if len(chunk_rejects):
+            n_rejected += len(raw) - len(chunk)
+            kept = sum(len(r) for r in rejects)
+            if kept < MAX_REPORTED_REJECTS:
+                rejects.append(chunk_rejects.head(MAX_REPORTED_REJECTS - kept))
+        if chunk.empty:
+            continue
+        if targets is not None and scoring.TARGET_COL in chunk.columns:
+            targets.append(chunk[scoring.TARGET_COL])
+        else:
+            targets = None
+
+        scored = scoring.score_frame(
+            winner_pipe, chunk, EXPECTED_COLS, NUM_FEATS, thr=BEST_THR, labels=LABELS,
+            explainer=explainer if explain_rows else None, timer=timer,
         )
-        habits_tags.append("Plan de recuperación")
-    elif failures == 1 and proba_pass < 0.7:
-        habits_parts.append(
-            "Acompañar especialmente las asignaturas en las que ya hubo dificultades, con seguimiento de tareas y evaluaciones parciales."
+        with timer.stage("to_csv"):
+            scored.to_csv(spool, index=False, header=preview is None, mode="wb", encoding="utf-8")
+
+        if preview is None:
+            preview = scored.head()
+        counts += np.bincount(scored["pred_int"].to_numpy(), minlength=2)
+        probas.append(scored["proba_pass"].to_numpy())
+        with timer.stage("cohorts"):
+            cohort_agg.update(scored)
+        n_rows += len(scored)
+
+        if on_progress is not None:
+            if reader.total_rows:
+                on_progress(min(reader.rows / reader.total_rows, 1.0))
+            elif total_bytes:
+                on_progress(min(file.tell() / total_bytes, 1.0))
+
+    spool.seek(0)
+    with timer.stage("thresholds"):
+        y_true = thresholds.clean_labels(pd.concat(targets)) if targets else None
+        # Probabilidades ordenadas una vez: el slider de umbral no vuelve a predecir
+        explorer = thresholds.ThresholdExplorer.from_scores(
+            np.concatenate(probas) if probas else np.empty(0), y_true
         )
-        habits_tags.append("Refuerzo específico")
+    return {
+        "spool": spool,
+        "n_rows": n_rows,
+        "counts": {LABELS[0]: int(counts[0]), LABELS[1]: int(counts[1])},
+        "preview": preview,
+        "missing": missing,
+        "cohorts": cohort_agg.frame(),
+        "cohort_hist": cohort_agg.hist_frame(),
+        "explorer": explorer,
+        "ingest": reader.stats(),
+        "n_rejected": n_rejected,
+        "rejects": pd.concat(rejects, ignore_index=True) if rejects else pd.DataFrame(columns=ingest.REJECT_COLUMNS),
+    }
+
+
+BATCH_CACHE_DIR = os.getenv("BATCH_CACHE_DIR", os.path.join(tempfile.gettempdir(), "panel_batch_cache"))
+BATCH_CACHE_TTL_HOURS = float(os.getenv("BATCH_CACHE_TTL_HOURS", "24"))
+BATCH_CACHE_MAX_MB = int(os.getenv("BATCH_CACHE_MAX_MB", "512"))
 
-    if not habits_parts:
-        habits_parts.append(
-            "Mantener una rutina de estudio estable y una asistencia regular a clases, revisando periódicamente tareas y evaluaciones."
-        )
-        habits_tags.append("Hábitos saludables")
 
-    # Bienestar y proyecto de vida
-    wellbeing_parts = []
-    wellbeing_tags = []
+@st.cache_resource
+def load_batch_cache():
+    import batch_cache
 
-    if health <= 2:
-        wellbeing_parts.append(
-            "Explorar posibles dificultades de salud física o emocional. De ser necesario, derivar a psicopedagogía o consejería "
-            "para brindar apoyo oportuno."
-        )
-        wellbeing_tags.append("Bienestar integral")
+    return batch_cache.BatchResultCache(
+        root=BATCH_CACHE_DIR,
+        ttl_seconds=BATCH_CACHE_TTL_HOURS * 3600,
+        max_bytes=BATCH_CACHE_MAX_MB * 1024 * 1024,
+    )
 
-    if freetime >= 4 and studytime <= 2:
-        wellbeing_parts.append(
-            "Equilibrar el tiempo libre con responsabilidades académicas, manteniendo espacios de descanso pero evitando la postergación constante de tareas."
-        )
-        wellbeing_tags.append("Equilibrio tiempo libre")
 
-    if not wellbeing_parts:
-        wellbeing_parts.append(
-            "Continuar cuidando el bienestar emocional y físico del estudiante, reforzando espacios de escucha y confianza con familia y tutores."
-        )
-        wellbeing_tags.append("Seguimiento socioemocional")
+# ==============================
+#  Tiempos por pestaña (fragmentos)
+# ==============================
+SECTION_NAMES = {"individual": "individual", "batch": "lote", "threshold": "umbral del lote"}
 
-    if higher == "yes":
-        aspiration_text = (
-            "El interés por estudios superiores puede usarse como motor de motivación. "
-            "Vincular metas de corto plazo (tareas, evaluaciones) con ese proyecto de futuro."
-        )
-        aspiration_tag = "Proyecto de vida"
-    else:
-        aspiration_text = (
-            "Explorar intereses, talentos y posibles proyectos de vida puede ayudar a darle sentido al esfuerzo académico actual."
-        )
-        aspiration_tag = "Orientación vocacional"
-
-    wellbeing_text = " ".join(wellbeing_parts) + " " + aspiration_text
-
-    # Construcción de chips/tags
-    def join_tags(tags):
-        if not tags:
-            return ""
-        return "".join(f'<span class="reco-tag">{t}</span>' for t in tags)
-
-    risk_tags_html = join_tags(tags_risk)
-    support_tags_html = join_tags(support_tags)
-    habits_tags_html = join_tags(habits_tags)
-    wellbeing_tags_html = join_tags(wellbeing_tags + [aspiration_tag])
-
-    support_text = " ".join(support_parts)
-    habits_text = " ".join(habits_parts)
-
-    html = f"""
-<div class="reco-card">
-  <div class="reco-header">
-    <div>
-      <div class="reco-title">Recomendaciones personalizadas</div>
-      <div class="reco-subtitle">Sugerencias orientativas a partir de los hábitos y apoyos registrados.</div>
-    </div>
-    <div class="reco-pill-beta">
-      <span>Fase beta</span>
-      <span>🧪</span>
-    </div>
-  </div>
-  <div class="reco-body">
-    <div>
-      <div class="reco-section-label">{risk_label}</div>
-      <div class="reco-section-text">{risk_text}</div>
-      <div class="reco-tags">{risk_tags_html}</div>
-    </div>
-    <div class="reco-divider"></div>
-    <div>
-      <div class="reco-section-label">Apoyos escolar y familiar</div>
-      <div class="reco-section-text">{support_text}</div>
-      <div class="reco-tags">{support_tags_html}</div>
-    </div>
-    <div class="reco-divider"></div>
-    <div>
-      <div class="reco-section-label">Hábitos de estudio y asistencia</div>
-      <div class="reco-section-text">{habits_text}</div>
-      <div class="reco-tags">{habits_tags_html}</div>
-    </div>
-    <div class="reco-divider"></div>
-    <div>
-      <div class="reco-section-label">Bienestar y proyecto de vida</div>
-      <div class="reco-section-text">{wellbeing_text}</div>
-      <div class="reco-tags">{wellbeing_tags_html}</div>
-    </div>
-  </div>
-  <div class="reco-footer-note">
-    Estas recomendaciones son referenciales y deben complementarse con entrevistas, observación en aula y los criterios del equipo docente y psicopedagógico.
-  </div>
-</div>
-"""
-    return html
+# Tiempos por etapa (ver instrumentation.py): líneas JSON en TIMINGS_LOG ("-" = stderr,
+# vacío = desactivado) e histogramas en METRICS_PROM_PATH (formato de texto de Prometheus)
+TIMINGS_LOG = os.getenv("TIMINGS_LOG", "-")
+METRICS_PROM_PATH = os.getenv("METRICS_PROM_PATH", os.path.join(tempfile.gettempdir(), "panel_metrics.prom"))
+DEBUG_TIMINGS = os.getenv("DEBUG_TIMINGS", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "panel_profiles"))
+
+
+@st.cache_resource
+def load_stage_metrics():
+    # Un solo agregado por proceso, compartido por todas las sesiones
+    instrumentation.configure_json_log(TIMINGS_LOG)
+    return instrumentation.StageMetrics()
+
+
+stage_metrics = load_stage_metrics()
+
+
+def start_section_timer(section: str):
+    """Cronómetro del rerun y, si se pidió desde la barra lateral, cProfile para esta ejecución."""
+    profiler = None
+    if DEBUG_TIMINGS and st.session_state.get("profile_next") == section:
+        del st.session_state["profile_next"]
+        profiler = instrumentation.start_profile()
+    return instrumentation.RerunTimer(section), profiler
+
+
+def render_timing_readout(section: str, timer, profiler=None):
+    """
+    Cada pestaña es un fragmento: al interactuar con una, solo esa se vuelve
+    a ejecutar. El contador de la otra pestaña no cambia, lo que demuestra
+    que su trabajo se omitió en ese rerun.
+    """
+    elapsed_ms = timer.total_ms
+    runs = st.session_state.setdefault("section_runs", {name: 0 for name in SECTION_NAMES})
+    runs[section] = runs.get(section, 0) + 1
+    counters = " · ".join(f"{label}: {runs.get(name, 0)}" for name, label in SECTION_NAMES.items())
+    st.caption(f"⏱️ Rerun de esta pestaña: {elapsed_ms:.1f} ms · Ejecuciones por pestaña — {counters}")
+
+    instrumentation.log_rerun(timer, elapsed_ms, session=get_session_id(), model_version=MODEL_VERSION)
+    instrumentation.accumulate(st.session_state.setdefault("stage_totals", {}), timer, elapsed_ms)
+    stage_metrics.observe(section, timer.stages_ms, elapsed_ms)
+    if METRICS_PROM_PATH:
+        stage_metrics.write(METRICS_PROM_PATH, extra=metrics_extra())
+
+    if DEBUG_TIMINGS and timer.stages_ms:
+        st.caption("🔧 Etapas: " + " · ".join(f"{name} {ms:.1f} ms" for name, ms in timer.stages_ms.items()))
+    if profiler is not None:
+        profile = instrumentation.finish_profile(profiler, PROFILE_DIR, section)
+        with st.expander(f"🔬 cProfile de esta ejecución · {profile['path']}"):
+            st.code(profile["summary"], language=None)
 
 
 # ==============================
@@ -769,13 +476,110 @@ st.caption(
     "sirve como apoyo para decisiones pedagógicas."
 )
 
-tab_ind, tab_batch = st.tabs(["🧑‍🎓 Predicción individual", "📂 Predicción por lote (CSV)"])
+tab_ind, tab_batch = st.tabs(["🧑‍🎓 Predicción individual", "📂 Predicción por lote"])
 st.caption("Selecciona el modo de uso: analizar un solo estudiante o cargar un archivo completo de alumnos.")
 
 # ==============================
 #  PREDICCIÓN INDIVIDUAL
 # ==============================
-with tab_ind:
+def pack_spec(spec: dict) -> bytes:
+    return zlib.compress(json.dumps(spec, separators=(",", ":")).encode("utf-8"))
+
+
+def unpack_spec(packed: bytes) -> dict:
+    return json.loads(zlib.decompress(packed))
+
+
+def build_individual_result(data: dict, timer) -> dict:
+    """
+    Todo lo que la tarjeta individual calcula para un perfil: probabilidad,
+    factores principales, variantes de ¿qué pasaría si…? y los gráficos ya
+    convertidos a especificaciones Vega-Lite. Se guarda entero en la caché de
+    predicciones: un perfil repetido se dibuja sin puntuar ni pasar por Altair.
+    """
+    import altair as alt
+
+    import explain
+
+    with timer.stage("model"):
+        proba_pass = predict_proba_one(data)
+    pred_int = int(proba_pass >= BEST_THR)
+
+    drivers = []
+    if explainer is not None:
+        with timer.stage("explain"):
+            _, contrib = explainer.explain_one(data)
+            drivers = explain.top_drivers(contrib.to_frame().T, np.array([pred_int]))[0]
+
+    with timer.stage("whatif"):
+        sens = whatif.sensitivity(predict_proba_many, data, WHATIF_GRID, proba_pass)
+        best = whatif.best_changes(sens)
+    whatif_ms = timer.stages_ms["whatif"]
+
+    with timer.stage("altair"):
+        prob_df = pd.DataFrame(
+            {"Clase": ["FAIL", "PASS"], "Probabilidad": [1 - proba_pass, proba_pass]}
+        )
+        proba_chart = (
+            alt.Chart(prob_df)
+            .mark_bar(cornerRadiusTopLeft=8, cornerRadiusTopRight=8)
+            .encode(
+                x=alt.X("Clase:N", sort=["FAIL", "PASS"], title=None),
+                y=alt.Y(
+                    "Probabilidad:Q",
+                    scale=alt.Scale(domain=[0, 1]),
+                    axis=alt.Axis(format="%", title="Probabilidad"),
+                ),
+                color=alt.Color(
+                    "Clase:N",
+                    scale=alt.Scale(range=["#fecaca", "#bfdbfe"]),
+                    legend=None,
+                ),
+            )
+            .properties(height=260)
+            .configure_view(strokeWidth=0, fill="#ffffff")
+        )
+
+        whatif_charts = []
+        for feature, values in WHATIF_GRID.items():
+            sub = sens[sens["feature"] == feature]
+            x_type = "Q" if isinstance(values[0], int) else "N"
+            base = alt.Chart(sub).encode(
+                x=alt.X(f"value:{x_type}", title=None),
+                y=alt.Y("proba_pass:Q", scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format="%", title=None)),
+            )
+            line = base.mark_line(color="#2563eb", point=x_type == "N" or len(values) <= 5)
+            current = base.transform_filter("datum.current").mark_point(
+                color="#16a34a", size=90, filled=True
+            )
+            thr_rule = alt.Chart(pd.DataFrame({"thr": [BEST_THR]})).mark_rule(
+                color="#f59e0b", strokeDash=[4, 4]
+            ).encode(y="thr:Q")
+            whatif_charts.append(
+                alt.layer(line, current, thr_rule).properties(
+                    title=WHATIF_LABELS[feature], width=190, height=130
+                )
+            )
+        whatif_chart = alt.concat(*whatif_charts, columns=3).configure_view(strokeWidth=0, fill="#ffffff")
+        # Comprimidas: una entrada ocupa ~10 KB en vez de ~90 KB de dicts de Python
+        proba_spec = pack_spec(proba_chart.to_dict())
+        whatif_spec = pack_spec(whatif_chart.to_dict())
+
+    return {
+        "proba_pass": proba_pass,
+        "drivers": drivers,
+        "best": [(row.feature, row.value, row.proba_pass, row.delta) for row in best.itertuples()],
+        "n_variants": len(sens),
+        "whatif_ms": whatif_ms,
+        "proba_spec": proba_spec,
+        "whatif_spec": whatif_spec,
+    }
+
+
+@st.fragment
+def render_individual_tab():
+    timer, profiler = start_section_timer("individual")
+    bind_current_model()
 
     # Encabezado dentro de la tarjeta
     st.markdown(
@@ -1009,12 +813,15 @@ with tab_ind:
             "health": health,
         }
 
-        df = pd.DataFrame([data])
-        df = ensure_expected_columns(df)
-
-        proba_pass = float(winner_pipe.predict_proba(df)[0, 1])
+        cache_key = canonical_key(data, SELECTED_FEATURES, MODEL_VERSION)
+        # Un perfil repetido reutiliza todo lo calculado (probabilidad, factores, ¿qué pasaría si…? y gráficos)
+        shown = prediction_cache.get_or_compute(cache_key, lambda: build_individual_result(data, timer))
+        proba_pass = shown["proba_pass"]
         pred_int = int(proba_pass >= BEST_THR)
         pred_label = LABELS[pred_int]
+        if audit_sink is not None:
+            with timer.stage("audit"):
+                audit_sink.record(data, proba_pass, pred_label, BEST_THR, MODEL_VERSION, session=get_session_id())
 
         if proba_pass >= BEST_THR:
             explicacion = (
@@ -1059,35 +866,28 @@ with tab_ind:
             )
             st.markdown('</div>', unsafe_allow_html=True)
 
-        st.markdown("#### Distribución de probabilidad 📊")
-        prob_df = pd.DataFrame(
-            {"Clase": ["FAIL", "PASS"], "Probabilidad": [1 - proba_pass, proba_pass]}
-        )
-
-        chart = (
-            alt.Chart(prob_df)
-            .mark_bar(cornerRadiusTopLeft=8, cornerRadiusTopRight=8)
-            .encode(
-                x=alt.X("Clase:N", sort=["FAIL", "PASS"], title=None),
-                y=alt.Y(
-                    "Probabilidad:Q",
-                    scale=alt.Scale(domain=[0, 1]),
-                    axis=alt.Axis(format="%", title="Probabilidad"),
-                ),
-                color=alt.Color(
-                    "Clase:N",
-                    scale=alt.Scale(range=["#fecaca", "#bfdbfe"]),
-                    legend=None,
-                ),
+        # Variables que más empujan hacia la decisión (aportes del bosque, ver explain.py)
+        if shown["drivers"]:
+            st.markdown(f"#### Factores que más empujan hacia {pred_label} 🔍")
+            st.markdown(
+                "\n".join(
+                    f"- **{feature}** = `{data.get(feature)}` · aporte {value:+.3f} a la probabilidad de PASS"
+                    for feature, value in shown["drivers"]
+                )
             )
-            .properties(height=260)
-            .configure_view(strokeWidth=0, fill="#ffffff")
+            st.caption("Aportes de cada variable recorriendo los árboles del modelo; suman la probabilidad estimada.")
+
+        cache_stats = prediction_cache.stats()
+        st.caption(
+            f"Caché de predicciones · aciertos: {cache_stats['hits']} · fallos: {cache_stats['misses']} · "
+            f"desalojos: {cache_stats['evictions']} · entradas: {cache_stats['size']}/{cache_stats['max_entries']}"
         )
 
-        st.altair_chart(chart, use_container_width=True)
+        st.markdown("#### Distribución de probabilidad 📊")
+        st.vega_lite_chart(unpack_spec(shown["proba_spec"]), use_container_width=True)
 
         # Panel de recomendaciones (fase beta)
-        reco_html = build_recommendations_html(
+        reco_html = recommendations.build_recommendations_html(
             proba_pass=proba_pass,
             pred_label=pred_label,
             schoolsup=schoolsup,
@@ -1101,84 +901,503 @@ with tab_ind:
         )
         st.markdown(reco_html, unsafe_allow_html=True)
 
+        # ¿Qué pasaría si…? Todas las variantes del perfil en una sola inferencia
+        st.markdown("#### ¿Qué pasaría si…? 🔁")
+        st.vega_lite_chart(unpack_spec(shown["whatif_spec"]), use_container_width=False)
+        if not shown["best"]:
+            st.write("Ningún cambio individual de estas variables sube la probabilidad de PASS.")
+        else:
+            st.markdown(
+                "\n".join(
+                    f"- **{WHATIF_LABELS[feature]}** → `{value}`: {proba:.3f} ({delta:+.3f})"
+                    for feature, value, proba, delta in shown["best"]
+                )
+            )
+        st.caption(
+            f"{shown['n_variants']} variantes puntuadas en una sola llamada ({shown['whatif_ms']:.1f} ms). "
+            f"Punto verde: valor actual · línea naranja: umbral {BEST_THR:.2f}."
+        )
+
+    # El retador puntúa en segundo plano cuando el resultado ya está dibujado
+    if submitted and shadow_scorer is not None:
+        with timer.stage("shadow_submit"):
+            shadow_scorer.submit_rows([data], [proba_pass], BEST_THR, MODEL_VERSION)
+
     st.markdown("</div>", unsafe_allow_html=True)
+    render_timing_readout("individual", timer, profiler)
+
+
+with tab_ind:
+    render_individual_tab()
+
+def render_proba_distribution(sorted_proba, thr: float, timer):
+    """
+    Histograma, ECDF y cuantiles de `proba_pass` calculados en el servidor
+    (distribution.py): el gráfico recibe siempre el mismo número de filas,
+    sea cual sea el tamaño del lote.
+    """
+    import altair as alt
+
+    st.markdown("#### Distribución de `proba_pass` 📈")
+    with timer.stage("distribution"):
+        hist = distribution.histogram(sorted_proba)
+        ecdf = distribution.ecdf(sorted_proba)
+        quant = distribution.quantiles(sorted_proba)
+
+    with timer.stage("altair"):
+        thr_rule = alt.Chart(pd.DataFrame({"thr": [thr]})).mark_rule(
+            color="#ef4444", strokeDash=[4, 4]
+        ).encode(x="thr:Q")
+        hist_chart = alt.Chart(hist).mark_bar(color="#bfdbfe").encode(
+            x=alt.X("bin_start:Q", bin="binned", scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format="%", title="proba_pass")),
+            x2="bin_end:Q",
+            y=alt.Y("count:Q", title="Estudiantes"),
+            tooltip=[
+                alt.Tooltip("bin_start:Q", title="Desde", format=".3f"),
+                alt.Tooltip("bin_end:Q", title="Hasta", format=".3f"),
+                alt.Tooltip("count:Q", title="Estudiantes"),
+                alt.Tooltip("share:Q", title="Parte del lote", format=".1%"),
+            ],
+        )
+        ecdf_chart = alt.Chart(ecdf).mark_line(color="#2563eb", strokeWidth=2).encode(
+            x=alt.X("proba:Q", scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format="%", title="proba_pass")),
+            y=alt.Y("ecdf:Q", scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format="%", title="Parte del lote ≤ x")),
+            tooltip=[
+                alt.Tooltip("proba:Q", title="proba_pass", format=".2f"),
+                alt.Tooltip("ecdf:Q", title="Parte del lote ≤ x", format=".1%"),
+            ],
+        )
+        st.altair_chart(
+            alt.hconcat(
+                alt.layer(hist_chart, thr_rule).properties(title="Histograma", height=230),
+                alt.layer(ecdf_chart, thr_rule).properties(title="Distribución acumulada (ECDF)", height=230),
+            ).configure_view(strokeWidth=0, fill="#ffffff"),
+            use_container_width=True,
+        )
+
+    st.dataframe(
+        pd.DataFrame([quant["proba"].to_numpy()], columns=[f"P{round(q * 100)}" for q in quant["q"]]),
+        hide_index=True,
+    )
+    st.caption(
+        f"La línea roja marca el umbral elegido ({thr:.2f}); en la ECDF, su altura es la parte del lote marcada como FAIL. "
+        f"El gráfico usa {len(hist)} barras y {len(ecdf)} puntos para cualquier tamaño de lote."
+    )
+
+
+EXPORT_LABELS = {
+    "csv": "CSV",
+    "csv.gz": "CSV comprimido (gzip)",
+    "parquet": "Parquet",
+}
+# Columnas de texto que agrega la puntuación (se fijan como texto al convertir a Parquet)
+EXPORT_TEXT_COLS = ["pred_label", "risk_tier", "reco_tags", "top_drivers"]
+
+
+def batch_file_key(file, explain_rows: bool) -> str:
+    """
+    Clave de caché del archivo subido (contenido + versión del modelo + variante).
+    El hash se recuerda por `file_id` en la sesión: los reruns con el mismo
+    archivo no lo vuelven a leer entero.
+    """
+    import batch_cache
+
+    variant = "drivers" if explain_rows else "basic"
+    version = f"{MODEL_VERSION}:{scoring.OUTPUT_VERSION}:{variant}"
+    file_id = getattr(file, "file_id", None)
+    if file_id is None:
+        return batch_cache.file_key(file, version)
+    remembered = st.session_state.get("batch_file_key")
+    if remembered is None or remembered[:2] != (file_id, version):
+        remembered = st.session_state["batch_file_key"] = (file_id, version, batch_cache.file_key(file, version))
+    return remembered[2]
+
+
+def open_scored_csv(results_cache, batch_key: str, spool):
+    """
+    Una copia abierta del CSV puntuado para un hilo en segundo plano, sin
+    cargarlo en memoria: el archivo de la caché de lotes o, si la caché ya lo
+    descartó (p. ej. un lote mayor que BATCH_CACHE_MAX_MB), un temporal en disco.
+    """
+    scored = results_cache.open_csv(batch_key)
+    if scored is None:
+        scored = tempfile.TemporaryFile()
+        shutil.copyfileobj(spool, scored)
+        spool.seek(0)
+        scored.seek(0)
+    return scored
+
+
+def render_batch_export(results_cache, batch_key: str, spool, timer):
+    """
+    La descarga se prepara solo al pedirla: el archivo se genera una vez por
+    lote y formato en la caché de lotes, y el botón de descarga (que carga los
+    bytes en memoria) solo existe hasta que se usa.
+    """
+    import batch_cache
+
+    col_fmt, col_btn = st.columns([2, 1])
+    with col_fmt:
+        fmt = st.radio(
+            "Formato de descarga",
+            list(EXPORT_LABELS),
+            format_func=EXPORT_LABELS.get,
+            horizontal=True,
+            key="batch_export_fmt",
+        )
+    requested = st.session_state.get("batch_export_request")
+    with col_btn:
+        if st.button("📦 Preparar descarga", key="batch_export_prepare"):
+            requested = st.session_state["batch_export_request"] = (batch_key, fmt)
+    if requested != (batch_key, fmt):
+        return
+
+    with timer.stage(f"export_{fmt}"):
+        string_cols = list(roster_spec.categorical) + EXPORT_TEXT_COLS
+        path = results_cache.export(batch_key, fmt, spool, string_cols=string_cols)
+    ext, mime = batch_cache.EXPORT_FORMATS[fmt]
+    with open(path, "rb") as f:
+        st.download_button(
+            f"⬇️ Descargar resultados ({EXPORT_LABELS[fmt]}, {os.path.getsize(path) / 1e6:.1f} MB)",
+            data=f,
+            file_name=f"predicciones_pass_fail{ext}",
+            mime=mime,
+            on_click=lambda: st.session_state.pop("batch_export_request", None),
+        )
+
 
 # ==============================
-#  PREDICCIÓN POR LOTE (CSV)
+#  PREDICCIÓN POR LOTE (CSV / Parquet / Feather)
 # ==============================
-with tab_batch:
+@st.fragment
+def render_batch_threshold(explorer, counts: dict, best_thr: float, labels: dict):
+    """
+    Exploración del umbral sobre un lote ya puntuado. Es un fragmento aparte:
+    al mover el slider solo se vuelve a ejecutar esta parte, con búsquedas
+    binarias sobre las probabilidades ya ordenadas, sin volver a leer el
+    archivo ni la caché ni redibujar las demás vistas del lote.
+    """
+    timer, profiler = start_section_timer("threshold")
+    st.markdown("#### Explorar el umbral de decisión 🎚️")
+    thr = st.slider(
+        "Umbral para PASS (proba_pass ≥ umbral)",
+        0.0, 1.0, float(best_thr), 0.01,
+        key="batch_thr",
+        help="Solo cambia este resumen; el CSV descargable usa el umbral del modelo.",
+    )
+    t_thr = time.perf_counter()
+    at_thr = explorer.at(thr)
+    thr_ms = (time.perf_counter() - t_thr) * 1000
+
+    cT1, cT2 = st.columns(2)
+    with cT1:
+        st.markdown('<div class="metric-card">', unsafe_allow_html=True)
+        st.markdown('<div class="metric-label">Estudiantes marcados (FAIL)</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{at_thr["fail"]}</div>', unsafe_allow_html=True)
+        st.markdown(
+            f'<div class="metric-sub">{at_thr["flagged_share"]*100:.1f}% del lote · Umbral: {thr:.2f}</div>',
+            unsafe_allow_html=True,
+        )
+        st.markdown('</div>', unsafe_allow_html=True)
+    with cT2:
+        st.markdown('<div class="metric-card pass">', unsafe_allow_html=True)
+        st.markdown('<div class="metric-label">Estudiantes PASS</div>', unsafe_allow_html=True)
+        st.markdown(f'<div class="metric-value">{at_thr["pass"]}</div>', unsafe_allow_html=True)
+        st.markdown(
+            f'<div class="metric-sub">Con el umbral del modelo ({best_thr:.2f}): '
+            f'{counts[labels[1]]} PASS / {counts[labels[0]]} FAIL</div>',
+            unsafe_allow_html=True,
+        )
+        st.markdown('</div>', unsafe_allow_html=True)
+
+    if explorer.has_labels:
+        st.write(f"Matriz de confusión contra `{scoring.TARGET_COL}`:")
+        st.dataframe(
+            pd.DataFrame(
+                {"Pred. FAIL": [at_thr["tn"], at_thr["fn"]], "Pred. PASS": [at_thr["fp"], at_thr["tp"]]},
+                index=["Real FAIL", "Real PASS"],
+            )
+        )
+        st.caption(
+            f"Exactitud: {at_thr['accuracy']:.3f} · FAIL reales detectados: {at_thr['fail_recall']:.1%} · "
+            f"Marcados que son FAIL reales: {at_thr['fail_precision']:.1%}"
+        )
+
+    render_proba_distribution(explorer.sorted_proba, thr, timer)
+    st.caption(f"Consulta del umbral: {thr_ms:.2f} ms sobre {explorer.n} probabilidades ordenadas (sin volver a predecir).")
+    render_timing_readout("threshold", timer, profiler)
+
+
+@st.fragment
+def render_batch_tab():
+    timer, profiler = start_section_timer("batch")
+    bind_current_model()
     st.markdown('<div class="card">', unsafe_allow_html=True)
 
-    st.markdown("### 📂 Predicción por lote (CSV)")
+    st.markdown("### 📂 Predicción por lote (CSV / Parquet / Feather)")
 
     st.write(
-        "Sube un archivo **CSV** con, al menos, las siguientes columnas:\n\n"
+        "Sube un archivo **CSV**, **Parquet** o **Feather** con, al menos, las siguientes columnas:\n\n"
         "`" + ", ".join(VISIBLE_COLS) + "`\n\n"
         "Las columnas faltantes que el modelo espere se rellenarán con valores neutros."
     )
 
     file = st.file_uploader(
-        "Archivo CSV",
-        type=["csv"],
-        help="El archivo debe contener una fila por estudiante con las columnas indicadas."
+        "Archivo CSV, Parquet o Feather",
+        type=ingest.UPLOAD_TYPES,
+        help="El archivo debe contener una fila por estudiante con las columnas indicadas. "
+        "Parquet y Feather se leen más rápido que CSV en archivos grandes.",
+    )
+    explain_rows = explainer is not None and st.checkbox(
+        "Explicar cada estudiante (columna `top_drivers`)",
+        value=False,
+        key="batch_explain",
+        help="Agrega las variables que más empujan cada predicción. El lote tarda varias veces más en puntuarse.",
     )
 
     if file is not None:
-        df_in = pd.read_csv(file)
+        results_cache = load_batch_cache()
+        with timer.stage("batch_cache"):
+            batch_key = batch_file_key(file, explain_rows)
+            result = results_cache.get(batch_key)
+
+        if result is None:
+            progress = st.progress(0.0, text="Procesando archivo por bloques…")
+            result = score_file_in_chunks(
+                file,
+                on_progress=lambda frac: progress.progress(frac, text=f"Procesando archivo… {frac:.0%}"),
+                timer=timer,
+                explain_rows=explain_rows,
+            )
+            progress.empty()
+            with timer.stage("batch_cache"):
+                results_cache.put(batch_key, result)
 
-        faltantes_visibles = [c for c in VISIBLE_COLS if c not in df_in.columns]
-        if faltantes_visibles:
+        if result["n_rejected"]:
+            rejects = result["rejects"]
             st.warning(
-                "Faltan columnas en el CSV (se completarán con valores por defecto):\n\n- "
-                + "\n- ".join(faltantes_visibles)
+                f"{result['n_rejected']} filas tienen valores vacíos, fuera de rango o con categorías "
+                "que el modelo no conoce; no se puntuaron."
             )
+            with st.expander("Ver reporte de filas rechazadas"):
+                st.dataframe(
+                    rejects.rename(columns={"row": "Fila", "column": "Columna", "value": "Valor", "reason": "Motivo"}),
+                    hide_index=True,
+                )
+                if len(rejects) >= MAX_REPORTED_REJECTS:
+                    st.caption(f"Se muestran los primeros {MAX_REPORTED_REJECTS} problemas.")
+                st.download_button(
+                    "⬇️ Descargar reporte de rechazos (CSV)",
+                    data=rejects.to_csv(index=False).encode("utf-8"),
+                    file_name="filas_rechazadas.csv",
+                    mime="text/csv",
+                )
 
-        df_in = ensure_expected_columns(df_in)
-
-        proba = winner_pipe.predict_proba(df_in)[:, 1]
-        pred_int = (proba >= BEST_THR).astype(int)
-        pred_label = [LABELS[int(z)] for z in pred_int]
+        if result["preview"] is None:
+            st.warning("El archivo no contiene filas válidas de estudiantes.")
+        else:
+            faltantes_visibles = result["missing"]
+            if faltantes_visibles:
+                st.warning(
+                    "Faltan columnas en el archivo (se completarán con valores por defecto):\n\n- "
+                    + "\n- ".join(faltantes_visibles)
+                )
 
-        df_out = df_in.copy()
-        df_out["proba_pass"] = proba
-        df_out["pred_int"] = pred_int
-        df_out["pred_label"] = pred_label
+            st.write(f"Vista previa de resultados ({result['n_rows']} estudiantes procesados):")
+            st.dataframe(result["preview"])
+            ingest_stats = result["ingest"]
+            st.caption(
+                f"Lectura {ingest_stats['format'].upper()}: {ingest_stats['parse_ms']:.0f} ms para "
+                f"{ingest_stats['rows']} filas · bloque más grande en memoria: {ingest_stats['chunk_mb_max']:.1f} MB"
+            )
 
-        st.write("Vista previa de resultados:")
-        st.dataframe(df_out.head())
+            st.markdown("#### Distribución de predicciones (FAIL / PASS) 🧮")
+            with timer.stage("altair"):
+                import altair as alt
 
-        st.markdown("#### Distribución de predicciones (FAIL / PASS) 🧮")
-        counts = (
-            pd.Series(pred_label)
-            .value_counts()
-            .rename_axis("Clase")
-            .reset_index(name="Cantidad")
-        )
+                counts = pd.DataFrame(
+                    {"Clase": list(result["counts"].keys()), "Cantidad": list(result["counts"].values())}
+                )
+                counts = counts[counts["Cantidad"] > 0]
+
+                chart2 = (
+                    alt.Chart(counts)
+                    .mark_bar(cornerRadiusTopLeft=8, cornerRadiusTopRight=8)
+                    .encode(
+                        x=alt.X("Clase:N", sort=["FAIL", "PASS"], title=None),
+                        y=alt.Y("Cantidad:Q", axis=alt.Axis(title="Número de estudiantes")),
+                        color=alt.Color(
+                            "Clase:N",
+                            scale=alt.Scale(range=["#fecaca", "#bfdbfe"]),
+                            legend=None,
+                        ),
+                    )
+                    .properties(height=260)
+                    .configure_view(strokeWidth=0, fill="#ffffff")
+                )
 
-        chart2 = (
-            alt.Chart(counts)
-            .mark_bar(cornerRadiusTopLeft=8, cornerRadiusTopRight=8)
-            .encode(
-                x=alt.X("Clase:N", sort=["FAIL", "PASS"], title=None),
-                y=alt.Y("Cantidad:Q", axis=alt.Axis(title="Número de estudiantes")),
-                color=alt.Color(
-                    "Clase:N",
-                    scale=alt.Scale(range=["#fecaca", "#bfdbfe"]),
-                    legend=None,
+                st.altair_chart(chart2, use_container_width=True)
+
+            # Cohortes: agregados acumulados por bloque, sin reconstruir el resultado completo
+            st.markdown("#### Resultados por cohorte 👥")
+            cohort_df = result["cohorts"]
+            dim_labels = dict(zip(cohort_df["label"], cohort_df["dimension"]))
+            dim_label = st.selectbox("Agrupar por", list(dim_labels), key="batch_cohort")
+            dim_rows = cohort_df[cohort_df["dimension"] == dim_labels[dim_label]]
+
+            with timer.stage("altair"):
+                chart3 = (
+                    alt.Chart(dim_rows)
+                    .mark_bar(cornerRadiusTopLeft=8, cornerRadiusTopRight=8, color="#bfdbfe")
+                    .encode(
+                        x=alt.X("group:N", sort=list(dim_rows["group"]), title=dim_label),
+                        y=alt.Y("pass_rate:Q", scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format="%", title="Tasa de PASS")),
+                        tooltip=[
+                            alt.Tooltip("group:N", title=dim_label),
+                            alt.Tooltip("n:Q", title="Estudiantes"),
+                            alt.Tooltip("pass_rate:Q", title="Tasa de PASS", format=".1%"),
+                            alt.Tooltip("mean_proba:Q", title="proba_pass media", format=".3f"),
+                        ],
+                    )
+                    .properties(height=260)
+                    .configure_view(strokeWidth=0, fill="#ffffff")
+                )
+                st.altair_chart(chart3, use_container_width=True)
+
+                # Histograma acumulado por grupo (PROBA_BINS filas por grupo, sin filas del lote)
+                cohort_hist = result["cohort_hist"]
+                dim_hist = cohort_hist[cohort_hist["dimension"] == dim_labels[dim_label]]
+                chart4 = (
+                    alt.Chart(dim_hist)
+                    .mark_line(interpolate="step-after", strokeWidth=2)
+                    .encode(
+                        x=alt.X("bin_start:Q", scale=alt.Scale(domain=[0, 1]), axis=alt.Axis(format="%", title="proba_pass")),
+                        y=alt.Y("share:Q", axis=alt.Axis(format="%", title="Parte del grupo")),
+                        color=alt.Color("group:N", sort=list(dim_rows["group"]), title=dim_label),
+                        tooltip=[
+                            alt.Tooltip("group:N", title=dim_label),
+                            alt.Tooltip("bin_start:Q", title="Desde", format=".3f"),
+                            alt.Tooltip("bin_end:Q", title="Hasta", format=".3f"),
+                            alt.Tooltip("count:Q", title="Estudiantes"),
+                        ],
+                    )
+                    .properties(height=240)
+                    .configure_view(strokeWidth=0, fill="#ffffff")
+                )
+                st.altair_chart(chart4, use_container_width=True)
+            st.dataframe(
+                dim_rows[["group", "n", "pass", "pass_rate", "mean_proba", "p10", "p50", "p90"]].rename(
+                    columns={
+                        "group": dim_label, "n": "Estudiantes", "pass": "PASS",
+                        "pass_rate": "Tasa de PASS", "mean_proba": "proba_pass media",
+                        "p10": "P10", "p50": "Mediana", "p90": "P90",
+                    }
                 ),
+                hide_index=True,
+            )
+            st.caption(
+                f"P10 / mediana / P90 aproximados desde un histograma de {distribution.PROBA_BINS} barras por grupo "
+                f"(error máximo {1 / distribution.PROBA_BINS:.3f})."
             )
-            .properties(height=260)
-            .configure_view(strokeWidth=0, fill="#ffffff")
-        )
 
-        st.altair_chart(chart2, use_container_width=True)
-
-        csv_out = df_out.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "⬇️ Descargar resultados (CSV)",
-            data=csv_out,
-            file_name="predicciones_pass_fail.csv",
-            mime="text/csv",
-        )
+            # Umbral en su propio fragmento: mover el slider no vuelve a leer el archivo ni la caché
+            render_batch_threshold(result["explorer"], result["counts"], BEST_THR, LABELS)
+
+            render_batch_export(results_cache, batch_key, result["spool"], timer)
+
+            # Auditoría y sombra: una vez por archivo y sesión; mover el umbral o la cohorte no vuelve a enviar
+            audited = st.session_state.setdefault("audited_batches", set())
+            if (audit_sink is not None or shadow_scorer is not None) and batch_key not in audited:
+                if audit_sink is not None:
+                    with timer.stage("audit"):
+                        audit_sink.record_csv(
+                            open_scored_csv(results_cache, batch_key, result["spool"]),
+                            result["n_rows"], EXPECTED_COLS, BEST_THR, MODEL_VERSION,
+                            source=f"batch:{getattr(file, 'name', '')}", session=get_session_id(),
+                        )
+                if shadow_scorer is not None:
+                    with timer.stage("shadow_submit"):
+                        shadow_scorer.submit_csv(
+                            lambda: open_scored_csv(results_cache, batch_key, result["spool"]), BEST_THR, MODEL_VERSION
+                        )
+                audited.add(batch_key)
+
+        result["spool"].close()
 
     st.markdown("</div>", unsafe_allow_html=True)
+    render_timing_readout("batch", timer, profiler)
+
+
+with tab_batch:
+    render_batch_tab()
+
+# ==============================
+#  Barra lateral de depuración (DEBUG_TIMINGS=1)
+# ==============================
+# Se dibuja al final del script: en un rerun completo ya incluye las pestañas de
+# este rerun. Los reruns de fragmento no la actualizan hasta el siguiente rerun completo.
+if DEBUG_TIMINGS:
+    with st.sidebar:
+        st.markdown("### 🔧 Tiempos por etapa (sesión)")
+        stage_totals = st.session_state.get("stage_totals", {})
+        if stage_totals:
+            st.dataframe(
+                pd.DataFrame(
+                    [
+                        {
+                            "Pestaña": SECTION_NAMES[section], "Etapa": stage,
+                            "Reruns": n, "Total ms": total, "Media ms": total / n,
+                        }
+                        for (section, stage), (n, total) in stage_totals.items()
+                    ]
+                ).round(1),
+                hide_index=True,
+            )
+        profile_label = st.selectbox("Perfilar con cProfile", list(SECTION_NAMES.values()), key="profile_section")
+        if st.button("🔬 Perfilar su próxima ejecución"):
+            st.session_state["profile_next"] = {label: name for name, label in SECTION_NAMES.items()}[profile_label]
+            st.caption("Se capturará la próxima ejecución de esa pestaña.")
+        if audit_sink is not None:
+            audit_stats = audit_sink.stats()
+            st.caption(
+                f"Auditoría · escritos: {audit_stats['written']} · pendientes: {audit_stats['pending']} · "
+                f"cola: {audit_stats['depth']}/{audit_stats['capacity']} (máx. {audit_stats['max_depth']}) · "
+                f"esperas por cola llena: {audit_stats['blocked_puts']} ({audit_stats['blocked_ms']:.0f} ms)"
+            )
+            if audit_stats["failed"]:
+                st.warning(f"Auditoría: {audit_stats['failed']} filas de lotes ilegibles no se registraron (ver log).")
+        st.caption(f"Métricas Prometheus: `{METRICS_PROM_PATH or 'desactivadas'}` · perfiles en `{PROFILE_DIR}`")
+
+# ==============================
+#  Reporte del modelo retador (SHADOW_VERSION)
+# ==============================
+if shadow_scorer is not None:
+    with st.sidebar:
+        st.markdown("### 🥊 Modelo retador (sombra)")
+        shadow_stats = shadow_scorer.stats()
+        st.caption(
+            f"Retador `{shadow_stats['challenger']}` frente al activo `{MODEL_VERSION}` · "
+            f"trabajos: {shadow_stats['completed']} ({shadow_stats['rows']} filas) · "
+            f"en curso: {shadow_stats['pending']}/{shadow_stats['capacity']} · "
+            f"descartados por carga: {shadow_stats['dropped']} · errores: {shadow_stats['errors']}"
+        )
+        shadow_report = shadow_scorer.report()
+        if shadow_report.empty:
+            st.caption("Aún no hay predicciones comparadas.")
+        else:
+            st.dataframe(
+                shadow_report.rename(columns={
+                    "champion": "Activo", "source": "Fuente", "n": "Filas", "agreement": "Acuerdo",
+                    "champion_pass_rate": "PASS activo", "challenger_pass_rate": "PASS retador",
+                    "mean_delta": "Δ medio", "mean_abs_delta": "|Δ| medio", "p95_abs_delta": "|Δ| P95",
+                    "max_abs_delta": "|Δ| máx.", "pass_to_fail": "PASS→FAIL", "fail_to_pass": "FAIL→PASS",
+                }).round(4),
+                hide_index=True,
+            )
+            st.download_button(
+                "⬇️ Reporte de comparación (CSV)",
+                data=shadow_report.to_csv(index=False).encode("utf-8"),
+                file_name="comparacion_retador.csv",
+                mime="text/csv",
+            )
+        st.button("🔄 Actualizar reporte", key="shadow_refresh")
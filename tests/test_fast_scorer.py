@@ -0,0 +1,96 @@
+"""
+Paridad del scorer compilado con `pipe.predict_proba` sobre el modelo que se
+distribuye en `artefactos/`: perfiles aleatorios, categorías desconocidas y
+numéricos ausentes o NaN. La tolerancia es cero salvo por el redondeo de la
+suma de árboles.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import artifacts
+import fast_scorer
+from scoring import ensure_expected_columns
+
+ART_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "artefactos")
+ATOL = 1e-12
+
+
+@pytest.fixture(scope="module")
+def model():
+    artifact = artifacts.load_artifact(art_dir=ART_DIR)
+    schema = artifact["schema"]
+    pipe = artifact["pipe"]
+    scorer = fast_scorer.compile_pipeline(pipe, forest_arrays=artifact["forest_arrays"])
+    assert scorer is not None, "el pipeline distribuido debe poder compilarse"
+    return pipe, scorer, list(schema["expected_cols"]), list(schema["num_features"]), list(schema["cat_features"])
+
+
+def reference(pipe, rows, expected_cols, num_features):
+    df = ensure_expected_columns(pd.DataFrame(rows), expected_cols, num_features)
+    return pipe.predict_proba(df)[:, 1]
+
+
+def assert_parity(model, rows):
+    pipe, scorer, expected_cols, num_features, _ = model
+    ref = reference(pipe, rows, expected_cols, num_features)
+    np.testing.assert_allclose(scorer.predict_many(rows), ref, rtol=0, atol=ATOL)
+    np.testing.assert_allclose([scorer.predict_one(r) for r in rows], ref, rtol=0, atol=ATOL)
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_random_profiles(model, seed):
+    scorer = model[1]
+    assert_parity(model, fast_scorer.random_profiles(scorer, 300, seed=seed))
+
+
+def test_unknown_categories(model):
+    scorer, cat_features = model[1], model[4]
+    rows = fast_scorer.random_profiles(scorer, 120, seed=10)
+    for i, row in enumerate(rows):
+        row[cat_features[i % len(cat_features)]] = "categoría-nueva"
+        if i % 3 == 0:
+            row[cat_features[(i + 1) % len(cat_features)]] = ""
+    assert_parity(model, rows)
+
+
+def test_nan_numerics(model):
+    scorer, num_features = model[1], model[3]
+    rows = fast_scorer.random_profiles(scorer, 200, seed=20)
+    rng = np.random.default_rng(20)
+    for row in rows:
+        for feature in rng.choice(num_features, size=rng.integers(1, 4), replace=False):
+            row[feature] = np.nan if rng.random() < 0.5 else None
+    assert_parity(model, rows)
+
+
+def test_missing_numerics_count_as_zero(model):
+    # Un campo ausente vale 0, igual que una columna que falta en ensure_expected_columns
+    pipe, scorer, expected_cols, num_features, _ = model
+    for i, row in enumerate(fast_scorer.random_profiles(scorer, 40, seed=30)):
+        row.pop(num_features[i % len(num_features)])
+        ref = reference(pipe, [row], expected_cols, num_features)
+        assert scorer.predict_one(row) == pytest.approx(ref[0], abs=ATOL)
+
+
+def test_contributions_add_up_with_nan(model):
+    scorer, num_features = model[1], model[3]
+    rows = fast_scorer.random_profiles(scorer, 50, seed=40)
+    for row in rows[::2]:
+        row[num_features[0]] = np.nan
+    X = scorer.transform_many(rows)
+    bias, contrib = scorer.forest_contributions(X)
+    np.testing.assert_allclose(bias + contrib.sum(axis=1), scorer.predict_proba_matrix(X), rtol=0, atol=1e-9)
+
+
+def test_arrays_without_missing_rule_fall_back_to_model(model):
+    # Matrices guardadas antes de aplanar la regla de NaN: se deduce del modelo
+    pipe, scorer = model[0], model[1]
+    arrays = dict(fast_scorer.flatten_forest(pipe.named_steps["model"]))
+    arrays.pop("missing_left")
+    legacy = fast_scorer.compile_pipeline(pipe, forest_arrays=arrays)
+    rows = fast_scorer.random_profiles(scorer, 50, seed=50)
+    rows[0][model[3][0]] = np.nan
+    np.testing.assert_array_equal(legacy.predict_many(rows), scorer.predict_many(rows))
@@ -0,0 +1,70 @@
+"""
+Exploración del umbral de decisión sobre un lote ya puntuado.
+
+Las probabilidades se ordenan una sola vez; para cualquier umbral, el número
+de estudiantes marcados (FAIL) es la posición que devuelve una búsqueda
+binaria. Si el lote trae la etiqueta real, los conteos acumulados de PASS
+reales en ese mismo orden dan la matriz de confusión sin volver a recorrer
+las filas: cada consulta cuesta O(log n), sin importar el tamaño del lote.
+"""
+import numpy as np
+import pandas as pd
+
+
+class ThresholdExplorer:
+    def __init__(self, sorted_proba: np.ndarray, pos_cum: np.ndarray = None):
+        self.sorted_proba = sorted_proba
+        # pos_cum[k] = PASS reales entre las k probabilidades más bajas (largo n + 1)
+        self.pos_cum = pos_cum
+
+    @classmethod
+    def from_scores(cls, proba: np.ndarray, y_true: np.ndarray = None) -> "ThresholdExplorer":
+        proba = np.asarray(proba, dtype=float)
+        order = np.argsort(proba, kind="stable")
+        pos_cum = None
+        if y_true is not None:
+            y_sorted = np.asarray(y_true)[order] == 1
+            pos_cum = np.concatenate([[0], np.cumsum(y_sorted, dtype=np.int64)])
+        return cls(proba[order], pos_cum)
+
+    @property
+    def n(self) -> int:
+        return len(self.sorted_proba)
+
+    @property
+    def has_labels(self) -> bool:
+        return self.pos_cum is not None
+
+    def at(self, thr: float) -> dict:
+        """Conteos para `thr` con la misma regla que la app: PASS si proba_pass >= thr."""
+        n = self.n
+        k = int(np.searchsorted(self.sorted_proba, thr, side="left"))
+        out = {
+            "threshold": float(thr),
+            "n": n,
+            "fail": k,
+            "pass": n - k,
+            "flagged_share": k / n if n else 0.0,
+        }
+        if self.pos_cum is not None:
+            fn = int(self.pos_cum[k])  # PASS reales marcados como FAIL
+            tp = int(self.pos_cum[-1]) - fn
+            tn = k - fn
+            fp = (n - k) - tp
+            out.update(
+                tp=tp, fp=fp, tn=tn, fn=fn,
+                accuracy=(tp + tn) / n if n else 0.0,
+                # De los FAIL reales, qué parte queda marcada
+                fail_recall=tn / (tn + fp) if tn + fp else 0.0,
+                # De los marcados, qué parte son FAIL reales
+                fail_precision=tn / k if k else 0.0,
+            )
+        return out
+
+
+def clean_labels(values) -> np.ndarray:
+    """Etiquetas reales 0/1; None si la columna trae vacíos u otros valores."""
+    y = pd.to_numeric(pd.Series(values), errors="coerce")
+    if y.isna().any() or not y.isin([0, 1]).all():
+        return None
+    return y.to_numpy(dtype=np.int8)
@@ -0,0 +1,319 @@
+"""
+Reentrenamiento reproducible del modelo PASS/FAIL (mismo esquema que el notebook CRISP-DM).
+
+Uso:
+    python train.py --data students_data_clean.csv --version v2
+    python train.py --data students_data_clean.csv --models RFS --n-candidates 30 --no-activate
+
+Igual que en el notebook: split 80/20 estratificado, `build_pipe` (prep →
+SMOTE → modelo), `param_spaces` para LRN/RFS/NNM y StratifiedKFold(5) con
+RANDOM_STATE = 42. Cambia la forma de buscar:
+
+- El pipeline usa `memory`: el ColumnTransformer y SMOTE se ajustan una vez
+  por partición y se reutilizan en todos los candidatos (solo cambian los
+  parámetros `model__*`).
+- HalvingRandomSearchCV descarta los candidatos débiles con pocas filas antes
+  de gastar la partición completa en ellos.
+- La búsqueda usa todos los núcleos (`--jobs -1`).
+
+El ganador (mejor F1-macro en CV) se reentrena con todo el train, se evalúa
+en test y se exporta como una versión nueva de ART_DIR (ver artifacts.py).
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import time
+import warnings
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+import artifacts
+
+RANDOM_STATE = 42
+TARGET = "target_pass"
+SELECTED_FEATURES = [
+    "sex", "age", "address", "famsize",
+    "Medu", "Fedu",
+    "studytime", "failures", "absences",
+    "schoolsup", "famsup", "paid", "activities",
+    "higher", "internet",
+    "famrel", "freetime", "health",
+]
+MODEL_NAMES = ["LRN", "RFS", "NNM"]
+
+
+def build_preprocessor(num_features: list, cat_features: list):
+    from sklearn.compose import ColumnTransformer
+    from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+    return ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), num_features),
+            ("cat", OneHotEncoder(handle_unknown="ignore", sparse_output=False), cat_features),
+        ]
+    )
+
+
+def build_pipe(model, preprocessor, memory=None):
+    """prep → SMOTE → modelo, como en el notebook; `memory` cachea prep y SMOTE ya ajustados."""
+    from imblearn.over_sampling import SMOTE
+    from imblearn.pipeline import Pipeline as ImbPipeline
+
+    return ImbPipeline(
+        [
+            ("prep", preprocessor),
+            ("smote", SMOTE(random_state=RANDOM_STATE, k_neighbors=3)),
+            ("model", model),
+        ],
+        memory=memory,
+    )
+
+
+def base_models() -> dict:
+    from sklearn.ensemble import RandomForestClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neural_network import MLPClassifier
+
+    return {
+        "LRN": LogisticRegression(max_iter=2000, random_state=RANDOM_STATE),
+        # n_jobs=1: el paralelismo va en la búsqueda, no dentro de cada bosque
+        "RFS": RandomForestClassifier(random_state=RANDOM_STATE, n_jobs=1),
+        "NNM": MLPClassifier(max_iter=1000, random_state=RANDOM_STATE),
+    }
+
+
+def param_spaces() -> dict:
+    from scipy.stats import loguniform, randint
+
+    return {
+        "LRN": {
+            "model__C": loguniform(1e-2, 1e1),
+            "model__penalty": ["l2"],
+            "model__solver": ["lbfgs", "liblinear"],
+            "model__class_weight": [None, "balanced"],
+        },
+        "RFS": {
+            "model__n_estimators": randint(200, 500),
+            "model__max_depth": randint(4, 14),
+            "model__min_samples_split": randint(2, 16),
+            "model__min_samples_leaf": randint(1, 8),
+            "model__max_features": ["sqrt", "log2", None],
+            "model__bootstrap": [True, False],
+        },
+        "NNM": {
+            "model__hidden_layer_sizes": [(16,), (32,), (32, 16)],
+            "model__alpha": loguniform(1e-5, 1e-3),
+            "model__learning_rate_init": loguniform(1e-4, 5e-3),
+            "model__activation": ["relu"],
+            "model__solver": ["adam"],
+            "model__early_stopping": [True],
+            "model__n_iter_no_change": [15, 20],
+        },
+    }
+
+
+class StageTimer:
+    """Tiempo de reloj por etapa, impreso al terminar cada una."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = time.perf_counter() - t0
+            print(f"[{name}] {self.stages[name]:.1f} s", file=sys.stderr)
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def load_training_data(path: str):
+    df = pd.read_csv(path)
+    missing = [c for c in SELECTED_FEATURES + [TARGET] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Faltan columnas en {path}: {missing}")
+    X = df[SELECTED_FEATURES]
+    y = df[TARGET].astype(int)
+    return X, y
+
+
+def test_metrics(y_true, proba, thr: float) -> dict:
+    from sklearn.metrics import (
+        accuracy_score, average_precision_score, confusion_matrix, f1_score, roc_auc_score,
+    )
+
+    y_pred = (proba >= thr).astype(int)
+    return {
+        "accuracy": float(accuracy_score(y_true, y_pred)),
+        "f1_macro": float(f1_score(y_true, y_pred, average="macro")),
+        "roc_auc": float(roc_auc_score(y_true, proba)),
+        "pr_auc": float(average_precision_score(y_true, proba)),
+        "confusion_matrix": confusion_matrix(y_true, y_pred).tolist(),
+    }
+
+
+def train(
+    data_path: str,
+    models: list = None,
+    n_candidates: int = 15,
+    factor: int = 3,
+    jobs: int = -1,
+    thr: float = artifacts.DEFAULT_BEST_THR,
+    art_dir: str = None,
+    version: str = None,
+    activate: bool = True,
+) -> dict:
+    from sklearn.exceptions import ConvergenceWarning
+    from sklearn.experimental import enable_halving_search_cv  # noqa: F401
+    from sklearn.model_selection import HalvingRandomSearchCV, StratifiedKFold, train_test_split
+
+    np.random.seed(RANDOM_STATE)
+    timer = StageTimer()
+    models = models or MODEL_NAMES
+
+    with timer.stage("carga"):
+        X, y = load_training_data(data_path)
+        X_train, X_test, y_train, y_test = train_test_split(
+            X, y, test_size=0.20, stratify=y, random_state=RANDOM_STATE
+        )
+        cat_features = X_train.select_dtypes(include=["object", "category"]).columns.tolist()
+        num_features = X_train.select_dtypes(include=["number", "bool"]).columns.tolist()
+
+    cv = StratifiedKFold(n_splits=5, shuffle=True, random_state=RANDOM_STATE)
+    spaces = param_spaces()
+    bases = base_models()
+    results = []
+    cache_dir = tempfile.mkdtemp(prefix="skcache_")
+    try:
+        for name in models:
+            with timer.stage(f"búsqueda {name}"):
+                pipe = build_pipe(bases[name], build_preprocessor(num_features, cat_features), memory=cache_dir)
+                search = HalvingRandomSearchCV(
+                    estimator=pipe,
+                    param_distributions=spaces[name],
+                    n_candidates=n_candidates,
+                    factor=factor,
+                    resource="n_samples",
+                    cv=cv,
+                    scoring="f1_macro",
+                    refit=False,
+                    n_jobs=jobs,
+                    random_state=RANDOM_STATE,
+                    error_score=np.nan,
+                )
+                with warnings.catch_warnings():
+                    warnings.filterwarnings("ignore", category=ConvergenceWarning)
+                    search.fit(X_train, y_train)
+            results.append({
+                "model": name,
+                "cv_f1_macro": float(search.best_score_),
+                "params": search.best_params_,
+                "iterations": int(search.n_iterations_),
+                "candidates": [int(c) for c in search.n_candidates_],
+            })
+            print(
+                f"{name}: F1 CV={search.best_score_:.4f} · candidatos por ronda {search.n_candidates_}",
+                file=sys.stderr,
+            )
+    finally:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+
+    # Ganador: mejor F1-macro de CV (los NaN, p. ej. candidatos que fallaron, van al final)
+    results.sort(key=lambda r: r["cv_f1_macro"] if pd.notna(r["cv_f1_macro"]) else -1, reverse=True)
+    winner = results[0]
+
+    with timer.stage("ajuste final"):
+        # Sin memory: el pipeline exportado no debe apuntar a una carpeta temporal
+        final_pipe = build_pipe(bases[winner["model"]], build_preprocessor(num_features, cat_features))
+        final_pipe.set_params(**winner["params"])
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=ConvergenceWarning)
+            final_pipe.fit(X_train, y_train)
+
+    with timer.stage("evaluación"):
+        metrics = test_metrics(y_test, final_pipe.predict_proba(X_test)[:, 1], thr)
+        print(
+            f"TEST · F1 macro {metrics['f1_macro']:.4f} · AUC {metrics['roc_auc']:.4f} · "
+            f"ACC {metrics['accuracy']:.4f}",
+            file=sys.stderr,
+        )
+
+    training = {
+        "data_file": os.path.basename(data_path),
+        "data_sha256": file_sha256(data_path),
+        "random_state": RANDOM_STATE,
+        "winner": winner["model"],
+        "search": [
+            {**r, "params": {k: _jsonable(v) for k, v in r["params"].items()}} for r in results
+        ],
+        "test_metrics": metrics,
+        "stages_s": timer.stages,
+    }
+    with timer.stage("exportación"):
+        out_dir = artifacts.export_artifact(
+            final_pipe,
+            art_dir=art_dir,
+            version=version,
+            best_thr=thr,
+            source=os.path.basename(data_path),
+            extra={"training": training},
+            activate=activate,
+        )
+    training["stages_s"] = timer.stages
+    return {"version_dir": out_dir, **training}
+
+
+def _jsonable(value):
+    if isinstance(value, tuple):
+        return list(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Reentrena el modelo PASS/FAIL y lo exporta a ART_DIR.")
+    parser.add_argument("--data", required=True, help=f"CSV limpio con las variables del modelo y `{TARGET}`")
+    parser.add_argument("--models", nargs="+", choices=MODEL_NAMES, default=MODEL_NAMES)
+    parser.add_argument("--n-candidates", type=int, default=15, help="Candidatos iniciales por modelo (n_iter del notebook)")
+    parser.add_argument("--factor", type=int, default=3, help="Proporción de candidatos que sobrevive a cada ronda (1/factor)")
+    parser.add_argument("--jobs", type=int, default=-1, help="Procesos para la búsqueda (-1 = todos los núcleos)")
+    parser.add_argument("--thr", type=float, default=artifacts.DEFAULT_BEST_THR, help="Umbral de decisión BEST_THR")
+    parser.add_argument("--art-dir", default=None, help="Carpeta de artefactos (por defecto, ART_DIR)")
+    parser.add_argument("--version", default=None, help="Nombre de la versión (por defecto, fecha y hora)")
+    parser.add_argument("--no-activate", action="store_true", help="No actualizar CURRENT")
+    args = parser.parse_args(argv)
+
+    result = train(
+        args.data,
+        models=args.models,
+        n_candidates=args.n_candidates,
+        factor=args.factor,
+        jobs=args.jobs,
+        thr=args.thr,
+        art_dir=args.art_dir,
+        version=args.version,
+        activate=not args.no_activate,
+    )
+    total = sum(result["stages_s"].values())
+    breakdown = " · ".join(f"{name}={secs:.1f}s" for name, secs in result["stages_s"].items())
+    print(f"Ganador {result['winner']} exportado en {result['version_dir']} ({total:.1f}s: {breakdown})", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
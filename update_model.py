@@ -0,0 +1,195 @@
+"""
+Actualización incremental del modelo activo con los registros de un nuevo periodo.
+
+Uso:
+    python update_model.py --data nuevos_2025_1.csv --version v2-2025-1
+    python update_model.py --data nuevos.csv --holdout control.csv --add-trees 80
+
+El preprocesamiento (`prep`) ajustado se mantiene fijo y solo se actualiza el
+modelo con las filas nuevas (balanceadas con el mismo SMOTE):
+
+- Bosques (RandomForest/ExtraTrees): `warm_start` y `--add-trees` árboles
+  nuevos entrenados con los datos nuevos; los árboles existentes no cambian.
+- Regresión logística: `warm_start` desde los coeficientes actuales con un
+  número acotado de iteraciones (`--max-iter`). `liblinear` no admite
+  warm start, así que se continúa con `lbfgs`.
+- MLP: `partial_fit` durante `--epochs` pasadas desde los pesos actuales.
+
+Antes de promover, el modelo actual y el actualizado se comparan en un
+holdout (el archivo `--holdout` o una parte estratificada de los datos
+nuevos). Solo si el F1-macro no empeora más que `--tolerance` se exporta la
+versión nueva a ART_DIR; el registro de la app la valida y la carga en caliente.
+"""
+import argparse
+import copy
+import os
+import sys
+import warnings
+
+import numpy as np
+from imblearn.over_sampling import SMOTE
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.exceptions import ConvergenceWarning
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.neural_network import MLPClassifier
+
+import artifacts
+from train import RANDOM_STATE, StageTimer, file_sha256, load_training_data, test_metrics
+
+DEFAULT_ADD_TREES = 50
+DEFAULT_MAX_ITER = 50
+DEFAULT_EPOCHS = 20
+DEFAULT_HOLDOUT_SHARE = 0.25
+
+
+def _resample(pipe, Xt: np.ndarray, y: np.ndarray):
+    """Mismo SMOTE del pipeline; si la clase minoritaria es muy chica se omite."""
+    smote = pipe.named_steps.get("smote")
+    if smote is None:
+        return Xt, y
+    minority = np.bincount(y, minlength=2).min()
+    if minority <= smote.k_neighbors:
+        return Xt, y
+    # SMOTE nuevo con los mismos parámetros: el objeto deserializado puede venir de otra
+    # versión de imblearn y no tener todos los atributos que espera fit_resample
+    fresh = SMOTE(
+        sampling_strategy=getattr(smote, "sampling_strategy", "auto"),
+        random_state=getattr(smote, "random_state", RANDOM_STATE),
+        k_neighbors=smote.k_neighbors,
+    )
+    return fresh.fit_resample(Xt, y)
+
+
+def update_model(model, Xt: np.ndarray, y: np.ndarray, add_trees: int, max_iter: int, epochs: int):
+    """Continúa el entrenamiento de `model` (ya ajustado) sobre filas preprocesadas."""
+    if isinstance(model, (RandomForestClassifier, ExtraTreesClassifier)):
+        model.set_params(warm_start=True, n_estimators=len(model.estimators_) + add_trees)
+        model.fit(Xt, y)
+        return f"+{add_trees} árboles (total {len(model.estimators_)})"
+
+    if isinstance(model, LogisticRegression):
+        solver = "lbfgs" if model.solver == "liblinear" else model.solver
+        model.set_params(warm_start=True, solver=solver, max_iter=max_iter)
+        with warnings.catch_warnings():
+            warnings.filterwarnings("ignore", category=ConvergenceWarning)
+            model.fit(Xt, y)
+        return f"warm start {solver}, ≤{max_iter} iteraciones"
+
+    if isinstance(model, MLPClassifier):
+        # partial_fit no admite early_stopping; el holdout cumple ese papel. Con
+        # early_stopping el ajuste original deja best_loss_ en None.
+        model.set_params(early_stopping=False)
+        if getattr(model, "best_loss_", None) is None:
+            model.best_loss_ = np.inf
+        rng = np.random.default_rng(RANDOM_STATE)
+        for _ in range(epochs):
+            order = rng.permutation(len(y))
+            model.partial_fit(Xt[order], y[order])
+        return f"partial_fit × {epochs} épocas"
+
+    raise TypeError(f"Actualización incremental no soportada para {type(model).__name__}")
+
+
+def run(
+    data_path: str,
+    holdout_path: str = None,
+    add_trees: int = DEFAULT_ADD_TREES,
+    max_iter: int = DEFAULT_MAX_ITER,
+    epochs: int = DEFAULT_EPOCHS,
+    tolerance: float = 0.0,
+    art_dir: str = None,
+    version: str = None,
+) -> dict:
+    timer = StageTimer()
+
+    with timer.stage("carga"):
+        # Sin mmap: los árboles/pesos se van a modificar
+        current = artifacts.load_artifact(art_dir, mmap=False)
+        pipe = current["pipe"]
+        thr = current["best_thr"]
+        X_new, y_new = load_training_data(data_path)
+        if holdout_path:
+            X_hold, y_hold = load_training_data(holdout_path)
+        else:
+            X_new, X_hold, y_new, y_hold = train_test_split(
+                X_new, y_new, test_size=DEFAULT_HOLDOUT_SHARE, stratify=y_new, random_state=RANDOM_STATE
+            )
+
+    with timer.stage("actualización"):
+        candidate = copy.deepcopy(pipe)
+        prep = candidate.named_steps["prep"]
+        Xt, y = _resample(candidate, prep.transform(X_new), y_new.to_numpy())
+        how = update_model(candidate.named_steps["model"], Xt, y, add_trees, max_iter, epochs)
+
+    with timer.stage("validación"):
+        before = test_metrics(y_hold, pipe.predict_proba(X_hold)[:, 1], thr)
+        after = test_metrics(y_hold, candidate.predict_proba(X_hold)[:, 1], thr)
+        promoted = after["f1_macro"] >= before["f1_macro"] - tolerance
+
+    print(
+        f"{how} · holdout F1 macro {before['f1_macro']:.4f} → {after['f1_macro']:.4f} · "
+        f"AUC {before['roc_auc']:.4f} → {after['roc_auc']:.4f}",
+        file=sys.stderr,
+    )
+
+    result = {
+        "promoted": promoted,
+        "base_version": current["version"],
+        "base_model_version": current["model_version"],
+        "update": how,
+        "data_file": os.path.basename(data_path),
+        "data_sha256": file_sha256(data_path),
+        "rows": int(len(y_new)),
+        "holdout_rows": int(len(y_hold)),
+        "holdout_before": before,
+        "holdout_after": after,
+        "version_dir": None,
+    }
+    if promoted:
+        with timer.stage("exportación"):
+            result["version_dir"] = artifacts.export_artifact(
+                candidate,
+                art_dir=art_dir,
+                version=version,
+                best_thr=thr,
+                labels=current["labels"],
+                source=f"incremental:{current['version'] or current['model_version']}",
+                extra={"incremental": {k: v for k, v in result.items() if k != "version_dir"}},
+            )
+    result["stages_s"] = timer.stages
+    return result
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Actualiza el modelo activo con datos de un nuevo periodo.")
+    parser.add_argument("--data", required=True, help="CSV con los registros nuevos y `target_pass`")
+    parser.add_argument("--holdout", default=None, help="CSV de control; por defecto, 25%% de --data")
+    parser.add_argument("--add-trees", type=int, default=DEFAULT_ADD_TREES, help="Árboles nuevos (bosques)")
+    parser.add_argument("--max-iter", type=int, default=DEFAULT_MAX_ITER, help="Iteraciones de warm start (logística)")
+    parser.add_argument("--epochs", type=int, default=DEFAULT_EPOCHS, help="Pasadas de partial_fit (MLP)")
+    parser.add_argument("--tolerance", type=float, default=0.0, help="Caída de F1-macro aceptada en el holdout")
+    parser.add_argument("--art-dir", default=None, help="Carpeta de artefactos (por defecto, ART_DIR)")
+    parser.add_argument("--version", default=None, help="Nombre de la versión nueva (por defecto, fecha y hora)")
+    args = parser.parse_args(argv)
+
+    result = run(
+        args.data,
+        holdout_path=args.holdout,
+        add_trees=args.add_trees,
+        max_iter=args.max_iter,
+        epochs=args.epochs,
+        tolerance=args.tolerance,
+        art_dir=args.art_dir,
+        version=args.version,
+    )
+    total = sum(result["stages_s"].values())
+    if result["promoted"]:
+        print(f"Versión promovida: {result['version_dir']} ({total:.1f}s)", file=sys.stderr)
+        return 0
+    print(f"No se promueve: el holdout empeora más de lo tolerado ({total:.1f}s)", file=sys.stderr)
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
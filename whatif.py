@@ -0,0 +1,45 @@
+"""
+Panel "¿qué pasaría si…?" para un estudiante.
+
+El perfil enviado se expande en una matriz pequeña: una fila por cada valor
+permitido de cada variable accionable, cambiando solo esa variable. Toda la
+matriz se puntúa en una única llamada vectorizada, en lugar de un rerun del
+formulario por cada prueba.
+"""
+import pandas as pd
+
+
+def expand_profile(profile: dict, grid: dict) -> tuple:
+    """Filas a puntuar y, en paralelo, (variable, valor) que cambia cada una."""
+    rows, changes = [], []
+    for feature, values in grid.items():
+        for value in values:
+            row = dict(profile)
+            row[feature] = value
+            rows.append(row)
+            changes.append((feature, value))
+    return rows, changes
+
+
+def sensitivity(predict_many, profile: dict, grid: dict, base_proba: float) -> pd.DataFrame:
+    """
+    `predict_many(rows) -> np.ndarray` se llama una sola vez con toda la
+    matriz. Devuelve una fila por (variable, valor) con la probabilidad, el
+    cambio respecto al perfil enviado y si es el valor actual.
+    """
+    rows, changes = expand_profile(profile, grid)
+    proba = predict_many(rows)
+    out = pd.DataFrame(changes, columns=["feature", "value"])
+    out["proba_pass"] = proba
+    out["delta"] = proba - base_proba
+    out["current"] = [profile.get(feature) == value for feature, value in changes]
+    return out
+
+
+def best_changes(sens: pd.DataFrame, k: int = 3) -> pd.DataFrame:
+    """El mejor valor alternativo de cada variable, solo si sube la probabilidad de PASS."""
+    alternatives = sens[~sens["current"] & (sens["delta"] > 0)]
+    if alternatives.empty:
+        return alternatives
+    best = alternatives.loc[alternatives.groupby("feature")["delta"].idxmax()]
+    return best.sort_values("delta", ascending=False).head(k)